@@ -0,0 +1,871 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import os
+import re
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import tkinter as tk
+
+from spellchecker import SpellChecker
+
+import symspell
+import ingest
+from completion_index import CompletionIndex
+from learning import KNOWN_AFTER, OnlineLearner
+from metrics import LatencyHistogram, replay_session
+from model_store import build_bigram_model, normalize_tokens
+from ngram_store import _SECTIONS, BACKOFF, NgramStore
+from prediction_index import PredictionIndex
+from prune import QUANTIZE_TYPES, prune_store, top1_agreement
+from token_tracker import RESYNC_WINDOW, TokenTracker, split_last_token
+
+# ---------------------------------------------------------
+# HELPERS
+# ---------------------------------------------------------
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def latency_row(name, seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    mean = sum(ms) / len(ms) if ms else 0.0
+    return (f"{name:<16}{mean:>10.3f}{percentile(ms, 50):>10.3f}{percentile(ms, 95):>10.3f}"
+            f"{percentile(ms, 99):>10.3f}{(ms[-1] if ms else 0.0):>10.3f}")
+
+
+def latency_header(label="backend"):
+    return f"{label:<16}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)"
+
+
+def make_typo(rng, word, edits):
+    """Applies `edits` random insert/delete/replace/swap steps to `word`."""
+    letters = string.ascii_lowercase
+    for _ in range(edits):
+        op = rng.choice(("insert", "delete", "replace", "swap") if len(word) > 1 else ("insert", "replace"))
+        i = rng.randrange(len(word))
+        if op == "insert":
+            word = word[:i] + rng.choice(letters) + word[i:]
+        elif op == "delete":
+            word = word[:i] + word[i + 1:]
+        elif op == "replace":
+            word = word[:i] + rng.choice(letters) + word[i + 1:]
+        elif i < len(word) - 1:
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+# ---------------------------------------------------------
+# CORRECTION BACKENDS: pyspellchecker vs SymSpell
+# ---------------------------------------------------------
+
+def bench_correction(args):
+    rng = random.Random(args.seed)
+    spell = SpellChecker()
+    sym = symspell.load_or_build(spell)
+
+    # Sample real words by frequency, then misspell most of them by 1-2 edits
+    dictionary = spell.word_frequency.dictionary
+    vocab = [w for w in dictionary if w.isalpha() and len(w) >= 3]
+    weights = [dictionary[w] for w in vocab]
+    samples = []
+    for word in rng.choices(vocab, weights=weights, k=args.samples):
+        roll = rng.random()
+        samples.append(word if roll < 0.2 else make_typo(rng, word, 1 if roll < 0.7 else 2))
+
+    timings = {"pyspellchecker": [], "symspell": []}
+    agree = ties = differ = 0
+    for word in samples:
+        start = time.perf_counter()
+        expected = spell.correction(word)
+        timings["pyspellchecker"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        actual = sym.correction(word)
+        timings["symspell"].append(time.perf_counter() - start)
+
+        if actual == expected:
+            agree += 1
+        elif actual is not None and expected is not None and spell[actual] == spell[expected]:
+            # pyspellchecker breaks frequency ties by set order
+            ties += 1
+        else:
+            differ += 1
+            if args.verbose:
+                print(f"   mismatch: {word!r}: pyspellchecker={expected!r} symspell={actual!r}")
+
+    print(f"\n🔤 --- CORRECTION BACKENDS ({len(samples)} words, seed {args.seed}) ---")
+    print(latency_header())
+    for name, seconds in timings.items():
+        print(latency_row(name, seconds))
+    print(f"\nIdentical results : {agree}/{len(samples)}")
+    print(f"Frequency ties    : {ties}  (equally likely candidates, either is correct)")
+    print(f"Mismatches        : {differ}")
+
+
+# ---------------------------------------------------------
+# LAST-TOKEN TRACKING: cost per key vs buffer size
+# ---------------------------------------------------------
+
+class TextBuffer:
+    """
+    Headless stand-in for the parts of tk.Text that TokenTracker uses:
+    insert/delete, marks with gravity, compare() and get() on indexes of
+    the form "insert", "1.0", "end-1c" or "<mark> -N chars". Indexes are
+    plain character offsets. chars_read counts what get() has returned,
+    so callers can check how much of the buffer a lookup touched.
+    """
+
+    _INDEX = re.compile(r"^(\S+?)(?:\s*([+-])\s*(\d+)\s*chars)?$")
+    _COMPARE = {"<": int.__lt__, "<=": int.__le__, ">": int.__gt__,
+                ">=": int.__ge__, "==": int.__eq__, "!=": int.__ne__}
+
+    def __init__(self, text=""):
+        self.text = text
+        self.marks = {"insert": [len(text), tk.RIGHT]}
+        self.chars_read = 0
+
+    def index(self, index):
+        match = self._INDEX.match(index)
+        if match is None:
+            raise ValueError(f"bad text index: {index}")
+        base, sign, count = match.groups()
+        if base == "1.0":
+            position = 0
+        elif base in ("end", "end-1c"):
+            position = len(self.text)
+        else:
+            position = self.marks[base][0]
+        if sign:
+            position += int(count) if sign == "+" else -int(count)
+        return max(0, min(position, len(self.text)))
+
+    def mark_set(self, name, index):
+        gravity = self.marks[name][1] if name in self.marks else tk.RIGHT
+        self.marks[name] = [self.index(index), gravity]
+
+    def mark_gravity(self, name, gravity):
+        self.marks[name][1] = gravity
+
+    def compare(self, first, op, second):
+        return self._COMPARE[op](self.index(first), self.index(second))
+
+    def get(self, start, end=None):
+        start = self.index(start)
+        end = start + 1 if end is None else self.index(end)
+        chunk = self.text[start:end]
+        self.chars_read += len(chunk)
+        return chunk
+
+    def insert(self, index, chars):
+        position = self.index(index)
+        self.text = self.text[:position] + chars + self.text[position:]
+        for mark in self.marks.values():
+            # Marks at the insertion point move only with right gravity
+            if mark[0] > position or (mark[0] == position and mark[1] == tk.RIGHT):
+                mark[0] += len(chars)
+
+    def delete(self, start, end=None):
+        start = self.index(start)
+        end = start + 1 if end is None else self.index(end)
+        if end <= start:
+            return
+        self.text = self.text[:start] + self.text[end:]
+        for mark in self.marks.values():
+            if mark[0] >= end:
+                mark[0] -= end - start
+            elif mark[0] > start:
+                mark[0] = start
+
+
+def bench_tracker(args):
+    root = None
+    if not args.headless:
+        try:
+            root = tk.Tk()
+            root.withdraw()
+        except tk.TclError:
+            print("No display: checking the tracker against a headless text buffer")
+    sizes = (10, 1_000, 10_000, 100_000)
+
+    print(f"\n⌨️  --- LAST-TOKEN TRACKING ({args.keys} keys per size, "
+          f"{'tk.Text' if root else 'TextBuffer'}) ---")
+    print(latency_header("chars"))
+
+    p50s, reads = {}, {}
+    for size in sizes:
+        initial = ("lorem ipsum dolor sit amet " * (size // 27 + 1))[:size]
+        if root is not None:
+            text = tk.Text(root)
+            text.insert("1.0", initial)
+            text.mark_set("insert", "end-1c")
+        else:
+            text = TextBuffer(initial)
+        tracker = TokenTracker(text)
+
+        seconds = []
+        legacy = []
+        most_read = 0
+        for i in range(args.keys):
+            text.insert("insert", " " if i % 6 == 5 else "a")
+
+            before = getattr(text, "chars_read", 0)
+            start = time.perf_counter()
+            tracker.current_word()
+            seconds.append(time.perf_counter() - start)
+            most_read = max(most_read, getattr(text, "chars_read", 0) - before)
+
+            # Previous approach: copy the whole buffer and rpartition it
+            start = time.perf_counter()
+            text.get("1.0", "end-1c").rpartition(" ")
+            legacy.append(time.perf_counter() - start)
+
+        print(latency_row(f"{size:,}", seconds))
+        print(latency_row(f"{size:,} (full)", legacy))
+        p50s[size] = percentile(sorted(seconds), 50)
+        reads[size] = most_read
+        if root is not None:
+            text.destroy()
+
+    if root is not None:
+        root.destroy()
+
+    failed = False
+    ratio = p50s[sizes[-1]] / max(p50s[sizes[0]], 1e-9)
+    print(f"\np50 ratio {sizes[-1]:,} vs {sizes[0]:,} chars: {ratio:.2f}x (limit {args.max_ratio}x)")
+    if ratio > args.max_ratio:
+        print("❌ Per-key tracking cost grows with buffer size")
+        failed = True
+    if root is None:
+        # Deterministic as well: the characters read per key must not depend on the buffer size
+        limit = 2 * RESYNC_WINDOW + 1
+        print("most chars read per key: " + ", ".join(f"{size:,}: {reads[size]}" for size in sizes)
+              + f" (limit {limit})")
+        if max(reads.values()) > limit:
+            print("❌ A key read more than a fixed window of the buffer")
+            failed = True
+    if failed:
+        raise SystemExit(1)
+    print("✅ Per-key tracking cost is flat")
+
+
+# ---------------------------------------------------------
+# N-GRAM STORAGE: defaultdict(Counter) vs NgramStore
+# ---------------------------------------------------------
+
+def measure_build(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = build()
+    seconds = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return model, seconds, size
+
+
+def bench_ngram(args):
+    from nltk.corpus import gutenberg
+
+    words = list(gutenberg.words())
+    counter_model, counter_build, counter_size = measure_build(lambda: build_bigram_model(words))
+    store, store_build, store_size = measure_build(lambda: NgramStore.build([words]))
+    index = PredictionIndex.build(store)
+
+    print(f"\n📚 --- N-GRAM STORAGE ({len(words):,} tokens, {len(store.vocab):,} words) ---")
+    print(f"{'model':<16}{'build (s)':>12}{'memory (MB)':>14}")
+    print(f"{'Counter':<16}{counter_build:>12.2f}{counter_size / 2**20:>14.1f}")
+    print(f"{'NgramStore':<16}{store_build:>12.2f}{store_size / 2**20:>14.1f}"
+          f"   ({store.nbytes / 2**20:.1f} MB of arrays)")
+
+    rng = random.Random(args.seed)
+    tokens = list(normalize_tokens(words))
+    positions = [rng.randrange(1, len(tokens)) for _ in range(args.samples)]
+
+    timings = {"Counter": [], "bigram": [], "trigram": [], "index": []}
+    agree = 0
+    for i in positions:
+        w1, w2 = tokens[i - 1], tokens[i]
+
+        start = time.perf_counter()
+        followers = counter_model.get(w2)
+        expected = followers.most_common(1)[0][0] if followers else None
+        timings["Counter"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        bigram = store.predict([w2], 1)
+        timings["bigram"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        store.predict([w1, w2], 1)
+        timings["trigram"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        index.predict(w2, 1)
+        timings["index"].append(time.perf_counter() - start)
+
+        if expected is None or (bigram and bigram[0][0] == expected):
+            agree += 1
+
+    print(f"\n{latency_header('lookup')}")
+    for name, seconds in timings.items():
+        print(latency_row(name, seconds))
+    print(f"\nBigram top-1 matches Counter: {agree}/{len(positions)}")
+
+
+# ---------------------------------------------------------
+# PRUNING: memory budget vs top-1 agreement with the full model
+# ---------------------------------------------------------
+
+def bench_prune(args):
+    from engine import load_ngram_store
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        full = load_ngram_store(args.sources)
+
+    print(f"\n✂️ --- PRUNING ({full.nbytes / 2**20:.1f} MB of arrays, {len(full.vocab):,} words) ---")
+    print(f"{'budget':<10}{'counts':<10}{'size':>10}{'bigram':>10}{'trigram':>10}   (top-1 agreement, "
+          f"weighted by context frequency)")
+    for quantize in args.quantize:
+        quantize = None if quantize == "exact" else quantize
+        for budget_mb in args.budgets_mb:
+            try:
+                pruned = prune_store(full, int(budget_mb * 2 ** 20), quantize)
+            except ValueError as e:
+                print(f"{budget_mb:<10g}{quantize or 'exact':<10}{'-':>10}   {e}")
+                continue
+            agreement = top1_agreement(full, pruned)
+            print(f"{budget_mb:<10g}{quantize or 'exact':<10}{pruned.nbytes / 2**20:>9.2f}M"
+                  f"{agreement['bigram']['weighted']:>10.1%}{agreement['trigram']['weighted']:>10.1%}")
+
+
+# ---------------------------------------------------------
+# INGESTION: build time vs worker processes
+# ---------------------------------------------------------
+
+def same_store(a, b):
+    return a.vocab == b.vocab and all((getattr(a, name) == getattr(b, name)).all() for name in _SECTIONS)
+
+
+def bench_ingest(args):
+    shards = ingest.plan_shards(args.sources, int(args.shard_mb * 2 ** 20))
+    print(f"\n🏭 --- INGESTION ({len(shards)} shards from {', '.join(args.sources)}) ---")
+    print(f"{'processes':<12}{'build (s)':>12}{'speedup':>10}")
+
+    reference = baseline = None
+    for processes in args.processes:
+        start = time.perf_counter()
+        store = ingest.build_ngram_store(args.sources, processes, int(args.shard_mb * 2 ** 20))
+        seconds = time.perf_counter() - start
+
+        if reference is None:
+            reference, baseline = store, seconds
+        elif not same_store(reference, store):
+            print(f"❌ {processes} processes built a different model")
+            raise SystemExit(1)
+        print(f"{processes:<12}{seconds:>12.2f}{baseline / seconds:>9.2f}x")
+
+    print(f"\n{len(reference.vocab):,} words, {reference.total:,} tokens; every run built the same model")
+
+
+# ---------------------------------------------------------
+# PREFIX COMPLETION: index vs scanning the vocabulary
+# ---------------------------------------------------------
+
+def scan_completions(store, prefix, k, previous):
+    """Reference ranking: filter the whole vocabulary, then sort."""
+    results = []
+    weight = 1.0
+    if previous in store.word_ids:
+        weight = BACKOFF
+        followers = store.get(previous) or {}
+        total = sum(followers.values())
+        # Counter keeps the store's order: count descending, then first occurrence
+        for word, count in followers.items():
+            if len(results) < k and word.startswith(prefix) and word != prefix:
+                results.append((word, count / total))
+
+    seen = {word for word, _ in results}
+    candidates = [w for w in store.vocab if w.startswith(prefix) and w != prefix and w not in seen]
+    candidates.sort(key=lambda w: (-int(store.unigrams[store.word_ids[w]]), w))
+    for word in candidates[:k - len(results)]:
+        results.append((word, weight * int(store.unigrams[store.word_ids[word]]) / store.total))
+    return results
+
+
+def bench_completion(args):
+    from nltk.corpus import gutenberg
+
+    store = NgramStore.build([gutenberg.words()])
+    start = time.perf_counter()
+    index = CompletionIndex(store)
+    build = time.perf_counter() - start
+
+    rng = random.Random(args.seed)
+    tokens = list(normalize_tokens(gutenberg.words()))
+    timings = {"index": [], "index+previous": [], "scan+previous": []}
+    differ = 0
+    for _ in range(args.samples):
+        i = rng.randrange(1, len(tokens))
+        previous, word = tokens[i - 1], tokens[i]
+        prefix = word[:rng.randrange(1, len(word) + 1)]
+
+        begin = time.perf_counter()
+        index.complete(prefix, args.k)
+        timings["index"].append(time.perf_counter() - begin)
+
+        begin = time.perf_counter()
+        actual = index.complete(prefix, args.k, previous)
+        timings["index+previous"].append(time.perf_counter() - begin)
+
+        begin = time.perf_counter()
+        expected = scan_completions(store, prefix, args.k, previous)
+        timings["scan+previous"].append(time.perf_counter() - begin)
+
+        if actual != expected:
+            differ += 1
+            if args.verbose:
+                print(f"   mismatch: {previous!r} {prefix!r}: index={actual} scan={expected}")
+
+    print(f"\n🔡 --- PREFIX COMPLETION ({args.samples} prefixes, {len(store.vocab):,} words, top {args.k}) ---")
+    print(f"Index built in {build * 1000:.1f} ms ({len(index.wide)} wide prefixes precomputed)")
+    print(latency_header("lookup"))
+    for name, seconds in timings.items():
+        print(latency_row(name, seconds))
+    print(f"\nMismatches vs scan: {differ}")
+
+    p99 = percentile(sorted(timings["index+previous"]), 99) * 1000
+    if differ or p99 > args.max_ms:
+        print(f"❌ Completion index is wrong or too slow (p99 {p99:.3f} ms, limit {args.max_ms} ms)")
+        raise SystemExit(1)
+    print(f"✅ p99 {p99:.3f} ms (limit {args.max_ms} ms)")
+
+
+# ---------------------------------------------------------
+# ONLINE LEARNING: per-word update cost, replay and compaction
+# ---------------------------------------------------------
+
+def bench_learn(args):
+    from nltk.corpus import gutenberg
+
+    store = NgramStore.build([gutenberg.words()])
+    index = PredictionIndex.build(store)
+    rng = random.Random(args.seed)
+    tokens = list(normalize_tokens(gutenberg.words()))
+    # Corpus text sprinkled with words the corpus has never seen
+    jargon = ["smarttype", "shadowfox", "dashboards", "kubernetes", "autocorrects"]
+    typed = [rng.choice(jargon) if rng.random() < args.new_rate else rng.choice(tokens) for _ in range(args.words)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        wal_path = os.path.join(tmp, "learned.wal")
+        learner = OnlineLearner(store, wal_path)
+        seconds = []
+        for i in range(len(typed)):
+            start = time.perf_counter()
+            changed = learner.observe(typed[max(0, i - 2):i + 1])
+            if changed is not None:
+                index.patch(changed, *learner.bigram_followers(changed, index.k))
+            seconds.append(time.perf_counter() - start)
+        learner.close()
+
+        contexts = [typed[i - 2:i] for i in range(2, len(typed), max(1, len(typed) // 500))]
+        contexts += [[word] for word in jargon]
+        overlay = [learner.predict(context, 3) for context in contexts]
+        # Completions of the start of a typed word, after the word before it
+        prefixes = [(typed[i - 1], typed[i][:1 + i % 3]) for i in range(1, len(typed), max(1, len(typed) // 500))]
+        prefixes += [(None, word[:5]) for word in jargon]
+
+        start = time.perf_counter()
+        replayed = OnlineLearner(store, wal_path)
+        replay = time.perf_counter() - start
+        completion_index = CompletionIndex(store, index.k)
+        overlay_completions = [completion_index.complete(prefix, 3, previous, replayed)
+                               for previous, prefix in prefixes]
+
+        start = time.perf_counter()
+        compacted_store = replayed.compact(os.path.join(tmp, "ngram.smt"), bytes(32))
+        compact = time.perf_counter() - start
+        compacted = [replayed.predict(context, 3) for context in contexts]
+        completion_index = CompletionIndex(compacted_store, index.k)
+        compacted_completions = [completion_index.complete(prefix, 3, previous) for previous, prefix in prefixes]
+        replayed.close()
+
+        typo, kept, completed = check_typo_learning(store, tmp)
+
+    differ = sum(1 for a, b in zip(overlay, compacted) if not same_ranking(a, b))
+    completions_differ = sum(1 for a, b in zip(overlay_completions, compacted_completions) if not same_ranking(a, b))
+
+    print(f"\n🎓 --- ONLINE LEARNING ({len(typed):,} words, {len(store.vocab):,}-word model) ---")
+    print(latency_header("update"))
+    print(latency_row("observe+patch", seconds))
+    print(f"\nWAL replay  : {replay * 1000:.1f} ms")
+    print(f"Compaction  : {compact * 1000:.1f} ms")
+    print(f"Predictions changed by compaction: {differ}/{len(contexts)}")
+    print(f"Completions changed by compaction: {completions_differ}/{len(prefixes)}")
+    print(f"'teh' accepted {KNOWN_AFTER}x      : corrected to {typo!r}")
+    print(f"'smarttype' kept, typed {KNOWN_AFTER}x: corrected to {kept!r}, completes 'smartt' to {completed}")
+    if differ or completions_differ or typo != "the" or kept != "smarttype" or "smarttype" not in completed:
+        raise SystemExit(1)
+
+
+def same_ranking(a, b):
+    return [w for w, _ in a] == [w for w, _ in b] and all(abs(x - y) <= 1e-12 for (_, x), (_, y) in zip(a, b))
+
+
+def check_typo_learning(store, tmp):
+    """
+    Through the engine: a misspelling accepted KNOWN_AFTER times is still
+    corrected, while a word kept over its correction (reject()) is learned,
+    left alone and completed. Returns (typo correction, kept word
+    correction, completions of the kept word's prefix).
+    """
+    from engine import SmartTypeEngine
+
+    engine = SmartTypeEngine(backend="pyspellchecker", wal_path=os.path.join(tmp, "typing.wal"), compact_every=None)
+    engine.spell = SpellChecker()
+    engine._install(store, OnlineLearner(store, engine.wal_path))
+
+    for _ in range(KNOWN_AFTER):
+        engine.accept(["of", "teh"])
+    typo = engine.correct("teh")
+
+    # Cached before learning, so the answer must be invalidated
+    engine.complete("smartt", 3, "use")
+    engine.reject("smarttype")
+    for _ in range(KNOWN_AFTER):
+        engine.accept(["use", "smarttype"])
+    kept = engine.correct("smarttype")
+    completed = [word for word, _ in engine.complete("smartt", 3, "use")]
+    engine.close()
+    return typo, kept, completed
+
+
+# ---------------------------------------------------------
+# MEMOIZATION: replayed typing session with and without caches
+# ---------------------------------------------------------
+
+def typing_session(rng, words, typo_rate):
+    """
+    Yields the text buffer after every keystroke of typing `words`, with
+    some words misspelled first and then fixed with backspaces.
+    """
+    buffer = ""
+    for word in words:
+        if rng.random() < typo_rate:
+            typo = make_typo(rng, word, 1)
+            for ch in typo:
+                buffer += ch
+                yield buffer
+            for _ in typo:
+                buffer = buffer[:-1]
+                yield buffer
+        for ch in word + " ":
+            buffer += ch
+            yield buffer
+
+
+def bench_cache(args):
+    from nltk.corpus import gutenberg
+    from engine import SmartTypeEngine
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Never replays or compacts the user's learned words
+        uncached = SmartTypeEngine(cache_size=0, learn=False).load()
+        cached = SmartTypeEngine(cache_size=args.cache_size, learn=False).load()
+
+    rng = random.Random(args.seed)
+    tokens = list(normalize_tokens(gutenberg.words()))
+    start = rng.randrange(max(1, len(tokens) - args.words))
+    buffers = list(typing_session(rng, tokens[start:start + args.words], args.typo_rate))
+
+    timings = {"no cache": [], f"LRU {args.cache_size}": []}
+    differ = 0
+    for buffer in buffers:
+        # Same context the UI's TokenTracker hands to the pipeline
+        _, word, previous = split_last_token(buffer[-RESYNC_WINDOW:])
+        results = []
+        for engine, seconds in zip((uncached, cached), timings.values()):
+            begin = time.perf_counter()
+            results.append(engine.suggest(word, 3, previous=previous))
+            seconds.append(time.perf_counter() - begin)
+        differ += results[0] != results[1]
+
+    print(f"\n🧠 --- MEMOIZATION ({len(buffers):,} keystrokes, {args.words} words, seed {args.seed}) ---")
+    print(latency_header("engine"))
+    for name, seconds in timings.items():
+        print(latency_row(name, seconds))
+    print()
+    for name, stats in cached.cache_stats().items():
+        print(f"{name:<12}: hit rate {stats['hit_rate']:.1%}  ({stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['evictions']} evictions, {stats['size']}/{stats['capacity']} entries)")
+    print(f"Differing results: {differ}")
+    if differ:
+        raise SystemExit(1)
+
+
+# ---------------------------------------------------------
+# KEYSTROKE LATENCY: replayed session through the engine's hot path
+# ---------------------------------------------------------
+
+def bench_replay(args):
+    from nltk.corpus import gutenberg
+    from engine import SmartTypeEngine
+
+    if args.session:
+        buffers = list(replay_session(args.session))
+        source = args.session
+    else:
+        rng = random.Random(args.seed)
+        tokens = list(normalize_tokens(gutenberg.words()))
+        start = rng.randrange(max(1, len(tokens) - args.words))
+        buffers = list(typing_session(rng, tokens[start:start + args.words], args.typo_rate))
+        source = f"{args.words} synthetic words, seed {args.seed}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Learned words go to a throwaway log, never the user's
+            engine = SmartTypeEngine(cache_size=args.cache_size, wal_path=os.path.join(tmp, "learned.wal"),
+                                     compact_every=None).load()
+        metrics = engine.metrics
+        metrics.reset()
+
+        for buffer in buffers:
+            # Same steps as AutocorrectKeyboard.on_key_release minus Tk and the debounce
+            pressed = time.perf_counter()
+            window = buffer[-RESYNC_WINDOW:]
+            token_start, word, previous = split_last_token(window)
+            metrics.since("fetch", pressed)
+            engine.keystroke(previous, word, token_start < len(window), 3, 3)
+            # TokenTracker.finished_words(): a single whitespace just ended a word
+            if len(window) >= 2 and window[-1].isspace() and not window[-2].isspace():
+                engine.accept(window.split()[-3:])
+            metrics.since("end_to_end", pressed)
+        engine.close()
+
+    print(f"\n⏱️ --- KEYSTROKE LATENCY ({len(buffers):,} keys, {source}) ---")
+    print(metrics.report())
+    summary = metrics.summary()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"keys": len(buffers), "source": source, "stages": summary}, f, indent=2)
+        print(f"\nSaved to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+        regressions = []
+        print()
+        for stage, before in baseline.items():
+            after = summary.get(stage)
+            if after is None or not before["p99"]:
+                continue
+            change = after["p99"] / before["p99"] - 1
+            flag = "❌" if change > args.max_regression else "✅"
+            print(f"{flag} {stage:<12} p99 {before['p99']:.3f} -> {after['p99']:.3f} ms ({change:+.0%})")
+            if change > args.max_regression:
+                regressions.append(stage)
+        if regressions:
+            print(f"p99 regressed by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+            raise SystemExit(1)
+
+
+# ---------------------------------------------------------
+# SERVER LOAD TEST: throughput and tail latency vs concurrent clients
+# ---------------------------------------------------------
+
+def start_server(args):
+    # A separate process, so client and server do not share an event loop
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen([sys.executable, "server.py", "--port", str(port), "--no-learn",
+                                "--batch-window-ms", str(args.batch_window_ms)],
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if "listening" in line:
+            return process, port
+    raise SystemExit("Server exited before listening")
+
+
+async def load_test(port, contexts, connections, seconds, deadline_ms):
+    from server import SuggestionClient
+
+    clients = [await SuggestionClient.connect(port=port) for _ in range(connections)]
+    histogram = LatencyHistogram()
+    errors = {}
+    stop = time.perf_counter() + seconds
+
+    async def typist(client, offset):
+        # Closed loop: each connection sends its next key as soon as the last one is answered
+        i = offset
+        while time.perf_counter() < stop:
+            previous, word, in_word = contexts[i % len(contexts)]
+            i += 1
+            begin = time.perf_counter()
+            reply = await client.suggest(previous, word, in_word, deadline_ms=deadline_ms)
+            if "error" in reply:
+                errors[reply["error"]] = errors.get(reply["error"], 0) + 1
+            else:
+                histogram.record(time.perf_counter() - begin)
+
+    begin = time.perf_counter()
+    await asyncio.gather(*(typist(client, n * len(contexts) // connections)
+                           for n, client in enumerate(clients)))
+    elapsed = time.perf_counter() - begin
+    stats = await clients[0].stats()
+    for client in clients:
+        await client.close()
+    return histogram, errors, elapsed, stats
+
+
+def bench_server(args):
+    from nltk.corpus import gutenberg
+
+    rng = random.Random(args.seed)
+    tokens = list(normalize_tokens(gutenberg.words()))
+    start = rng.randrange(max(1, len(tokens) - args.words))
+    contexts = []
+    for buffer in typing_session(rng, tokens[start:start + args.words], args.typo_rate):
+        window = buffer[-RESYNC_WINDOW:]
+        token_start, word, previous = split_last_token(window)
+        contexts.append((previous, word, token_start < len(window)))
+
+    if args.port:
+        process, port = None, args.port
+    else:
+        process, port = start_server(args)
+
+    results = {}
+    try:
+        print(f"\n🌐 --- SERVER LOAD TEST ({len(contexts):,} keystrokes, {args.seconds:g}s per run, "
+              f"deadline {args.deadline_ms:g} ms) ---")
+        print(f"{'clients':<10}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"
+              f"{'batch':>8}   errors   (ms)")
+        batches = batched = 0
+        for connections in args.connections:
+            histogram, errors, elapsed, stats = asyncio.run(
+                load_test(port, contexts, connections, args.seconds, args.deadline_ms))
+            summary = histogram.summary()
+            summary["throughput"] = histogram.count / elapsed
+            summary["errors"] = errors
+            results[connections] = summary
+
+            # Server counters are cumulative over the runs
+            mean_batch = (stats["batched"] - batched) / max(1, stats["batches"] - batches)
+            batches, batched = stats["batches"], stats["batched"]
+            failed = ", ".join(f"{n} {kind}" for kind, n in errors.items()) or "-"
+            print(f"{connections:<10}{summary['throughput']:>10.0f}{summary['p50']:>10.3f}{summary['p95']:>10.3f}"
+                  f"{summary['p99']:>10.3f}{summary['max']:>10.3f}{mean_batch:>8.1f}   {failed}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"connections": results, "seconds": args.seconds, "deadline_ms": args.deadline_ms}, f, indent=2)
+        print(f"\nSaved to {args.json}")
+
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartType benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    correction = sub.add_parser("correction", help="compare correction backends for accuracy and latency")
+    correction.add_argument("--samples", type=int, default=300)
+    correction.add_argument("--seed", type=int, default=7)
+    correction.add_argument("--verbose", action="store_true", help="print every mismatch")
+    correction.set_defaults(func=bench_correction)
+
+    tracker = sub.add_parser("tracker", help="check per-key last-token cost is flat in buffer size")
+    tracker.add_argument("--keys", type=int, default=500)
+    tracker.add_argument("--headless", action="store_true",
+                         help="use the headless TextBuffer even when a display is available")
+    tracker.add_argument("--max-ratio", type=float, default=3.0)
+    tracker.set_defaults(func=bench_tracker)
+
+    ngram = sub.add_parser("ngram", help="compare the Counter bigram model with the NumPy n-gram store")
+    ngram.add_argument("--samples", type=int, default=2000)
+    ngram.add_argument("--seed", type=int, default=7)
+    ngram.set_defaults(func=bench_ngram)
+
+    pruning = sub.add_parser("prune", help="top-1 agreement of pruned/quantized models per memory budget")
+    pruning.add_argument("sources", nargs="*", default=list(ingest.DEFAULT_SOURCES))
+    pruning.add_argument("--budgets-mb", type=float, nargs="+", default=[32, 16, 8, 4, 2])
+    pruning.add_argument("--quantize", nargs="+", choices=["exact"] + sorted(QUANTIZE_TYPES),
+                         default=["exact", "uint16", "uint8"])
+    pruning.set_defaults(func=bench_prune)
+
+    ingestion = sub.add_parser("ingest", help="time the parallel model build for several worker counts")
+    ingestion.add_argument("sources", nargs="*", default=list(ingest.DEFAULT_SOURCES))
+    ingestion.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    ingestion.add_argument("--shard-mb", type=float, default=ingest.SHARD_BYTES / 2 ** 20)
+    ingestion.set_defaults(func=bench_ingest)
+
+    completion = sub.add_parser("completion", help="check prefix completion against a vocabulary scan")
+    completion.add_argument("--samples", type=int, default=2000)
+    completion.add_argument("-k", type=int, default=3)
+    completion.add_argument("--max-ms", type=float, default=1.0)
+    completion.add_argument("--seed", type=int, default=7)
+    completion.add_argument("--verbose", action="store_true", help="print every mismatch")
+    completion.set_defaults(func=bench_completion)
+
+    learn = sub.add_parser("learn", help="time online updates, log replay and compaction")
+    learn.add_argument("--words", type=int, default=5000)
+    learn.add_argument("--new-rate", type=float, default=0.1, help="share of never-seen words")
+    learn.add_argument("--seed", type=int, default=7)
+    learn.set_defaults(func=bench_learn)
+
+    cache = sub.add_parser("cache", help="replay a typing session with and without the LRU caches")
+    cache.add_argument("--words", type=int, default=400)
+    cache.add_argument("--cache-size", type=int, default=4096)
+    cache.add_argument("--typo-rate", type=float, default=0.15)
+    cache.add_argument("--seed", type=int, default=7)
+    cache.set_defaults(func=bench_cache)
+
+    replay = sub.add_parser("replay", help="per-stage keystroke latency over a recorded or synthetic session")
+    replay.add_argument("--session", help="JSON-lines file recorded with Config.RECORD_SESSION")
+    replay.add_argument("--words", type=int, default=400)
+    replay.add_argument("--typo-rate", type=float, default=0.15)
+    replay.add_argument("--cache-size", type=int, default=4096)
+    replay.add_argument("--seed", type=int, default=7)
+    replay.add_argument("--json", help="write the per-stage summary to this file")
+    replay.add_argument("--baseline", help="summary from an earlier --json run to compare p99s against")
+    replay.add_argument("--max-regression", type=float, default=0.2, help="allowed p99 increase (0.2 = 20%%)")
+    replay.set_defaults(func=bench_replay)
+
+    server = sub.add_parser("server", help="load-test the suggestion server at several connection counts")
+    server.add_argument("--connections", type=int, nargs="+", default=[1, 10, 100])
+    server.add_argument("--seconds", type=float, default=5.0)
+    server.add_argument("--deadline-ms", type=float, default=200.0)
+    server.add_argument("--batch-window-ms", type=float, default=0.0)
+    server.add_argument("--port", type=int, help="test a running server.py instead of starting one")
+    server.add_argument("--words", type=int, default=400)
+    server.add_argument("--typo-rate", type=float, default=0.15)
+    server.add_argument("--seed", type=int, default=7)
+    server.add_argument("--json", help="write the results to this file")
+    server.set_defaults(func=bench_server)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+from bisect import bisect_left
+
+import numpy as np
+
+from ngram_store import BACKOFF
+from prediction_index import DEFAULT_TOP_K
+
+# Prefixes matching more words than this get their top completions
+# precomputed; narrower ranges are ranked on the fly.
+WIDE_RANGE = 256
+# Longest precomputed prefix (longer prefixes only match narrow ranges)
+MAX_TABLE_PREFIX = 3
+
+_PREFIX_END = chr(0x10FFFF)
+
+
+class CompletionIndex:
+    """
+    Completes a partially typed word from the n-gram store's vocabulary.
+
+    The vocabulary is already sorted, so every prefix is a contiguous id
+    range found with two binary searches. Candidates are ranked by the
+    previous word's bigram counts first (follower slices are count-ordered,
+    so the first in-range followers are the best), then by unigram
+    frequency, discounted by BACKOFF as in NgramStore.predict().
+
+    Ranking a wide range (e.g. every word starting with "s") on each key
+    would cost a pass over thousands of counts, so ranges wider than
+    WIDE_RANGE have their top candidates stored at build time.
+
+    Words learned since the store was built (see learning.py) are merged
+    in from the learner's overlay, ranked as compaction will rank them.
+    """
+
+    def __init__(self, ngram_store, k=DEFAULT_TOP_K):
+        self.store = ngram_store
+        self.vocab = ngram_store.vocab
+        self.counts = ngram_store.unigrams.astype(np.int64)
+        self.k = k
+        self.wide = {}
+
+        # Table entries keep a few spares for words the bigram pass already used
+        depth = 2 * k
+        for length in range(1, MAX_TABLE_PREFIX + 1):
+            for prefix, lo, hi in self._prefix_ranges(length):
+                if hi - lo > WIDE_RANGE:
+                    self.wide[prefix] = self._rank_range(lo, hi, depth)
+
+    def complete(self, prefix, k=DEFAULT_TOP_K, previous=None, learner=None):
+        """
+        Up to k (word, score) completions of `prefix`, best first. The
+        prefix itself is never returned. With a known `previous` word, its
+        bigram followers are ranked ahead of plain frequency. A `learner`
+        with pending words adds their counts.
+        """
+        vocab = self.vocab
+        lo = bisect_left(vocab, prefix)
+        hi = bisect_left(vocab, prefix + _PREFIX_END, lo)
+        if lo < hi and vocab[lo] == prefix:
+            lo += 1
+        if k <= 0:
+            return []
+        if learner is not None and learner.pending:
+            return self._complete_learned(prefix, k, previous, lo, hi,
+                                          *learner.completion_deltas(prefix, previous))
+        if lo >= hi:
+            return []
+
+        results = []
+        seen = set()
+        weight = 1.0
+
+        # Bigram: in-range followers of the previous word
+        previous_id = self.store.word_ids.get(previous) if previous else None
+        if previous_id is not None:
+            store = self.store
+            start, end = int(store.bi_offsets[previous_id]), int(store.bi_offsets[previous_id + 1])
+            if end > start:
+                next_ids = store.bi_next[start:end]
+                counts = store.decode(store.bi_counts[start:end])
+                total = int(counts.sum(dtype=np.int64))
+                for i in np.flatnonzero((next_ids >= lo) & (next_ids < hi))[:k]:
+                    word_id = int(next_ids[i])
+                    seen.add(word_id)
+                    results.append((vocab[word_id], int(counts[i]) / total))
+            weight = BACKOFF
+
+        # Unigram: most frequent words in range
+        if len(results) < k and self.store.total:
+            needed = k + len(seen)
+            ranked = self.wide.get(prefix)
+            if ranked is None or len(ranked) < min(needed, hi - lo):
+                ranked = self._rank_range(lo, hi, needed)
+            for word_id in ranked:
+                if len(results) == k:
+                    break
+                word_id = int(word_id)
+                if word_id not in seen:
+                    results.append((vocab[word_id], weight * int(self.counts[word_id]) / self.store.total))
+
+        return results
+
+    def _complete_learned(self, prefix, k, previous, lo, hi,
+                          bigram_deltas, bigram_total, unigram_deltas, unigram_total, previous_learned):
+        # complete() with the learner's counts added; slower, but only
+        # used until the next compaction
+        store, vocab = self.store, self.vocab
+        results = []
+        seen = set()
+        weight = 1.0
+
+        previous_id = store.word_ids.get(previous) if previous else None
+        if previous_id is not None or previous_learned:
+            counts = {}
+            total = bigram_total
+            if previous_id is not None:
+                start, end = int(store.bi_offsets[previous_id]), int(store.bi_offsets[previous_id + 1])
+                next_ids = store.bi_next[start:end]
+                row_counts = store.decode(store.bi_counts[start:end])
+                total += int(row_counts.sum(dtype=np.int64))
+                for i in np.flatnonzero((next_ids >= lo) & (next_ids < hi))[:k + len(bigram_deltas)]:
+                    counts[vocab[int(next_ids[i])]] = int(row_counts[i])
+                base = store.follower_counts((previous,), bigram_deltas)
+            else:
+                base = {}
+            for word, delta in bigram_deltas.items():
+                counts[word] = counts.get(word, base.get(word, (0,))[0]) + delta
+            # Stable sort: store followers keep their row order on ties, like compaction
+            for word, count in sorted(counts.items(), key=lambda item: -item[1])[:k]:
+                seen.add(word)
+                results.append((word, count / total))
+            weight = BACKOFF
+
+        total = store.total + unigram_total
+        if len(results) < k and total:
+            counts = {}
+            if lo < hi:
+                needed = k + len(seen) + len(unigram_deltas)
+                ranked = self.wide.get(prefix)
+                if ranked is None or len(ranked) < min(needed, hi - lo):
+                    ranked = self._rank_range(lo, hi, needed)
+                for word_id in ranked[:needed]:
+                    counts[vocab[int(word_id)]] = int(self.counts[word_id])
+            for word, delta in unigram_deltas.items():
+                word_id = store.word_ids.get(word)
+                counts[word] = (0 if word_id is None else int(self.counts[word_id])) + delta
+            for word, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+                if len(results) == k:
+                    break
+                if word not in seen:
+                    results.append((word, weight * count / total))
+
+        return results
+
+    def _rank_range(self, lo, hi, n):
+        # Top-n ids in [lo, hi) by count, ties by id (i.e. alphabetically)
+        counts = self.counts[lo:hi]
+        if len(counts) > n:
+            # Everything above the n-th count, then the lowest ids tied with it
+            threshold = -np.partition(-counts, n - 1)[n - 1]
+            above = np.flatnonzero(counts > threshold)
+            tied = np.flatnonzero(counts == threshold)[:n - len(above)]
+            top = np.concatenate((above, tied))
+        else:
+            top = np.arange(len(counts))
+        order = np.lexsort((top, -counts[top]))
+        return (top[order] + lo).astype(np.int64)
+
+    def _prefix_ranges(self, length):
+        # (prefix, lo, hi) for each distinct prefix among words longer than `length`
+        vocab = self.vocab
+        lo = 0
+        while lo < len(vocab):
+            if len(vocab[lo]) < length:
+                lo += 1
+                continue
+            prefix = vocab[lo][:length]
+            hi = bisect_left(vocab, prefix + _PREFIX_END, lo)
+            start = lo + 1 if vocab[lo] == prefix else lo
+            if hi > start:
+                yield prefix, start, hi
+            lo = hi
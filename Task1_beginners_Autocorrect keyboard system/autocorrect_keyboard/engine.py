@@ -0,0 +1,562 @@
+import re
+import string
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import nltk
+from spellchecker import SpellChecker
+
+from completion_index import CompletionIndex
+from ingest import DEFAULT_SOURCES, WORD_RE as CORPUS_WORD_RE, build_ngram_store, sources_fingerprint
+from learning import DEFAULT_WAL_PATH, OnlineLearner
+from memo_cache import LRUCache
+from metrics import Metrics
+from model_store import normalize_tokens
+from ngram_store import DEFAULT_MODEL_PATH, NgramStore
+from prediction_index import DEFAULT_TOP_K, PredictionIndex
+from prune import prune_store, pruned_fingerprint, pruned_model_path
+import symspell
+
+BACKENDS = ("pyspellchecker", "symspell")
+
+# Letters only (no digits or underscores), the same rule as the UI's word cleaning
+WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+class SmartTypeEngine:
+    """
+    UI-free SmartType: spell correction, n-gram next-word prediction and
+    completion of partially typed words.
+
+    Resources are loaded in stages by load(), which may run on any thread;
+    until a stage finishes the matching attribute is None and the engine
+    degrades gracefully (no correction / predictions still loading).
+
+    The n-gram model is built from `sources` (NLTK corpora and/or local
+    text directories, see ingest.py) by `build_processes` workers, then
+    snapshotted; later loads memory-map the snapshot.
+
+    With `learn`, words the user accepts (accept(), learn_text()) are
+    counted on top of the model right away, logged to `wal_path`, and
+    compacted into the snapshot on load once `compact_every` words are
+    pending (None: never); with wal_path=None they are kept in memory only.
+    Misspellings are not learned unless the user
+    kept the word over its correction (reject()), so a habitual typo stays
+    corrected however often it is typed.
+
+    With a `memory_budget` (bytes) and/or `quantize` ("uint8", "uint16"),
+    the n-gram model is pruned to fit (see prune.py) and the pruned copy is
+    snapshotted and loaded instead of the full one.
+
+    Corrections and predictions are memoized in bounded LRU caches
+    (cache_size entries each, 0 disables them). Anything that swaps a model
+    must call invalidate_caches().
+
+    Every hot-path stage (correct, predict, complete, learn and the whole
+    keystroke) is timed into `metrics` (see metrics.py).
+    """
+
+    def __init__(self, backend="symspell", top_k=DEFAULT_TOP_K, cache_size=4096,
+                 sources=DEFAULT_SOURCES, build_processes=None,
+                 learn=True, wal_path=DEFAULT_WAL_PATH, compact_every=1000, metrics=None,
+                 memory_budget=None, quantize=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown correction backend: {backend}")
+        self.backend = backend
+        self.top_k = top_k
+        self.sources = tuple(sources)
+        self.build_processes = build_processes
+        self.learn = learn
+        self.wal_path = wal_path
+        self.compact_every = compact_every
+        self.memory_budget = memory_budget
+        self.quantize = quantize
+
+        self.spell = None
+        self.ngram_store = None
+        self.prediction_index = None
+        self.completion_index = None
+        self.learner = None
+        # Words the user kept over a shown correction
+        self.kept_words = set()
+
+        # Tagged by the word whose learned counts can change the entry
+        self.correction_cache = LRUCache(cache_size, tag=str.lower)
+        self.prediction_cache = LRUCache(cache_size, tag=_prediction_tag)
+        self.metrics = metrics or Metrics()
+
+    # ---------------------------------------------------------
+    # LOADING
+    # ---------------------------------------------------------
+
+    def load(self, progress=print):
+        """Loads every resource, reporting each stage through progress(message)."""
+        # Step 1: Download/Verify NLTK data
+        progress("● Checking NLTK data...")
+        ensure_nltk_data()
+
+        # Step 1a: SpellChecker (corrections can start as soon as this is ready)
+        progress("● Loading spell checker...")
+        self.spell = SpellChecker()
+        self.correction_cache.clear()
+        if self.backend == "symspell":
+            progress("● Loading SymSpell index...")
+            self.spell = symspell.load_or_build(self.spell)
+            self.correction_cache.clear()
+
+        # Step 1b: N-gram Model
+        progress("● Loading predictions...")
+        ngram_store = load_ngram_store(self.sources, self.build_processes, self.memory_budget, self.quantize)
+
+        # Step 1c: Replay (and maybe compact) words learned in earlier sessions
+        learner = None
+        if self.learn:
+            progress("● Loading learned words...")
+            learner = OnlineLearner(ngram_store, self.wal_path)
+            if self.compact_every is not None and learner.pending >= self.compact_every:
+                progress("● Compacting learned words...")
+                ngram_store = self._compact(learner)
+
+        # Step 1d: Frozen top-k prediction index
+        progress("● Indexing predictions...")
+        self._install(ngram_store, learner)
+        return self
+
+    def _install(self, ngram_store, learner):
+        prediction_index = PredictionIndex.build(ngram_store, self.top_k)
+        if learner is not None:
+            for word in list(learner.bigrams):
+                prediction_index.patch(word, *learner.bigram_followers(word, self.top_k))
+
+        self.prediction_index = prediction_index
+        self.completion_index = CompletionIndex(ngram_store, self.top_k)
+        self.ngram_store = ngram_store
+        self.learner = learner
+        self.invalidate_caches()
+
+    def _compact(self, learner):
+        path, fingerprint = model_snapshot(self.sources, self.memory_budget, self.quantize)
+        prune = None
+        if self.memory_budget is not None or self.quantize is not None:
+            prune = lambda store: prune_store(store, self.memory_budget, self.quantize)
+        try:
+            store = learner.compact(path, fingerprint, prune)
+            print(f"Learned words compacted into {path}")
+            return store
+        except OSError as e:
+            print(f"Could not compact learned words: {e}")
+            return learner.store
+
+    def close(self):
+        """Flushes the learning log to disk."""
+        if self.learner is not None:
+            self.learner.close()
+
+    def config(self):
+        """Constructor arguments that rebuild this engine's models, e.g. in a worker process."""
+        return {"backend": self.backend, "top_k": self.top_k, "cache_size": self.correction_cache.capacity,
+                "sources": self.sources, "learn": self.learn, "memory_budget": self.memory_budget,
+                "quantize": self.quantize}
+
+    @property
+    def ready(self):
+        return self.spell is not None and self.prediction_index is not None
+
+    def invalidate_caches(self):
+        """Forgets memoized results; call after any model update."""
+        self.correction_cache.clear()
+        self.prediction_cache.clear()
+
+    def cache_stats(self):
+        return {"correction": self.correction_cache.stats(),
+                "prediction": self.prediction_cache.stats()}
+
+    # ---------------------------------------------------------
+    # SINGLE WORD
+    # ---------------------------------------------------------
+
+    def correct(self, word):
+        """
+        Corrects one typed word (non-letters are dropped first). Returns
+        None when nothing is left to correct or the spell checker is not
+        loaded yet.
+        """
+        clean_word = ''.join(filter(str.isalpha, word))
+        spell = self.spell
+        if not clean_word or spell is None:
+            return None
+
+        # The user's own vocabulary (product names, jargon) is left alone
+        learner = self.learner
+        if learner is not None and learner.knows(clean_word.lower()):
+            return clean_word
+
+        return self.correction_cache.get_or_compute(clean_word, lambda: spell.correction(clean_word) or clean_word)
+
+    def predict(self, word, k=1, previous=None):
+        """
+        Up to k (next_word, score) pairs after `word`, or None while loading.
+        With a `previous` word, the trigram (previous, word) is used, backing
+        off to bigrams and unigrams; otherwise the frozen bigram top-k index.
+        The returned list may be shared with the cache; do not modify it.
+        """
+        prediction_index = self.prediction_index
+        model = self.learner or self.ngram_store
+        if prediction_index is None or model is None:
+            return None
+
+        word = word.lower()
+        previous = ''.join(filter(str.isalpha, previous or '')).lower()
+        if previous:
+            compute = lambda: model.predict([previous, word], k)
+        else:
+            compute = lambda: prediction_index.predict(word, k)
+        return self.prediction_cache.get_or_compute((previous, word, k), compute)
+
+    def complete(self, prefix, k=1, previous=None):
+        """
+        Up to k (word, score) completions of a partially typed word, ranked
+        by bigram counts after `previous` and then by word frequency. None
+        while loading.
+        """
+        completion_index = self.completion_index
+        if completion_index is None:
+            return None
+
+        start = time.perf_counter()
+        prefix = ''.join(filter(str.isalpha, prefix)).lower()
+        if not prefix:
+            return []
+        previous = ''.join(filter(str.isalpha, previous or '')).lower()
+        learner = self.learner
+        completions = self.prediction_cache.get_or_compute(
+            ("complete", previous, prefix, k), lambda: completion_index.complete(prefix, k, previous, learner))
+        self.metrics.since("complete", start)
+        return completions
+
+    def suggest(self, last_word, k=1, cancelled=None, previous=None):
+        """
+        Keystroke entry point: (correction, predictions) for the word at the
+        cursor, with the word before it as optional context. correction is
+        None if there is nothing to correct yet; predictions is None while
+        the prediction index is loading.
+        """
+        start = time.perf_counter()
+        corrected = self.correct(last_word)
+        self.metrics.since("correct", start)
+        if corrected is None:
+            return None, []
+
+        # Newer text arrived while correcting: skip the lookup
+        if cancelled is not None and cancelled():
+            return corrected, None
+
+        start = time.perf_counter()
+        predictions = self.predict(corrected, k, previous)
+        self.metrics.since("predict", start)
+        return corrected, predictions
+
+    def keystroke(self, previous, word, in_word, k=1, completions=0, cancelled=None):
+        """
+        Everything the UI needs after a key: (correction, predictions,
+        completions) for the word at the cursor. Completions are only
+        looked up while the word is still being typed (in_word).
+        """
+        start = time.perf_counter()
+        completed = self.complete(word, completions, previous) if in_word and completions else []
+        corrected, predictions = self.suggest(word, k, cancelled, previous)
+        self.metrics.since("keystroke", start)
+        return corrected, predictions, completed
+
+    # ---------------------------------------------------------
+    # ONLINE LEARNING
+    # ---------------------------------------------------------
+
+    def accept(self, words):
+        """
+        Learns that the user typed words[-1] after words[:-1] (the last
+        three words count). Returns False while the model is loading or
+        when words[-1] is not learnable (see reject()).
+        """
+        # Only the trailing run of real words forms the n-gram context
+        context = []
+        for word in words[-3:]:
+            word = word.strip(string.punctuation).lower()
+            context = context + [word] if word.isalpha() else []
+        return bool(context) and self.learnable(context[-1]) and self._learn([context])
+
+    def reject(self, word):
+        """
+        The user kept `word` as typed over the correction shown for it:
+        from now on accept() learns it, and once learned often enough it
+        is no longer corrected. Returns False if there was nothing to keep.
+        """
+        word = ''.join(filter(str.isalpha, word)).lower()
+        if not word or self.learnable(word):
+            return False
+        self.kept_words.add(word)
+        return True
+
+    def learnable(self, word):
+        """Whether typing (lowercase) `word` teaches the model: real words, or words the user kept."""
+        spell = self.spell
+        if spell is None:
+            return False
+        learner = self.learner
+        # Kept words stay learnable after a restart through their learned counts
+        return (word in spell or word in self.kept_words
+                or (learner is not None and learner.learned_count(word) > 0))
+
+    def learn_text(self, text):
+        """Learns every learnable word of `text`, e.g. a document the user wrote."""
+        words = list(normalize_tokens(CORPUS_WORD_RE.findall(text)))
+        return self._learn([words[max(0, i - 2):i + 1] for i in range(len(words))
+                            if self.learnable(words[i])])
+
+    def _learn(self, contexts):
+        learner = self.learner
+        prediction_index = self.prediction_index
+        if learner is None or prediction_index is None:
+            return False
+
+        start = time.perf_counter()
+        changed, learned = set(), set()
+        for context in contexts:
+            changed.add(learner.observe(context))
+            learned.add(context[-1])
+        changed.discard(None)
+
+        # Patch only the rows and cache entries the new counts touch:
+        # predictions after a changed word, completions of any prefix of a
+        # learned word and corrections of the learned words
+        for word in changed:
+            prediction_index.patch(word, *learner.bigram_followers(word, self.top_k))
+        prefixes = {("complete", word[:i]) for word in learned for i in range(1, len(word))}
+        self.prediction_cache.discard_tags(changed | prefixes)
+        self.correction_cache.discard_tags(learned)
+        self.metrics.since("learn", start)
+        return True
+
+    def compact(self):
+        """Folds everything learned so far into the on-disk model."""
+        learner = self.learner
+        if learner is not None and learner.pending:
+            self._install(self._compact(learner), learner)
+
+    # ---------------------------------------------------------
+    # BATCH & STREAMING
+    # ---------------------------------------------------------
+
+    def correct_batch(self, words):
+        """Corrects each word; entries with nothing to correct come back unchanged."""
+        results = []
+        for word in words:
+            corrected = self.correct(word)
+            results.append(word if corrected is None else corrected)
+        return results
+
+    def predict_batch(self, words, k=1):
+        """
+        Top-k next-word predictions for each entry: a word, or a
+        (previous, word) pair for trigram context.
+        """
+        results = []
+        for entry in words:
+            previous, word = entry if isinstance(entry, tuple) else (None, entry)
+            results.append(self.predict(word, k, previous) or [])
+        return results
+
+    def keystroke_batch(self, requests):
+        """
+        keystroke() for many (previous, word, in_word, k, completions)
+        requests at once, e.g. from concurrent server clients. Identical
+        requests (everyone typing "th") are answered once.
+
+        The distinct requests still run one by one: each lookup goes
+        through the learned-word overlay and the LRU caches, and repeated
+        lookups are cache hits. What a batch saves is the duplicate work
+        and one engine-thread hop per request, not the lookups themselves.
+        """
+        start = time.perf_counter()
+        answers = {}
+        for request in requests:
+            if request not in answers:
+                answers[request] = self.keystroke(*request)
+        self.metrics.since("batch", start)
+        return [answers[request] for request in requests]
+
+    def correct_text(self, text):
+        """Corrects every word in `text`, keeping spacing, punctuation and case style."""
+        return WORD_RE.sub(lambda match: _match_case(match.group(), self.correct(match.group())), text)
+
+    def process_stream(self, lines, processes=None, chunk_size=2000):
+        """
+        Lazily yields corrected lines, in order.
+
+        With processes > 1, chunks of lines are corrected in a process pool.
+        On platforms with fork, workers inherit this (already loaded) engine
+        copy-on-write; elsewhere each worker loads its own engine, which is
+        cheap because the models are memory-mapped snapshots. At most
+        2 * processes chunks are in flight, so memory stays bounded no
+        matter how long the input is.
+        """
+        if not processes or processes <= 1:
+            for line in lines:
+                yield self.correct_text(line)
+            return
+
+        global _WORKER_ENGINE
+        if "fork" in multiprocessing.get_all_start_methods():
+            _WORKER_ENGINE = self
+            context = multiprocessing.get_context("fork")
+            initializer, initargs = None, ()
+        else:
+            context = multiprocessing.get_context()
+            # Same models and known words as this engine, without its log
+            learned = self.learner.learned_words() if self.learner is not None else {}
+            initializer, initargs = _init_worker, (self.config(), learned)
+
+        try:
+            with ProcessPoolExecutor(processes, mp_context=context,
+                                     initializer=initializer, initargs=initargs) as pool:
+                pending = deque()
+                for chunk in _chunks(lines, chunk_size):
+                    pending.append(pool.submit(_correct_chunk, chunk))
+                    if len(pending) >= 2 * processes:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+        finally:
+            _WORKER_ENGINE = None
+
+
+# ---------------------------------------------------------
+# RESOURCES
+# ---------------------------------------------------------
+
+def ensure_nltk_data():
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        nltk.download('punkt')
+
+    try:
+        nltk.data.find('corpora/gutenberg')
+    except LookupError:
+        nltk.download('gutenberg')
+
+
+def model_snapshot(sources=DEFAULT_SOURCES, memory_budget=None, quantize=None):
+    """(path, fingerprint) of the model snapshot for these settings."""
+    fingerprint = sources_fingerprint(sources)
+    if memory_budget is None and quantize is None:
+        return DEFAULT_MODEL_PATH, fingerprint
+    return pruned_model_path(memory_budget, quantize), pruned_fingerprint(fingerprint, memory_budget, quantize)
+
+
+def load_ngram_store(sources=DEFAULT_SOURCES, processes=None, memory_budget=None, quantize=None):
+    if memory_budget is not None or quantize is not None:
+        # Pruned snapshot first, then prune the full model on a miss
+        path, fingerprint = model_snapshot(sources, memory_budget, quantize)
+        ngram_store = NgramStore.load(path, fingerprint)
+        if ngram_store is not None:
+            print("Pruned N-gram Model loaded from snapshot.")
+            return ngram_store
+
+        full = load_ngram_store(sources, processes)
+        ngram_store = prune_store(full, memory_budget, quantize)
+        print(f"Model pruned from {full.nbytes / 2 ** 20:.1f} MB to {ngram_store.nbytes / 2 ** 20:.1f} MB.")
+        try:
+            ngram_store.save(path, fingerprint)
+        except OSError as e:
+            print(f"Could not save pruned model snapshot: {e}")
+        return ngram_store
+
+    # On-disk snapshot first, corpus scan only on a miss
+    fingerprint = sources_fingerprint(sources)
+    ngram_store = NgramStore.load(DEFAULT_MODEL_PATH, fingerprint)
+    if ngram_store is not None:
+        print("N-gram Model loaded from snapshot.")
+        return ngram_store
+
+    print("Building N-gram Model...")
+    ngram_store = build_ngram_store(sources, processes)
+    print("Model Built.")
+
+    try:
+        ngram_store.save(DEFAULT_MODEL_PATH, fingerprint)
+        print(f"Snapshot saved to {DEFAULT_MODEL_PATH}")
+    except OSError as e:
+        print(f"Could not save model snapshot: {e}")
+
+    return ngram_store
+
+
+# ---------------------------------------------------------
+# PROCESS POOL WORKERS
+# ---------------------------------------------------------
+
+_WORKER_ENGINE = None
+
+
+def _prediction_tag(key):
+    # ("complete", previous, prefix, k) or (previous, word, k)
+    return ("complete", key[2]) if len(key) == 4 else key[1]
+
+
+def _init_worker(config, learned):
+    global _WORKER_ENGINE
+    # Workers never replay, append to or compact the user's learning log:
+    # the parent's pending words arrive as `learned` instead
+    engine = SmartTypeEngine(**config, wal_path=None, compact_every=None).load(progress=lambda message: None)
+    if engine.learner is not None:
+        engine.learner.preload(learned)
+    _WORKER_ENGINE = engine
+
+
+def _correct_chunk(lines):
+    return [_WORKER_ENGINE.correct_text(line) for line in lines]
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _match_case(original, corrected):
+    if corrected is None or corrected == original:
+        return original
+    if original.isupper() and len(original) > 1:
+        return corrected.upper()
+    if original[0].isupper():
+        return corrected[:1].upper() + corrected[1:]
+    return corrected
+
+
+if __name__ == "__main__":
+    # Bulk mode: python engine.py [files...] [--processes N] > corrected.txt
+    import argparse
+    import contextlib
+    import fileinput
+    import sys
+
+    parser = argparse.ArgumentParser(description="Correct text files (or stdin) with SmartType")
+    parser.add_argument("files", nargs="*", help="input files; reads stdin when omitted")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--backend", choices=BACKENDS, default="symspell")
+    args = parser.parse_args()
+
+    # Loading chatter goes to stderr so stdout only carries corrected text
+    with contextlib.redirect_stdout(sys.stderr):
+        engine = SmartTypeEngine(backend=args.backend).load()
+    with fileinput.input(args.files, encoding="utf-8") as lines:
+        for line in engine.process_stream(lines, processes=args.processes):
+            sys.stdout.write(line)
@@ -0,0 +1,206 @@
+import os
+import re
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from model_store import FORMAT_VERSION, TOKENIZER_VERSION, corpus_fingerprint, normalize_tokens
+from ngram_store import NgramStore, count_ids
+
+# ---------------------------------------------------------
+# PARALLEL CORPUS INGESTION
+# ---------------------------------------------------------
+# A source is either "nltk:<corpus>" (e.g. "nltk:gutenberg") or a local
+# path to a plain-text file or a directory searched recursively for
+# TEXT_SUFFIXES files. Sources are split into shards: one per NLTK fileid,
+# and one per SHARD_BYTES slice (cut at a newline) of each local file.
+#
+# Every shard is tokenized and counted in a worker process into partial
+# counts over its own small vocabulary; the parent maps those onto the
+# global sorted vocabulary and merges them (ngram_store.from_counts).
+# N-grams never span two shards.
+
+DEFAULT_SOURCES = ("nltk:gutenberg",)
+
+SHARD_BYTES = 32 * 2 ** 20
+TEXT_SUFFIXES = (".txt",)
+
+# Same split as NLTK's WordPunctTokenizer, which gutenberg.words() uses.
+# Punctuation runs never survive normalize_tokens(), so only words are kept.
+WORD_RE = re.compile(r"\w+")
+
+
+def build_ngram_store(sources=DEFAULT_SOURCES, processes=None, shard_bytes=SHARD_BYTES):
+    """
+    Builds an NgramStore from all `sources`, counting shards in a pool of
+    `processes` workers (default: one per CPU; 1 counts in this process).
+    """
+    shards = plan_shards(sources, shard_bytes)
+    processes = min(processes or os.cpu_count() or 1, len(shards))
+
+    if processes <= 1:
+        partials = [_count_shard(shard) for shard in shards]
+    else:
+        # Spawned, not forked: the caller may be a GUI with live threads
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(processes, mp_context=context) as pool:
+            partials = list(pool.map(_count_shard, shards))
+
+    return merge_partials(partials)
+
+
+def plan_shards(sources, shard_bytes=SHARD_BYTES):
+    """Splits sources into picklable shard descriptions, in corpus order."""
+    shards = []
+    for source in sources:
+        if source.startswith("nltk:"):
+            name = source[len("nltk:"):]
+            shards.extend(("nltk", name, fileid) for fileid in sorted(_nltk_corpus(name).fileids()))
+            continue
+
+        for path in _text_files(source):
+            size = os.path.getsize(path)
+            start = 0
+            while start < size:
+                end = _line_boundary(path, start + shard_bytes, size)
+                shards.append(("file", path, start, end))
+                start = end
+
+    return shards
+
+
+def merge_partials(partials):
+    """Combines per-shard (local vocab, counts) results into one NgramStore."""
+    vocab = sorted(set().union(*(local_vocab for local_vocab, _ in partials)))
+    word_ids = {word: i for i, word in enumerate(vocab)}
+    V = len(vocab)
+
+    def remapped():
+        # One shard at a time, so only one dense unigram array is alive
+        for local_vocab, counts in partials:
+            remap = np.fromiter((word_ids[word] for word in local_vocab), dtype=np.int64, count=len(local_vocab))
+            yield _remap_counts(counts, remap, len(local_vocab), V)
+
+    return NgramStore.from_counts(vocab, remapped())
+
+
+def sources_fingerprint(sources):
+    """Fingerprint of every input file, for NgramStore.save()/load()."""
+    digest = hashlib.sha256(f"{FORMAT_VERSION}:{TOKENIZER_VERSION}".encode())
+    for source in sources:
+        digest.update(source.encode("utf-8") + b"\0")
+        if source.startswith("nltk:"):
+            digest.update(corpus_fingerprint(_nltk_corpus(source[len("nltk:"):])))
+            continue
+        for path in _text_files(source):
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return digest.digest()
+
+
+# ---------------------------------------------------------
+# WORKERS
+# ---------------------------------------------------------
+
+def _count_shard(shard):
+    if shard[0] == "nltk":
+        _, name, fileid = shard
+        tokens = _nltk_corpus(name).words(fileid)
+    else:
+        _, path, start, end = shard
+        with open(path, "rb") as f:
+            f.seek(start)
+            text = f.read(end - start).decode("utf-8", errors="replace")
+        tokens = WORD_RE.findall(text)
+
+    local_ids = {}
+    ids = np.fromiter((local_ids.setdefault(word, len(local_ids)) for word in normalize_tokens(tokens)),
+                      dtype=np.int64)
+    return list(local_ids), count_ids(ids, len(local_ids))
+
+
+def _remap_counts(counts, remap, local_V, V):
+    # Re-packs n-gram keys from shard-local ids to global ids
+    def repack(table, order):
+        keys, n, first = table
+        digits = []
+        for _ in range(order):
+            keys, digit = np.divmod(keys, local_V)
+            digits.append(remap[digit])
+        packed = np.zeros(len(n), dtype=np.int64)
+        for digit in reversed(digits):
+            packed = packed * V + digit
+        # Local key order is not global key order
+        order_by_key = np.argsort(packed, kind="stable")
+        return packed[order_by_key], n[order_by_key], first[order_by_key]
+
+    unigrams = np.zeros(V, dtype=np.int64)
+    unigrams[remap] = counts["unigrams"]
+    return {
+        "tokens": counts["tokens"],
+        "unigrams": unigrams,
+        "bigrams": repack(counts["bigrams"], 2),
+        "trigrams": repack(counts["trigrams"], 3),
+    }
+
+
+# ---------------------------------------------------------
+# SOURCES
+# ---------------------------------------------------------
+
+def _nltk_corpus(name):
+    import nltk.corpus
+    return getattr(nltk.corpus, name)
+
+
+def _text_files(path):
+    if os.path.isfile(path):
+        return [path]
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No such corpus source: {path}")
+
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith(TEXT_SUFFIXES))
+    return files
+
+
+def _line_boundary(path, offset, size):
+    # First byte after the next newline at or past `offset`
+    if offset >= size:
+        return size
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            block = f.read(64 * 1024)
+            if not block:
+                return size
+            newline = block.find(b"\n")
+            if newline >= 0:
+                return offset + newline + 1
+            offset += len(block)
+
+
+if __name__ == "__main__":
+    # python ingest.py nltk:gutenberg ~/corpora/news --processes 8
+    import argparse
+    import time
+
+    from ngram_store import DEFAULT_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Build the SmartType n-gram model from text corpora")
+    parser.add_argument("sources", nargs="*", default=list(DEFAULT_SOURCES),
+                        help='"nltk:<corpus>" or local text files/directories')
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--shard-mb", type=float, default=SHARD_BYTES / 2 ** 20)
+    parser.add_argument("--output", default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = build_ngram_store(args.sources, args.processes, int(args.shard_mb * 2 ** 20))
+    store.save(args.output, sources_fingerprint(args.sources))
+    print(f"✅ {len(store.vocab):,} words, {store.total:,} tokens in {time.perf_counter() - start:.1f}s "
+          f"-> {args.output}")
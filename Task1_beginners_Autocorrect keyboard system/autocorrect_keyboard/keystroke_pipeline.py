@@ -0,0 +1,146 @@
+import queue
+import threading
+from collections import deque
+
+_FAILED = object()
+_MISSING = object()
+
+
+class KeystrokePipeline:
+    """
+    Debounced, cancellable off-thread processing for key events.
+
+    The Tk thread calls submit() on every key release. Bursts are collapsed
+    by a root.after debounce timer, and only the newest payload is handed
+    to a single worker thread. Every submit() bumps a generation counter;
+    work for an older generation is skipped before it starts, can bail out
+    midway through `process(payload, cancelled)` and is never delivered.
+    Results come back to the Tk thread through a queue polled with
+    root.after, so `deliver(result)` always runs on the Tk thread and the
+    Tk thread never waits on the worker.
+
+    run_soon() hands other engine work (e.g. learning a finished word) to
+    the same worker, so it never blocks the Tk thread either. Such tasks
+    run before the next keystroke job and are never cancelled.
+    """
+
+    def __init__(self, root, process, deliver, debounce_ms=50, poll_ms=10):
+        self.root = root
+        self.process = process
+        self.deliver = deliver
+        self.debounce_ms = debounce_ms
+        self.poll_ms = poll_ms
+
+        self.generation = 0
+        self._debounce_id = None
+        self._poll_id = None
+        self._in_flight = None
+
+        self._jobs = threading.Condition()
+        self._pending = None
+        self._tasks = deque()
+        self._closed = False
+        self._results = queue.Queue()
+
+        self._worker = threading.Thread(target=self._run, name="smarttype-keystrokes", daemon=True)
+        self._worker.start()
+
+    # ---------------------------------------------------------
+    # TK THREAD
+    # ---------------------------------------------------------
+
+    def submit(self, payload):
+        """Queues `payload` as the newest input, superseding anything older."""
+        self.generation += 1
+        if self._debounce_id is not None:
+            self.root.after_cancel(self._debounce_id)
+        self._debounce_id = self.root.after(self.debounce_ms, self._dispatch, self.generation, payload)
+
+    def run_soon(self, fn, *args):
+        """Runs fn(*args) on the worker thread; the result is discarded."""
+        with self._jobs:
+            self._tasks.append((fn, args))
+            self._jobs.notify()
+
+    def close(self):
+        if self._debounce_id is not None:
+            self.root.after_cancel(self._debounce_id)
+            self._debounce_id = None
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        with self._jobs:
+            self._closed = True
+            self._jobs.notify()
+
+    def _dispatch(self, generation, payload):
+        self._debounce_id = None
+        with self._jobs:
+            # Replaces any job the worker has not picked up yet
+            self._pending = (generation, payload)
+            self._jobs.notify()
+
+        self._in_flight = generation
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+
+        finished = _MISSING
+        while True:
+            try:
+                generation, result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self._in_flight:
+                finished = result
+
+        if finished is _MISSING:
+            if self._in_flight == self.generation:
+                self._poll_id = self.root.after(self.poll_ms, self._poll)
+            return
+
+        # Text may have changed while the worker was busy: drop, don't show
+        in_flight, self._in_flight = self._in_flight, None
+        if finished is not _FAILED and in_flight == self.generation:
+            self.deliver(finished)
+
+    # ---------------------------------------------------------
+    # WORKER THREAD
+    # ---------------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self._jobs:
+                while self._pending is None and not self._tasks and not self._closed:
+                    self._jobs.wait()
+                if self._closed:
+                    return
+                task = self._tasks.popleft() if self._tasks else None
+                if task is None:
+                    generation, payload = self._pending
+                    self._pending = None
+
+            if task is not None:
+                fn, args = task
+                try:
+                    fn(*args)
+                except Exception as e:
+                    print(f"Error in background task: {e}")
+                continue
+
+            def cancelled(generation=generation):
+                return generation != self.generation
+
+            if cancelled():
+                continue
+
+            try:
+                result = self.process(payload, cancelled)
+            except Exception as e:
+                print(f"Error processing keystroke: {e}")
+                result = _FAILED
+
+            if not cancelled():
+                self._results.put((generation, result))
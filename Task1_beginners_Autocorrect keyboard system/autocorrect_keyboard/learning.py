@@ -0,0 +1,307 @@
+import os
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from model_store import MODEL_CACHE_DIR
+from ngram_store import BACKOFF
+
+# ---------------------------------------------------------
+# ONLINE LEARNING
+# ---------------------------------------------------------
+# Words the user types are counted in small in-memory overlays on top of
+# the frozen NgramStore (a few dict updates per word) and appended to a
+# write-ahead log. compact() folds the overlays into a new store snapshot
+# and empties the log, so restarts replay at most the text typed since the
+# last compaction. Which words get here at all is decided by the engine
+# (SmartTypeEngine.accept): unknown spellings only after the user kept
+# them over a shown correction.
+#
+# WAL format: a header line "#smarttype-wal <generation>", then one line
+# per accepted word: up to two context words and the word itself. The
+# generation ties the log to the store it was written against; a log older
+# than the store's generation has already been compacted and is dropped.
+
+DEFAULT_WAL_PATH = os.path.join(MODEL_CACHE_DIR, "learned.wal")
+
+WAL_HEADER = "#smarttype-wal"
+
+# A learned word counts as known vocabulary (and is no longer
+# autocorrected) once it has been learned this many times
+KNOWN_AFTER = 3
+
+_PREFIX_END = chr(0x10FFFF)
+
+
+class OnlineLearner:
+    """
+    Learned n-gram counts layered over an NgramStore.
+
+    Lookups merge the overlay with the store exactly as if the learned
+    text had been part of the corpus, including the tie order compact()
+    will produce, so compacting never changes a prediction.
+
+    With wal_path=None nothing is replayed or logged (e.g. in worker
+    processes, which must not touch the user's log).
+    """
+
+    def __init__(self, store, wal_path=DEFAULT_WAL_PATH):
+        self.store = store
+        self.wal_path = wal_path
+        self._lock = threading.Lock()
+        self._wal = None
+        self._reset()
+        self.wal_generation = store.generation
+        self._replay()
+
+    def _reset(self):
+        self.unigrams = Counter()
+        self.bigrams = defaultdict(Counter)
+        self.trigrams = defaultdict(Counter)
+        self.bigram_totals = Counter()
+        self.trigram_totals = Counter()
+        self.unigram_total = 0
+        self.pending = 0
+        # Learned words, sorted, for prefix lookups (completions)
+        self.words = []
+
+    # ---------------------------------------------------------
+    # LEARNING
+    # ---------------------------------------------------------
+
+    def observe(self, words):
+        """
+        Counts words[-1] after up to two context words (normalized,
+        lowercase) and logs it. Returns the bigram context word, if any,
+        whose follower ranking changed.
+        """
+        words = list(words[-3:])
+        if not words:
+            return None
+        with self._lock:
+            self._apply(words)
+            self._append(words)
+        return words[-2] if len(words) >= 2 else None
+
+    def learned_words(self):
+        """{word: count} learned since the last compaction."""
+        with self._lock:
+            return dict(self.unigrams)
+
+    def preload(self, unigrams):
+        """Counts words learned elsewhere (e.g. by a parent process) without logging them."""
+        with self._lock:
+            for word, count in unigrams.items():
+                if word not in self.unigrams:
+                    insort(self.words, word)
+                self.unigrams[word] += count
+                self.unigram_total += count
+
+    def _apply(self, words):
+        word = words[-1]
+        if word not in self.unigrams:
+            insort(self.words, word)
+        self.unigrams[word] += 1
+        self.unigram_total += 1
+        if len(words) >= 2:
+            self.bigrams[words[-2]][word] += 1
+            self.bigram_totals[words[-2]] += 1
+        if len(words) >= 3:
+            context = (words[-3], words[-2])
+            self.trigrams[context][word] += 1
+            self.trigram_totals[context] += 1
+        self.pending += 1
+
+    def knows(self, word):
+        """True once `word` has been learned at least KNOWN_AFTER times."""
+        return self.learned_count(word) >= KNOWN_AFTER
+
+    def learned_count(self, word):
+        """How often `word` has been learned, compacted or not."""
+        word_id = self.store.word_ids.get(word)
+        learned = int(self.store.learned[word_id]) if word_id is not None else 0
+        return learned + self.unigrams.get(word, 0)
+
+    # ---------------------------------------------------------
+    # LOOKUPS
+    # ---------------------------------------------------------
+
+    def completion_deltas(self, prefix, previous=None):
+        """
+        Learned counts for completing `prefix` (the prefix itself excluded):
+        (bigram deltas after `previous`, their total, unigram deltas, their
+        total, whether `previous` is a learned word).
+        """
+        with self._lock:
+            followers = self.bigrams.get(previous) if previous else None
+            bigrams = {word: count for word, count in followers.items()
+                       if word.startswith(prefix) and word != prefix} if followers else {}
+            lo = bisect_left(self.words, prefix)
+            hi = bisect_left(self.words, prefix + _PREFIX_END, lo)
+            unigrams = {word: self.unigrams[word] for word in self.words[lo:hi] if word != prefix}
+            return (bigrams, self.bigram_totals[previous] if previous else 0, unigrams, self.unigram_total,
+                    bool(previous) and previous in self.unigrams)
+
+    def bigram_followers(self, word, n):
+        """Like NgramStore.bigram_followers, with learned counts included."""
+        with self._lock:
+            return self._merged_followers((word,), n)
+
+    def predict(self, context, k=1):
+        """NgramStore.predict() over the store plus everything learned."""
+        with self._lock:
+            if not self.pending:
+                return self.store.predict(context, k)
+            if not context:
+                return []
+            last = context[-1]
+            if last not in self.store.word_ids and last not in self.unigrams:
+                return []
+
+            results = []
+            seen = set()
+            order = 3 if len(context) >= 2 else 2
+
+            if order == 3:
+                top, total = self._merged_followers((context[-2], last), k)
+                self._collect(results, seen, top, total, k, 1.0)
+            if len(results) < k:
+                top, total = self._merged_followers((last,), k + len(seen))
+                self._collect(results, seen, top, total, k, BACKOFF ** (order - 2))
+            if len(results) < k:
+                top, total = self._merged_unigrams(k + len(seen))
+                self._collect(results, seen, top, total, k, BACKOFF ** (order - 1))
+            return results
+
+    @staticmethod
+    def _collect(results, seen, top, total, k, weight):
+        for word, count in top:
+            if len(results) == k:
+                return
+            if word not in seen:
+                seen.add(word)
+                results.append((word, weight * count / total))
+
+    def _merged_followers(self, context, n):
+        if len(context) == 1:
+            top, total = self.store.bigram_followers(context[0], n)
+            delta, delta_total = self.bigrams.get(context[0]), self.bigram_totals[context[0]]
+        else:
+            top, total = self.store.trigram_followers(context[0], context[1], n)
+            delta, delta_total = self.trigrams.get(context), self.trigram_totals[context]
+        if not delta:
+            return top, total
+
+        # Store followers outside the top n may overtake with learned counts
+        base = self.store.follower_counts(context, delta)
+        # Ties keep the store's order; new followers rank after all of them
+        merged = {}
+        for rank, (word, count) in enumerate(top):
+            merged[word] = [count, (0, rank)]
+        for i, (word, count) in enumerate(delta.items()):
+            base_count, rank = base.get(word, (0, None))
+            entry = merged.setdefault(word, [base_count, (1, i) if rank is None else (0, rank)])
+            entry[0] += count
+
+        ranked = sorted(merged.items(), key=lambda item: (-item[1][0], item[1][1]))
+        return [(word, count) for word, (count, _) in ranked[:n]], total + delta_total
+
+    def _merged_unigrams(self, n):
+        store = self.store
+        counts = dict(store.top_unigrams(n))
+        for word, count in self.unigrams.items():
+            word_id = store.word_ids.get(word)
+            counts[word] = (int(store.unigrams[word_id]) if word_id is not None else 0) + count
+        # Store ids are alphabetical, so ties go to the alphabetically first word
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:n], store.total + self.unigram_total
+
+    # ---------------------------------------------------------
+    # WRITE-AHEAD LOG & COMPACTION
+    # ---------------------------------------------------------
+
+    def _append(self, words):
+        if self.wal_path is None:
+            return
+        if self._wal is None:
+            self._wal = self._open_wal()
+        self._wal.write(" ".join(words) + "\n")
+        self._wal.flush()
+
+    def _open_wal(self):
+        os.makedirs(os.path.dirname(self.wal_path) or ".", exist_ok=True)
+        size = os.path.getsize(self.wal_path) if os.path.exists(self.wal_path) else 0
+        torn = False
+        if size:
+            with open(self.wal_path, "rb") as f:
+                f.seek(size - 1)
+                torn = f.read(1) != b"\n"
+        wal = open(self.wal_path, "a", encoding="utf-8")
+        if not size:
+            wal.write(f"{WAL_HEADER} {self.wal_generation}\n")
+        elif torn:
+            # Terminate a torn line so it stays ignored
+            wal.write("\n")
+        return wal
+
+    def _replay(self):
+        if self.wal_path is None or not os.path.exists(self.wal_path):
+            return
+        with open(self.wal_path, encoding="utf-8", errors="replace") as f:
+            header = f.readline().split()
+            generation = int(header[1]) if len(header) == 2 and header[0] == WAL_HEADER and \
+                header[1].isdigit() else -1
+            if generation < self.store.generation:
+                # Already compacted into the store (or not a log at all)
+                self._rewrite_wal()
+                return
+            self.wal_generation = generation
+            for line in f:
+                words = line.split()
+                # A torn last line (crash mid-write) has no newline
+                if line.endswith("\n") and 0 < len(words) <= 3 and all(w.isalpha() for w in words):
+                    self._apply(words)
+
+    def _rewrite_wal(self):
+        # Atomically replace the log with an empty one for wal_generation
+        if self.wal_path is None:
+            return
+        os.makedirs(os.path.dirname(self.wal_path) or ".", exist_ok=True)
+        tmp_path = self.wal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f"{WAL_HEADER} {self.wal_generation}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.wal_path)
+
+    def compact(self, path, fingerprint, prune=None):
+        """
+        Writes store + learned counts as a new snapshot at `path`, starts
+        an empty log and returns the new store. `prune(store)`, if given,
+        shrinks the merged store again before it is saved (see prune.py).
+        """
+        with self._lock:
+            bigrams = {(w1, w2): c for w1, followers in self.bigrams.items() for w2, c in followers.items()}
+            trigrams = {(w1, w2, w3): c for (w1, w2), followers in self.trigrams.items()
+                        for w3, c in followers.items()}
+            store = self.store.with_deltas(self.unigrams, bigrams, trigrams, self.unigrams)
+            if prune is not None:
+                store = prune(store)
+            store.generation = max(self.store.generation, self.wal_generation) + 1
+            store.save(path, fingerprint)
+
+            # Crash before this point: the old log is replayed on top of the old store.
+            # Crash after save(): the log's generation is stale and it is dropped.
+            self.close()
+            self.wal_generation = store.generation
+            self._rewrite_wal()
+            self.store = store
+            self._reset()
+            return store
+
+    def close(self):
+        if self._wal is not None:
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+            self._wal.close()
+            self._wal = None
@@ -1,10 +1,12 @@
 import tkinter as tk
 from tkinter import font
-import nltk
-from nltk.corpus import gutenberg
-from spellchecker import SpellChecker
-from collections import Counter, defaultdict
 import threading
+import queue
+import time
+from engine import SmartTypeEngine
+from keystroke_pipeline import KeystrokePipeline
+from metrics import SessionRecorder
+from token_tracker import TokenTracker
 
 class Config:
     # Colors
@@ -13,6 +15,7 @@ class Config:
     HEADER_GRADIENT_START = "#1E3A8A"
     HEADER_GRADIENT_END = "#2563EB"
     SUCCESS_GREEN = "#22C55E"
+    LOADING_AMBER = "#F59E0B"
     ACCENT_RED = "#EF4444"
     CARD_WHITE = "#FFFFFF"
     TEXT_DARK = "#1F2937"
@@ -21,6 +24,48 @@ class Config:
     # Fonts
     FONT_FAMILY = "Segoe UI"
 
+    # Background loading
+    LOAD_POLL_MS = 50
+
+    # Prediction card: best guess plus (PREDICTION_COUNT - 1) alternatives,
+    # and up to COMPLETION_COUNT completions of the word being typed
+    PREDICTION_COUNT = 3
+    COMPLETION_COUNT = 3
+
+    # Correction backend: "pyspellchecker" or "symspell" (same results, see
+    # `python benchmarks.py correction`). SymSpell falls back to
+    # pyspellchecker while its index is being loaded or built.
+    CORRECTION_BACKEND = "symspell"
+
+    # Keystroke pipeline: quiet period before a burst of keys is processed
+    KEY_DEBOUNCE_MS = 50
+    KEY_POLL_MS = 10
+
+    # Training text for predictions: "nltk:<corpus>" and/or local directories
+    # of .txt files, counted in BUILD_PROCESSES workers (None = one per CPU)
+    CORPUS_SOURCES = ("nltk:gutenberg",)
+    BUILD_PROCESSES = None
+
+    # Low-RAM mode: prune the n-gram tables to MODEL_BUDGET_MB and/or store
+    # counts as "uint8"/"uint16" codes (see prune.py; None = full model)
+    MODEL_BUDGET_MB = None
+    QUANTIZE_COUNTS = None
+
+    # Learn the user's words as they type (see learning.py); the learned
+    # log is folded into the model snapshot on startup every COMPACT_EVERY words
+    LEARN_FROM_TYPING = True
+    COMPACT_EVERY = 1000
+
+    # Memoized corrections/predictions per engine cache (0 disables caching)
+    CACHE_SIZE = 4096
+
+    # Latency instrumentation (see metrics.py): show the keystroke p99 in
+    # the status badge, and/or record key releases to a JSON-lines file
+    # for `python benchmarks.py replay --session <file>`
+    SHOW_LATENCY = False
+    LATENCY_REFRESH_MS = 1000
+    RECORD_SESSION = None
+
 class AutocorrectKeyboard: # Class name preserved
     def __init__(self, root):
         self.root = root
@@ -30,20 +75,35 @@ class AutocorrectKeyboard: # Class name preserved
         self.root.geometry("1100x750") # Slightly larger for better spacing
         self.root.configure(bg=Config.BG_COLOR)
 
-        # Initialize SpellChecker (Logic preserved)
-        self.spell = SpellChecker()
+        # Correction/prediction engine, filled in stage by stage by the loader thread
+        self.engine = SmartTypeEngine(backend=Config.CORRECTION_BACKEND, cache_size=Config.CACHE_SIZE,
+                                      sources=Config.CORPUS_SOURCES, build_processes=Config.BUILD_PROCESSES,
+                                      learn=Config.LEARN_FROM_TYPING, compact_every=Config.COMPACT_EVERY,
+                                      memory_budget=None if Config.MODEL_BUDGET_MB is None
+                                      else int(Config.MODEL_BUDGET_MB * 2 ** 20),
+                                      quantize=Config.QUANTIZE_COUNTS)
+
+        self.metrics = self.engine.metrics
+        self.recorder = SessionRecorder(Config.RECORD_SESSION) if Config.RECORD_SESSION else None
 
-        # Data for prediction (Logic preserved)
-        self.bigram_model = defaultdict(Counter)
+        # Loader thread -> UI thread messages: (kind, payload)
+        self.load_queue = queue.Queue()
 
         # UI Setup (Method rewritten for new UI)
         self.setup_ui()
 
-        # Load resources (Logic preserved, just updated UI labels)
-        self.status_label.config(text="● Loading...", fg="#F59E0B") # Amber
-        self.root.update()
-        self.load_resources()
-        self.status_label.config(text="● System Ready", fg=Config.SUCCESS_GREEN)
+        # Word at the cursor is tracked incrementally, independent of buffer size
+        self.token_tracker = TokenTracker(self.input_box)
+
+        # Corrections/predictions run on a worker thread, results come back via root.after
+        self.pipeline = KeystrokePipeline(self.root, self.compute_suggestions, self.show_suggestions,
+                                          debounce_ms=Config.KEY_DEBOUNCE_MS, poll_ms=Config.KEY_POLL_MS)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Load resources in the background so the window stays responsive
+        self.status_label.config(text="● Loading...", fg=Config.LOADING_AMBER)
+        threading.Thread(target=self.load_resources, name="smarttype-loader", daemon=True).start()
+        self.root.after(Config.LOAD_POLL_MS, self.poll_load_queue)
 
     def setup_ui(self):
         # ---------------------------------------------------------
@@ -106,6 +166,7 @@ class AutocorrectKeyboard: # Class name preserved
         
         # Binding preserved
         self.input_box.bind("<KeyRelease>", self.on_key_release)
+        self.input_box.bind("<Escape>", self.on_keep_word)
 
         # Spacing
         tk.Frame(container, bg=Config.BG_COLOR, height=20).pack()
@@ -133,6 +194,14 @@ class AutocorrectKeyboard: # Class name preserved
                                          bg=Config.CARD_WHITE, fg=Config.TEXT_DARK, pady=15)
         self.prediction_label.pack(anchor="w")
 
+        self.alternatives_label = tk.Label(pred_card_frame, text="", font=self.subtitle_font,
+                                           bg=Config.CARD_WHITE, fg=Config.TEXT_LIGHT)
+        self.alternatives_label.pack(anchor="w")
+
+        self.completions_label = tk.Label(pred_card_frame, text="", font=self.subtitle_font,
+                                          bg=Config.CARD_WHITE, fg=Config.PRIMARY_BLUE)
+        self.completions_label.pack(anchor="w")
+
         # --- CORRECTION CARD (Red Accent) ---
         corr_card_frame = tk.Frame(results_frame, bg=Config.CARD_WHITE, padx=20, pady=20)
         corr_card_frame.grid(row=0, column=1, sticky="ew", padx=(10, 0))
@@ -153,76 +222,114 @@ class AutocorrectKeyboard: # Class name preserved
                  bg=Config.BG_COLOR, fg=Config.TEXT_LIGHT).pack(side="bottom", pady=10)
 
     # ---------------------------------------------------------
-    # LOGIC (PRESERVED EXACTLY AS IS)
+    # LOGIC
     # ---------------------------------------------------------
 
     def load_resources(self):
-        # Step 1: Download/Verify NLTK data
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt')
-        
+        # Runs on the loader thread: never touch Tk widgets here, only post
+        # progress to self.load_queue (drained by poll_load_queue).
+        post = self.load_queue.put
         try:
-            nltk.data.find('corpora/gutenberg')
-        except LookupError:
-            nltk.download('gutenberg')
+            self.engine.load(progress=lambda message: post(("status", message)))
+            post(("ready", None))
+        except Exception as e:
+            post(("error", e))
 
-        # Step 1b: Build Bigram Model
-        print("Building Bigram Model...")
-        words = gutenberg.words()
-        
-        prev_word = None
-        for word in words:
-            word = word.lower()
-            if not word.isalpha(): 
-                continue
-                
-            if prev_word:
-                self.bigram_model[prev_word][word] += 1
-            prev_word = word
-            
-        print("Model Built.")
+    def poll_load_queue(self):
+        # Runs on the Tk thread via root.after
+        while True:
+            try:
+                kind, payload = self.load_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "status":
+                self.status_label.config(text=payload, fg=Config.LOADING_AMBER)
+            elif kind == "ready":
+                self.status_label.config(text="● System Ready", fg=Config.SUCCESS_GREEN)
+                if Config.SHOW_LATENCY:
+                    self.root.after(Config.LATENCY_REFRESH_MS, self.show_latency)
+                return
+            elif kind == "error":
+                print(f"Error loading resources: {payload}")
+                self.status_label.config(text="● Load Failed", fg=Config.ACCENT_RED)
+                return
+
+        self.root.after(Config.LOAD_POLL_MS, self.poll_load_queue)
 
     def on_key_release(self, event):
-        # 1) Get full text
-        full_text = self.input_box.get("1.0", "end-1c")
-        
-        # 2) rpartition to get last word
-        head, sep, tail = full_text.rpartition(' ')
-        last_word = tail
-        
-        # 3) If last word is empty (user pressed space), use previous word
-        if not last_word and sep:
-             _, _, prev = head.rpartition(' ')
-             last_word = prev if prev else head
-        
-        # Clean the word
-        clean_word = ''.join(filter(str.isalpha, last_word))
-        
-        if not clean_word:
-            self.correction_label.config(text="...")
-            self.prediction_label.config(text="...")
-            return
+        # Tk thread: 1-3) grab the word at the cursor (or the previous word right
+        # after a space) plus the word before it, and hand them to the pipeline,
+        # never wait on the engine
+        pressed = time.perf_counter()
+        if self.recorder is not None:
+            self.recorder.record(event.keysym, event.char)
+        context = self.token_tracker.current_context()
+        self.metrics.since("fetch", pressed)
+        self.pipeline.submit((pressed, context))
+
+        # A word was just finished with a space/newline: learn it on the
+        # pipeline's worker, never on the Tk thread
+        if Config.LEARN_FROM_TYPING and event.char and event.char.isspace():
+            words = self.token_tracker.finished_words()
+            if words:
+                self.pipeline.run_soon(self.engine.accept, words)
 
-        # 5) SpellChecker
-        corrected = self.spell.correction(clean_word)
-        if corrected is None:
-            corrected = clean_word
+    def on_keep_word(self, event):
+        # Esc: keep the word at the cursor as typed instead of its correction,
+        # so typing it from now on teaches it to the model
+        _, word, _ = self.token_tracker.current_context()
+        if Config.LEARN_FROM_TYPING and word:
+            self.pipeline.run_soon(self.engine.reject, word)
 
-        # 6) Show corrected word
-        self.correction_label.config(text=f"{corrected}")
+    def on_close(self):
+        self.pipeline.close()
+        self.engine.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        self.root.destroy()
 
-        # 7) Search in Bigram Model
-        lookup_word = corrected.lower()
-        next_words = self.bigram_model.get(lookup_word)
+    def compute_suggestions(self, payload, cancelled):
+        # Pipeline worker thread: no Tk calls in here
+        pressed, (previous, last_word, in_word) = payload
+        return pressed, self.engine.keystroke(previous, last_word, in_word, Config.PREDICTION_COUNT,
+                                              Config.COMPLETION_COUNT, cancelled)
 
-        # 8) Show most probable next word
-        if next_words:
-            best_guess = next_words.most_common(1)[0][0]
-            self.prediction_label.config(text=best_guess)
+    def show_suggestions(self, result):
+        # Tk thread: 6) show corrected word, 8) show most probable next words
+        # and completions of the word being typed
+        pressed, (corrected, predictions, completions) = result
+        start = time.perf_counter()
+        self.correction_label.config(text="..." if corrected is None else corrected)
+        words = " · ".join(word for word, _ in completions or [])
+        self.completions_label.config(text=f"complete: {words}" if words else "")
+
+        if predictions is None:
+            self.prediction_label.config(text="loading...")
+            self.alternatives_label.config(text="")
         else:
+            self.show_predictions(predictions)
+
+        # Key release -> labels updated, including debounce and queueing
+        self.metrics.since("labels", start)
+        self.metrics.since("end_to_end", pressed)
+
+    def show_latency(self):
+        # Tk thread, every LATENCY_REFRESH_MS once the engine is ready
+        p99 = self.metrics.percentile("end_to_end", 99)
+        if p99 is not None:
+            self.status_label.config(text=f"● System Ready · p99 {p99 * 1000:.0f} ms")
+        self.root.after(Config.LATENCY_REFRESH_MS, self.show_latency)
+
+    def show_predictions(self, predictions):
+        if not predictions:
             self.prediction_label.config(text="...")
+            self.alternatives_label.config(text="")
+            return
+
+        self.prediction_label.config(text=predictions[0][0])
+        alternatives = " · ".join(word for word, _ in predictions[1:])
+        self.alternatives_label.config(text=f"also: {alternatives}" if alternatives else "")
 
 if __name__ == "__main__":
     root = tk.Tk()
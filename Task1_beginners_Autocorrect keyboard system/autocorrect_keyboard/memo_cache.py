@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict, defaultdict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Size-bounded, thread-safe least-recently-used cache with hit, miss and
+    eviction counters.
+
+    clear() starts a new generation. A value computed against an older
+    model is dropped by put() when its generation is stale, so a worker
+    that was mid-computation during a model update cannot re-populate the
+    cache with an outdated answer. A capacity of 0 disables caching.
+
+    With a `tag(key)` function, keys are also indexed by tag, so
+    discard_tags() drops exactly the entries for some tags without
+    scanning the cache.
+    """
+
+    def __init__(self, capacity=4096, tag=None):
+        if capacity < 0:
+            raise ValueError("capacity must be >= 0")
+        self.capacity = capacity
+        self.tag = tag
+        self._tagged = defaultdict(set)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        """Stores `value`, unless it was computed for an older generation."""
+        if not self.capacity:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key not in self._entries and self.tag is not None:
+                self._tagged[self.tag(key)].add(key)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                evicted, _ = self._entries.popitem(last=False)
+                self._untag(evicted)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Cached value for `key`, computing and storing it on a miss."""
+        generation = self.generation
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            if value is not None:
+                self.put(key, value, generation)
+        return value
+
+    def discard_tags(self, tags):
+        """Drops the entries tagged with any of `tags`; returns how many were dropped."""
+        with self._lock:
+            dropped = 0
+            for tag in tags:
+                for key in self._tagged.pop(tag, ()):
+                    del self._entries[key]
+                    dropped += 1
+            # Results being computed right now may be stale too
+            self.generation += 1
+            return dropped
+
+    def clear(self):
+        """Drops every entry (e.g. after a model update); counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._tagged.clear()
+            self.generation += 1
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def _untag(self, key):
+        if self.tag is not None:
+            tag = self.tag(key)
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,177 @@
+import json
+import threading
+import time
+
+# ---------------------------------------------------------
+# LATENCY HISTOGRAM
+# ---------------------------------------------------------
+# HDR-style log-linear buckets over whole microseconds: values below
+# 2 * SUB_BUCKETS get one bucket each, every power of two above that is
+# split into SUB_BUCKETS equal buckets. Recording is O(1), memory is a few
+# KB no matter how many values, and every reported percentile is within
+# 1 / SUB_BUCKETS (~1.6%) of the true value.
+
+SUB_BUCKETS = 64
+_LINEAR = 2 * SUB_BUCKETS
+_SUB_BITS = SUB_BUCKETS.bit_length()  # bits of a value in [SUB_BUCKETS, 2 * SUB_BUCKETS)
+
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.counts = [0] * _LINEAR
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = max(0, int(seconds * 1_000_000))
+        index = _bucket(micros)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Value (seconds) at or below which q percent of recordings fall."""
+        if not self.count:
+            return 0.0
+        rank = max(1, -(-self.count * q // 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_top(index) / 1_000_000, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def merge(self, other):
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, n in enumerate(other.counts):
+            self.counts[index] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def summary(self):
+        """count plus mean/p50/p95/p99/max in milliseconds."""
+        return {
+            "count": self.count,
+            "mean": self.mean * 1000,
+            "p50": self.percentile(50) * 1000,
+            "p95": self.percentile(95) * 1000,
+            "p99": self.percentile(99) * 1000,
+            "max": self.max * 1000,
+        }
+
+
+def _bucket(micros):
+    if micros < _LINEAR:
+        return micros
+    shift = micros.bit_length() - _SUB_BITS
+    return _LINEAR + (shift - 1) * SUB_BUCKETS + (micros >> shift) - SUB_BUCKETS
+
+
+def _bucket_top(index):
+    # Largest value that falls into bucket `index`
+    if index < _LINEAR:
+        return index
+    shift = (index - _LINEAR) // SUB_BUCKETS + 1
+    mantissa = (index - _LINEAR) % SUB_BUCKETS + SUB_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+
+# ---------------------------------------------------------
+# STAGE TIMERS
+# ---------------------------------------------------------
+
+class Metrics:
+    """
+    Named latency histograms, one per hot-path stage. Safe to record from
+    the Tk thread and worker threads at the same time.
+
+        start = time.perf_counter()
+        ...
+        metrics.record("correct", time.perf_counter() - start)
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def since(self, stage, start):
+        """Records the time elapsed since perf_counter() value `start`."""
+        self.record(stage, time.perf_counter() - start)
+
+    def percentile(self, stage, q):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            return histogram.percentile(q) if histogram is not None else None
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+
+    def summary(self):
+        """{stage: LatencyHistogram.summary()}, ready for json.dump."""
+        with self._lock:
+            return {stage: histogram.summary() for stage, histogram in self.stages.items()}
+
+    def report(self, label="stage"):
+        lines = [f"{label:<16}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)"]
+        for stage, s in self.summary().items():
+            lines.append(f"{stage:<16}{s['count']:>8}{s['mean']:>10.3f}{s['p50']:>10.3f}"
+                         f"{s['p95']:>10.3f}{s['p99']:>10.3f}{s['max']:>10.3f}")
+        return "\n".join(lines)
+
+
+# ---------------------------------------------------------
+# TYPING SESSIONS
+# ---------------------------------------------------------
+# A recorded session is JSON lines, one per key release:
+#   {"t": seconds since the first key, "keysym": "BackSpace", "char": ""}
+
+class SessionRecorder:
+
+    def __init__(self, path):
+        self.file = open(path, "a", encoding="utf-8")
+        self.start = None
+
+    def record(self, keysym, char):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        self.file.write(json.dumps({"t": round(now - self.start, 4), "keysym": keysym, "char": char}) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+def replay_session(path):
+    """Yields the text before the cursor after each recorded key."""
+    buffer = ""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            char = event["char"]
+            if event["keysym"] == "BackSpace":
+                buffer = buffer[:-1]
+            elif char and (char.isprintable() or char in "\r\n\t"):
+                buffer += "\n" if char == "\r" else char
+            # Modifiers, arrows etc. change nothing, but the UI still handles the release
+            yield buffer
@@ -0,0 +1,160 @@
+import os
+import sys
+import mmap
+import struct
+import hashlib
+from collections import Counter, defaultdict
+
+# ---------------------------------------------------------
+# SNAPSHOT FORMAT
+# ---------------------------------------------------------
+# A snapshot is a single little-endian file of named, typed arrays:
+#
+#   header   : magic, format version, fingerprint, section count
+#   sections : name, typecode, byte offset, item count (one entry each)
+#   payload  : raw arrays, each aligned to 8 bytes
+#
+# What the sections mean is up to the caller (see ngram_store.py and
+# symspell.py). The fingerprint identifies the inputs a snapshot was built
+# from; a mismatch makes read_sections() report the file as stale.
+
+MAGIC = b"SMTYPE\x00\x00"
+FORMAT_VERSION = 2
+
+# Bump whenever normalize_tokens() changes, so old snapshots are rebuilt.
+TOKENIZER_VERSION = 1
+
+MODEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_cache")
+
+_HEADER = struct.Struct("<8sI32sI")
+_SECTION = struct.Struct("<16scQQ")
+_ALIGN = 8
+
+
+def normalize_tokens(words):
+    """Lowercases tokens and drops anything that is not purely alphabetic."""
+    for word in words:
+        word = word.lower()
+        if word.isalpha():
+            yield word
+
+
+def build_bigram_model(words):
+    """
+    Counts word -> next word transitions over a token stream into a
+    defaultdict(Counter). Kept as the reference model for benchmarks.
+    """
+    bigram_model = defaultdict(Counter)
+
+    prev_word = None
+    for word in normalize_tokens(words):
+        if prev_word:
+            bigram_model[prev_word][word] += 1
+        prev_word = word
+
+    return bigram_model
+
+
+def corpus_fingerprint(corpus):
+    """
+    Hashes everything a snapshot depends on: the format and tokenizer
+    versions plus the identity of every file in the NLTK corpus. Files on
+    disk are identified by size and mtime; anything else (e.g. zipped
+    corpora) falls back to hashing the raw text.
+    """
+    digest = hashlib.sha256(f"{FORMAT_VERSION}:{TOKENIZER_VERSION}".encode())
+
+    for fileid in sorted(corpus.fileids()):
+        digest.update(fileid.encode("utf-8"))
+        path = getattr(corpus.abspath(fileid), "path", None)
+        if path and os.path.isfile(path):
+            stat = os.stat(path)
+            digest.update(f":{stat.st_size}:{stat.st_mtime_ns};".encode())
+        else:
+            digest.update(corpus.raw(fileid).encode("utf-8"))
+
+    return digest.digest()
+
+
+# ---------------------------------------------------------
+# LOW-LEVEL SECTION I/O
+# ---------------------------------------------------------
+
+def write_sections(path, fingerprint, sections):
+    """
+    Writes named arrays to `path` atomically. Sections may be bytes,
+    array.array or any other contiguous buffer (e.g. NumPy arrays).
+    """
+    if sys.byteorder != "little":
+        raise OSError("snapshots can only be written on little-endian hosts")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    table_size = _HEADER.size + _SECTION.size * len(sections)
+    offset = _aligned(table_size)
+
+    entries = []
+    for name, data in sections.items():
+        view = memoryview(data)
+        typecode = view.format
+        count = view.nbytes // view.itemsize
+        entries.append((name, typecode, offset, count, view))
+        offset = _aligned(offset + view.nbytes)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, fingerprint, len(entries)))
+        for name, typecode, offset, count, _ in entries:
+            f.write(_SECTION.pack(name.encode("ascii"), typecode.encode("ascii"), offset, count))
+
+        for _, _, offset, _, view in entries:
+            f.write(b"\x00" * (offset - f.tell()))
+            f.write(view.cast("B") if view.c_contiguous else view.tobytes())
+
+    os.replace(tmp_path, path)
+
+
+def read_sections(path, fingerprint):
+    """
+    Memory-maps a snapshot and returns {name: memoryview}, or None when
+    the file is missing, corrupt, from another format version or was
+    built from a different corpus/tokenizer.
+    """
+    if not os.path.exists(path) or sys.byteorder != "little":
+        return None
+
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        magic, version, stored_fingerprint, n_sections = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or stored_fingerprint != fingerprint:
+            mm.close()
+            return None
+
+        view = memoryview(mm)
+        sections = {}
+        for i in range(n_sections):
+            raw_name, typecode, offset, count = _SECTION.unpack_from(mm, _HEADER.size + i * _SECTION.size)
+            typecode = typecode.decode("ascii")
+            end = offset + count * _itemsize(typecode)
+            if end > len(mm):
+                raise ValueError("truncated snapshot")
+            section = view[offset:end]
+            sections[raw_name.rstrip(b"\x00").decode("ascii")] = (
+                section if typecode == "B" else section.cast(typecode))
+        return sections
+    except (struct.error, ValueError, TypeError):
+        # Views may already point into the map; let GC unmap it
+        return None
+
+
+def _itemsize(typecode):
+    return struct.calcsize(typecode)
+
+
+def _aligned(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
@@ -0,0 +1,441 @@
+import os
+from collections import Counter
+
+import numpy as np
+
+from memo_cache import LRUCache
+from model_store import MODEL_CACHE_DIR, normalize_tokens, read_sections, write_sections
+
+# ---------------------------------------------------------
+# N-GRAM STORE
+# ---------------------------------------------------------
+# Words are integer ids into an alphabetically sorted vocabulary. Counts
+# live in flat NumPy arrays, CSR style:
+#
+#   unigrams[w]                              -> count of w
+#   bi_offsets[w] .. bi_offsets[w + 1]       -> bi_next / bi_counts after w
+#   tri_keys[i] = w1 * V + w2 (sorted)
+#   tri_offsets[i] .. tri_offsets[i + 1]     -> tri_next / tri_counts after (w1, w2)
+#   learned[w]                               -> times the user typed w (learning.py)
+#
+# Every follower slice is ordered by count (descending, ties by first
+# occurrence, like Counter.most_common), so top-k is a slice.
+#
+# A pruned store (prune.py) may hold bi_counts/tri_counts as small
+# log-scaled codes; the optional count_codes table maps a code back to an
+# approximate count, and decode() must be applied before using counts.
+#
+# Predictions use stupid backoff (Brants et al., 2007): the trigram
+# relative frequency when the trigram was seen, otherwise BACKOFF times
+# the bigram score, otherwise BACKOFF^2 times the unigram frequency.
+
+BACKOFF = 0.4
+
+DEFAULT_MODEL_PATH = os.path.join(MODEL_CACHE_DIR, "ngram.smt")
+
+# Trigram keys are packed as (w1 * V + w2) * V + w3 into an int64
+MAX_VOCAB = 2 ** 21 - 1
+
+# Follower rows sorted by word id, kept for the contexts looked up most recently
+FOLLOWER_INDEX_SIZE = 1024
+
+_SECTIONS = ("unigrams", "bi_offsets", "bi_next", "bi_counts",
+             "tri_keys", "tri_offsets", "tri_next", "tri_counts", "learned")
+
+
+class NgramStore:
+
+    def __init__(self, vocab, arrays, generation=0):
+        self.vocab = vocab
+        # Number of times learned text has been compacted into this store
+        self.generation = generation
+        self.word_ids = {word: i for i, word in enumerate(vocab)}
+        for name in _SECTIONS:
+            setattr(self, name, np.asarray(arrays[name]))
+        count_codes = arrays.get("count_codes")
+        self.count_codes = None if count_codes is None else np.asarray(count_codes)
+
+        if len(self.bi_offsets) != len(vocab) + 1 or len(self.tri_offsets) != len(self.tri_keys) + 1:
+            raise ValueError("n-gram sections do not match the vocabulary")
+
+        self.total = int(self.unigrams.sum())
+        # Unigram backoff candidates, most frequent first
+        self.unigram_rank = np.argsort(-self.unigrams.astype(np.int64), kind="stable")
+        # (order, row start) -> (follower ids sorted, their positions in the row)
+        self._follower_index = LRUCache(FOLLOWER_INDEX_SIZE)
+
+    # ---------------------------------------------------------
+    # BUILDING
+    # ---------------------------------------------------------
+
+    @classmethod
+    def build(cls, sequences):
+        """
+        Builds the store from an iterable of token sequences (e.g. one per
+        file). N-grams never span two sequences.
+        """
+        word_ids = {}
+        id_sequences = []
+        for words in sequences:
+            ids = np.fromiter((word_ids.setdefault(w, len(word_ids)) for w in normalize_tokens(words)),
+                              dtype=np.int64)
+            id_sequences.append(ids)
+
+        # Re-number ids so the vocabulary is sorted alphabetically
+        vocab = sorted(word_ids)
+        remap = np.empty(len(vocab), dtype=np.int64)
+        remap[[word_ids[word] for word in vocab]] = np.arange(len(vocab))
+        return cls.from_id_sequences(vocab, [remap[ids] for ids in id_sequences])
+
+    @classmethod
+    def from_id_sequences(cls, vocab, id_sequences):
+        V = len(vocab)
+        return cls.from_counts(vocab, [count_ids(ids, V) for ids in id_sequences])
+
+    @classmethod
+    def from_counts(cls, vocab, partials):
+        """
+        Merges partial counts (see count_ids), all over the same `vocab`
+        and given in corpus order, into one store.
+        """
+        V = len(vocab)
+        if V > MAX_VOCAB:
+            raise ValueError(f"vocabulary of {V} words exceeds the n-gram key space")
+
+        unigrams = np.zeros(V, dtype=np.uint64)
+        bigrams, trigrams = [], []
+        position = 0
+        for partial in partials:
+            unigrams += partial["unigrams"].astype(np.uint64)
+            # First occurrences become positions in the concatenated corpus
+            keys, counts, first = partial["bigrams"]
+            bigrams.append((keys, counts, first + position))
+            keys, counts, first = partial["trigrams"]
+            trigrams.append((keys, counts, first + position))
+            position += partial["tokens"]
+
+        bi_ctx, bi_next, bi_counts = _rank_ngrams(_merge_keys(bigrams), V)
+        tri_ctx, tri_next, tri_counts = _rank_ngrams(_merge_keys(trigrams), V)
+
+        bi_offsets = np.zeros(V + 1, dtype=np.int64)
+        np.cumsum(np.bincount(bi_ctx, minlength=V), out=bi_offsets[1:])
+
+        tri_unique, tri_starts = np.unique(tri_ctx, return_index=True)
+        tri_offsets = np.append(tri_starts, len(tri_ctx)).astype(np.int64)
+
+        return cls(vocab, {
+            "unigrams": unigrams,
+            "bi_offsets": bi_offsets,
+            "bi_next": bi_next.astype(np.uint32),
+            "bi_counts": bi_counts.astype(np.uint32),
+            "tri_keys": tri_unique.astype(np.int64),
+            "tri_offsets": tri_offsets,
+            "tri_next": tri_next.astype(np.uint32),
+            "tri_counts": tri_counts.astype(np.uint32),
+            "learned": np.zeros(V, dtype=np.uint32),
+        })
+
+    def with_deltas(self, unigrams, bigrams, trigrams, learned):
+        """
+        A new store with extra counts added: unigrams/learned map word ->
+        count, bigrams (w1, w2) -> count and trigrams (w1, w2, w3) -> count.
+        Among equal counts, n-grams already in the store keep their rank.
+        """
+        words = set(unigrams) | set(learned)
+        for table in (bigrams, trigrams):
+            for key in table:
+                words.update(key)
+        vocab = sorted(set(self.vocab) | words)
+        word_ids = {word: i for i, word in enumerate(vocab)}
+        V, old_V = len(vocab), len(self.vocab)
+        remap = np.fromiter((word_ids[word] for word in self.vocab), dtype=np.int64, count=old_V)
+
+        def extra_counts(table):
+            return np.fromiter((word_ids[word] for word in table), dtype=np.int64, count=len(table)), \
+                np.fromiter(table.values(), dtype=np.int64, count=len(table))
+
+        def extra_keys(table, order):
+            keys = np.zeros(len(table), dtype=np.int64)
+            for position in range(order):
+                keys = keys * V + np.fromiter((word_ids[key[position]] for key in table),
+                                              dtype=np.int64, count=len(table))
+            return keys, np.fromiter(table.values(), dtype=np.int64, count=len(table)), np.arange(len(table))
+
+        # Existing rows first, in their current (ranked) order
+        bi_ctx = np.repeat(np.arange(old_V), np.diff(self.bi_offsets))
+        bi_keys = remap[bi_ctx] * V + remap[self.bi_next]
+        first_ctx, second_ctx = np.divmod(np.repeat(self.tri_keys, np.diff(self.tri_offsets)), old_V)
+        tri_keys = (remap[first_ctx] * V + remap[second_ctx]) * V + remap[self.tri_next]
+
+        base_unigrams = np.zeros(V, dtype=np.int64)
+        base_unigrams[remap] = self.unigrams
+        base = {
+            "tokens": max(len(bi_keys), len(tri_keys)),
+            "unigrams": base_unigrams,
+            "bigrams": (bi_keys, self.decode(self.bi_counts).astype(np.int64), np.arange(len(bi_keys))),
+            "trigrams": (tri_keys, self.decode(self.tri_counts).astype(np.int64), np.arange(len(tri_keys))),
+        }
+
+        extra_unigrams = np.zeros(V, dtype=np.int64)
+        ids, counts = extra_counts(unigrams)
+        extra_unigrams[ids] += counts
+        extra = {
+            "tokens": 0,
+            "unigrams": extra_unigrams,
+            "bigrams": extra_keys(bigrams, 2),
+            "trigrams": extra_keys(trigrams, 3),
+        }
+
+        store = NgramStore.from_counts(vocab, [base, extra])
+        store.learned[remap] = self.learned
+        ids, counts = extra_counts(learned)
+        store.learned[ids] += counts.astype(np.uint32)
+        store.generation = self.generation + 1
+        return store
+
+    # ---------------------------------------------------------
+    # PERSISTENCE
+    # ---------------------------------------------------------
+
+    def save(self, path, fingerprint):
+        sections = {"vocab": "\n".join(self.vocab).encode("utf-8"),
+                    "generation": np.array([self.generation], dtype=np.uint64)}
+        for name in _SECTIONS:
+            sections[name] = np.ascontiguousarray(getattr(self, name))
+        if self.count_codes is not None:
+            sections["count_codes"] = np.ascontiguousarray(self.count_codes)
+        write_sections(path, fingerprint, sections)
+
+    @classmethod
+    def load(cls, path, fingerprint):
+        """Memory-maps a saved store, or returns None if it is missing or stale."""
+        sections = read_sections(path, fingerprint)
+        if sections is None:
+            return None
+        try:
+            raw_vocab = bytes(sections["vocab"])
+            vocab = raw_vocab.decode("utf-8").split("\n") if raw_vocab else []
+            return cls(vocab, sections, int(sections["generation"][0]))
+        except (KeyError, ValueError, IndexError):
+            return None
+
+    @property
+    def nbytes(self):
+        codes = self.count_codes.nbytes if self.count_codes is not None else 0
+        return codes + sum(getattr(self, name).nbytes for name in _SECTIONS)
+
+    def decode(self, counts):
+        """Counts for a slice of bi_counts/tri_counts, undoing quantization."""
+        return counts if self.count_codes is None else self.count_codes[counts]
+
+    # ---------------------------------------------------------
+    # LOOKUPS
+    # ---------------------------------------------------------
+
+    def __contains__(self, word):
+        word_id = self.word_ids.get(word)
+        return word_id is not None and self.bi_offsets[word_id + 1] > self.bi_offsets[word_id]
+
+    def get(self, word, default=None):
+        """Followers of `word` as a Counter, like the old defaultdict(Counter)."""
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            return default
+        start, end = self.bi_offsets[word_id], self.bi_offsets[word_id + 1]
+        if start == end:
+            return default
+        vocab = self.vocab
+        return Counter({vocab[n]: int(c) for n, c in zip(self.bi_next[start:end],
+                                                          self.decode(self.bi_counts[start:end]))})
+
+    def bigram_followers(self, word, n):
+        """([(next_word, count), ...top n], total_count) after `word`."""
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            return [], 0
+        start, end = int(self.bi_offsets[word_id]), int(self.bi_offsets[word_id + 1])
+        return self._followers(self.bi_next, self.bi_counts, start, end, n)
+
+    def trigram_followers(self, first, second, n):
+        """([(next_word, count), ...top n], total_count) after `first second`."""
+        first_id, second_id = self.word_ids.get(first), self.word_ids.get(second)
+        if first_id is None or second_id is None:
+            return [], 0
+        start, end = self._trigram_slice(first_id, second_id)
+        return self._followers(self.tri_next, self.tri_counts, start, end, n)
+
+    def follower_counts(self, context, words):
+        """
+        {word: (count, rank)} for each of `words` seen after `context` (one
+        or two words); rank is its position in the count-ordered followers.
+        """
+        ids = [self.word_ids.get(word) for word in context]
+        if None in ids:
+            return {}
+        if len(ids) == 1:
+            start, end = int(self.bi_offsets[ids[0]]), int(self.bi_offsets[ids[0] + 1])
+            next_ids, counts = self.bi_next, self.bi_counts
+        else:
+            start, end = self._trigram_slice(*ids)
+            next_ids, counts = self.tri_next, self.tri_counts
+
+        if end <= start:
+            return {}
+        # Rows are count-ordered; a by-id copy is sorted once per context, then each word is a binary search
+        row = next_ids[start:end]
+        sorted_ids, positions = self._follower_index.get_or_compute(
+            (len(ids), start), lambda: _sorted_row(row))
+
+        found = {}
+        for word in words:
+            word_id = self.word_ids.get(word)
+            if word_id is None:
+                continue
+            i = int(np.searchsorted(sorted_ids, word_id))
+            if i < len(sorted_ids) and sorted_ids[i] == word_id:
+                rank = int(positions[i])
+                found[word] = (int(self.decode(counts[start + rank:start + rank + 1])[0]), rank)
+        return found
+
+    def top_unigrams(self, n):
+        """[(word, count), ...top n] over the whole vocabulary."""
+        return [(self.vocab[i], int(self.unigrams[i])) for i in self.unigram_rank[:n]]
+
+    def _followers(self, next_ids, counts, start, end, n):
+        if end <= start:
+            return [], 0
+        counts = self.decode(counts[start:end])
+        top = [(self.vocab[i], int(c)) for i, c in zip(next_ids[start:min(end, start + n)], counts)]
+        return top, int(counts.sum(dtype=np.int64))
+
+    def ranked_items(self, k):
+        """
+        Yields (word, [(next_word, count), ...top k], total_count) for every
+        word that has followers (see prediction_index.ranked_followers).
+        """
+        vocab, offsets = self.vocab, self.bi_offsets
+        bi_counts = self.decode(self.bi_counts)
+        running = np.concatenate(([0], np.cumsum(bi_counts, dtype=np.int64)))
+        for word_id, word in enumerate(vocab):
+            start, end = int(offsets[word_id]), int(offsets[word_id + 1])
+            if start == end:
+                continue
+            top_end = min(start + k, end)
+            top = [(vocab[n], int(c)) for n, c in zip(self.bi_next[start:top_end], bi_counts[start:top_end])]
+            yield word, top, int(running[end] - running[start])
+
+    def predict(self, context, k=1):
+        """
+        Top-k (next_word, score) for a sequence of preceding words, using the
+        last two for a trigram lookup and backing off to bigrams and
+        unigrams. Returns [] when the last word is unknown.
+        """
+        if not context:
+            return []
+        last = self.word_ids.get(context[-1])
+        if last is None:
+            return []
+
+        results = []
+        seen = set()
+        # Each level we back off to is discounted by another factor of BACKOFF
+        order = 3 if len(context) >= 2 else 2
+
+        # Trigram
+        if order == 3:
+            first = self.word_ids.get(context[-2])
+            if first is not None:
+                start, end = self._trigram_slice(first, last)
+                if end > start:
+                    self._collect(results, seen, self.tri_next, self.tri_counts, start, end, k, 1.0)
+
+        # Bigram
+        if len(results) < k:
+            start, end = int(self.bi_offsets[last]), int(self.bi_offsets[last + 1])
+            self._collect(results, seen, self.bi_next, self.bi_counts, start, end, k, BACKOFF ** (order - 2))
+
+        # Unigram
+        if len(results) < k and self.total:
+            weight = BACKOFF ** (order - 1)
+            for word_id in self.unigram_rank[:k + len(seen)]:
+                if len(results) == k:
+                    break
+                if int(word_id) not in seen:
+                    seen.add(int(word_id))
+                    results.append((self.vocab[word_id], weight * int(self.unigrams[word_id]) / self.total))
+
+        return results
+
+    def _trigram_slice(self, first, last):
+        key = first * len(self.vocab) + last
+        i = int(np.searchsorted(self.tri_keys, key))
+        if i == len(self.tri_keys) or self.tri_keys[i] != key:
+            return 0, 0
+        return int(self.tri_offsets[i]), int(self.tri_offsets[i + 1])
+
+    def _collect(self, results, seen, next_ids, counts, start, end, k, weight):
+        # Slices are count-ordered: the first unseen entries are the best ones
+        if end <= start:
+            return
+        counts = self.decode(counts[start:end])
+        total = int(counts.sum(dtype=np.int64))
+        stop = min(end, start + k + len(seen))
+        for word_id, count in zip(next_ids[start:stop], counts):
+            if len(results) == k:
+                return
+            word_id = int(word_id)
+            if word_id not in seen:
+                seen.add(word_id)
+                results.append((self.vocab[word_id], weight * int(count) / total))
+
+
+def _sorted_row(row):
+    positions = np.argsort(row, kind="stable")
+    return row[positions], positions
+
+
+# ---------------------------------------------------------
+# PARTIAL COUNTS
+# ---------------------------------------------------------
+
+def count_ids(ids, V):
+    """
+    Counts one shard of word ids (ids < V). N-grams never cross the shard
+    edges. Each n-gram table is (packed keys, counts, first position).
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    return {
+        "tokens": len(ids),
+        "unigrams": np.bincount(ids, minlength=V),
+        "bigrams": _unique_keys(ids[:-1] * V + ids[1:]),
+        "trigrams": _unique_keys((ids[:-2] * V + ids[1:-1]) * V + ids[2:]),
+    }
+
+
+def _unique_keys(keys):
+    unique, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    return unique, counts.astype(np.int64), first.astype(np.int64)
+
+
+def _merge_keys(tables):
+    # Sums counts of equal keys across shards, keeping the earliest position
+    if not tables:
+        return _unique_keys(np.empty(0, dtype=np.int64))
+    keys, counts, first = (np.concatenate(column) for column in zip(*tables))
+    if len(tables) == 1 or not len(keys):
+        return keys, counts, first
+    order = np.argsort(keys, kind="stable")
+    keys, counts, first = keys[order], counts[order], first[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.add.reduceat(counts, starts), np.minimum.reduceat(first, starts)
+
+
+def _rank_ngrams(table, V):
+    """
+    Turns (packed keys, counts, first position) into (context, next, count)
+    rows ordered by context, then count descending, then first occurrence.
+    """
+    unique, counts, first = table
+    context, next_ids = np.divmod(unique, V)
+    order = np.lexsort((first, -counts, context))
+    return context[order], next_ids[order], counts[order]
@@ -0,0 +1,81 @@
+from array import array
+
+DEFAULT_TOP_K = 5
+
+
+class PredictionIndex:
+    """
+    Frozen next-word table built once from a bigram model.
+
+    For every context word only its top-k followers are kept, already
+    ranked, in flat parallel arrays:
+
+        offsets[row] .. offsets[row + 1]  -> followers / probs for that word
+
+    predict() is therefore a dict lookup plus an O(k) slice, instead of a
+    Counter.most_common() over thousands of followers on every keystroke.
+    """
+
+    def __init__(self, rows, offsets, followers, probs, k):
+        self.rows = rows
+        self.offsets = offsets
+        self.followers = followers
+        self.probs = probs
+        self.k = k
+        # Rows replaced after the build (online learning), word -> pairs
+        self.patched = {}
+
+    @classmethod
+    def build(cls, bigram_model, k=DEFAULT_TOP_K):
+        """
+        Builds the index from a defaultdict(Counter) or an NgramStore.
+        Probabilities are maximum-likelihood P(next | word) over *all*
+        followers, not just the k that are kept.
+        """
+        rows = {}
+        offsets = array("I", [0])
+        followers = []
+        probs = array("d")
+
+        for word, top, total in ranked_followers(bigram_model, k):
+            rows[word] = len(offsets) - 1
+            for next_word, count in top:
+                followers.append(next_word)
+                probs.append(count / total)
+            offsets.append(len(followers))
+
+        return cls(rows, offsets, followers, probs, k)
+
+    def patch(self, word, top, total):
+        """Replaces the row for `word` with new ranked (next_word, count) pairs."""
+        self.patched[word] = [(next_word, count / total) for next_word, count in top[:self.k]]
+
+    def __contains__(self, word):
+        return word in self.rows or word in self.patched
+
+    def predict(self, word, k=1):
+        """Returns up to k (next_word, probability) pairs, best first."""
+        patched = self.patched.get(word)
+        if patched is not None:
+            return patched[:k]
+        row = self.rows.get(word)
+        if row is None:
+            return []
+
+        start = self.offsets[row]
+        end = min(start + k, self.offsets[row + 1])
+        return list(zip(self.followers[start:end], self.probs[start:end]))
+
+
+def ranked_followers(bigram_model, k):
+    """
+    Yields (word, [(next_word, count), ...top k], total_count) for every
+    context word of either bigram model representation.
+    """
+    if hasattr(bigram_model, "ranked_items"):
+        yield from bigram_model.ranked_items(k)
+        return
+
+    for word, next_words in bigram_model.items():
+        if next_words:
+            yield word, next_words.most_common(k), sum(next_words.values())
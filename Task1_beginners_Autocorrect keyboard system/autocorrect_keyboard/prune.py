@@ -0,0 +1,340 @@
+import hashlib
+import os
+
+import numpy as np
+
+from model_store import MODEL_CACHE_DIR
+from ngram_store import NgramStore
+
+# ---------------------------------------------------------
+# MEMORY-BUDGETED PRUNING
+# ---------------------------------------------------------
+# Most n-gram entries are seen once or twice and never become a top
+# prediction. prune_store() shrinks a store's arrays to a byte budget
+# while keeping as many top-1 predictions as possible. At level t:
+#
+#   - trigram contexts whose best follower is also the best bigram
+#     follower of their last word are dropped (backoff predicts the same)
+#   - trigram followers seen t times or fewer are dropped
+#   - bigram followers seen t times or fewer are dropped, except the best
+#     follower of every context
+#
+# The smallest t that fits is used, and the rest of the budget is filled
+# with entries level t dropped but level t - 1 kept: bigrams first, each
+# table in order of context frequency (redundant trigram contexts last).
+# If even bigram top-1 rows alone do not fit, the rarest bigram contexts
+# are dropped until they do, and those words back off to unigram
+# frequency. Followers stay in count order, so every remaining context
+# keeps its top-1 exactly; only scores change (they are relative to the
+# remaining followers).
+#
+# Word ids, and so the vocabulary and unigram counts, are never pruned;
+# they are the fixed cost of the budget. Follower ids and offsets are
+# stored in the narrowest integer type that fits.
+#
+# With `quantize`, follower counts are stored as log-scaled uint8 or
+# uint16 codes plus a small table mapping each code back to a count
+# (NgramStore.decode). Slices are already ordered, so this only makes the
+# scores approximate (steps of a few percent for uint8). When every count
+# fits the type as it is, counts are stored exactly and no table is needed.
+
+QUANTIZE_TYPES = {"uint8": np.uint8, "uint16": np.uint16}
+
+
+def prune_store(store, budget_bytes=None, quantize=None):
+    """
+    A copy of `store` whose arrays (NgramStore.nbytes) fit in budget_bytes
+    (None: prune nothing), with counts quantized to `quantize` ("uint8",
+    "uint16" or None). Raises ValueError if the budget is below the cost
+    of the vocabulary itself.
+    """
+    if quantize is not None and quantize not in QUANTIZE_TYPES:
+        raise ValueError(f"Unknown count quantization: {quantize}")
+
+    plan = _PrunePlan(store, quantize)
+    level, extra, dropped = 0, 0, 0
+    if budget_bytes is not None:
+        level = plan.fitting_level(budget_bytes)
+        if level is None:
+            level, dropped = plan.max_level, plan.contexts_to_drop(budget_bytes)
+        else:
+            extra = plan.fitting_extra(level, budget_bytes)
+
+    pruned = plan.build(level, extra, dropped)
+    pruned.generation = store.generation
+    return pruned
+
+
+def pruned_fingerprint(fingerprint, budget_bytes, quantize):
+    """Snapshot fingerprint of a store pruned from the one with `fingerprint`."""
+    return hashlib.sha256(fingerprint + f":{budget_bytes}:{quantize}".encode()).digest()
+
+
+def pruned_model_path(budget_bytes, quantize):
+    budget = "full" if budget_bytes is None else f"{budget_bytes // 1024}k"
+    return os.path.join(MODEL_CACHE_DIR, f"ngram-{budget}-{quantize or 'exact'}.smt")
+
+
+class _PrunePlan:
+    # Per-entry facts about `store`, so the size at any level is a few
+    # vectorized counts and only the chosen level is actually built
+
+    def __init__(self, store, quantize):
+        self.store = store
+        self.quantize = quantize
+        V = len(store.vocab)
+
+        self.bi_counts = store.decode(store.bi_counts).astype(np.int64)
+        bi_sizes = np.diff(store.bi_offsets).astype(np.int64)
+        self.bi_ctx = np.repeat(np.arange(V), bi_sizes)
+        self.bi_first = np.zeros(len(self.bi_counts), dtype=bool)
+        self.bi_first[store.bi_offsets[:-1][bi_sizes > 0].astype(np.int64)] = True
+        self.bi_totals = np.bincount(self.bi_ctx, weights=self.bi_counts, minlength=V)
+
+        self.tri_counts = store.decode(store.tri_counts).astype(np.int64)
+        tri_sizes = np.diff(store.tri_offsets).astype(np.int64)
+        self.tri_ctx = np.repeat(np.arange(len(store.tri_keys)), tri_sizes)
+        self.tri_totals = np.bincount(self.tri_ctx, weights=self.tri_counts, minlength=len(store.tri_keys))
+        self._boundaries = {}
+
+        # Trigram contexts whose top-1 is the backoff bigram's top-1
+        last = (store.tri_keys % V).astype(np.int64)
+        has_bigrams = bi_sizes[last] > 0
+        bi_top = np.full(len(last), -1, dtype=np.int64)
+        bi_top[has_bigrams] = store.bi_next[store.bi_offsets[last[has_bigrams]].astype(np.int64)]
+        tri_top = store.tri_next[store.tri_offsets[:-1].astype(np.int64)].astype(np.int64)
+        self.tri_redundant = tri_top == bi_top
+
+        self.max_level = int(max(self.bi_counts.max(initial=0), self.tri_counts.max(initial=0)))
+
+        # Element sizes of the pruned arrays
+        self.id_bytes = np.dtype(_id_type(V)).itemsize
+        self.offset_bytes = np.dtype(_offset_type(len(self.bi_counts) + len(self.tri_counts))).itemsize
+        self.count_type = np.uint32 if quantize is None else QUANTIZE_TYPES[quantize]
+        self.count_bytes = np.dtype(self.count_type).itemsize
+        self.log_scaled = quantize is not None and self.max_level > np.iinfo(self.count_type).max
+        self.table_bytes = (np.iinfo(self.count_type).max + 1) * 4 if self.log_scaled else 0
+        unigram_bytes = np.dtype(_count_type(int(store.unigrams.max(initial=0)))).itemsize
+        self.fixed_bytes = (V * (unigram_bytes + store.learned.itemsize) + (V + 2) * self.offset_bytes
+                            + self.table_bytes)
+
+    def _level(self, level):
+        bi_keep = (self.bi_counts > level) | self.bi_first
+        tri_keep = self.tri_counts > level
+        if level > 0:
+            tri_keep &= ~self.tri_redundant[self.tri_ctx]
+        return bi_keep, tri_keep
+
+    def _boundary(self, level):
+        # Entries kept at level - 1 but not at level, most valuable first
+        if level not in self._boundaries:
+            bi_keep, tri_keep = self._level(level)
+            wider_bi, wider_tri = self._level(level - 1)
+            bi_add = np.flatnonzero(wider_bi & ~bi_keep)
+            bi_add = bi_add[np.argsort(-self.bi_totals[self.bi_ctx[bi_add]], kind="stable")]
+            tri_add = np.flatnonzero(wider_tri & ~tri_keep)
+            # Followers of redundant contexts never change a top-1, so they come last
+            contexts = self.tri_ctx[tri_add]
+            tri_add = tri_add[np.lexsort((-self.tri_totals[contexts], self.tri_redundant[contexts]))]
+            self._boundaries[level] = bi_add, tri_add
+        return self._boundaries[level]
+
+    def keep(self, level, extra=0):
+        bi_keep, tri_keep = self._level(level)
+        if extra:
+            bi_add, tri_add = self._boundary(level)
+            bi_keep[bi_add[:extra]] = True
+            tri_keep[tri_add[:max(0, extra - len(bi_add))]] = True
+        return bi_keep, tri_keep
+
+    def nbytes(self, level, extra=0, dropped=0):
+        bi_keep, tri_keep = self.keep(level, extra)
+        n_bi = int(bi_keep.sum()) - dropped
+        n_tri = int(tri_keep.sum())
+        n_tri_contexts = int(np.count_nonzero(np.bincount(self.tri_ctx[tri_keep],
+                                                          minlength=len(self.store.tri_keys))))
+        entry = self.id_bytes + self.count_bytes
+        return (self.fixed_bytes + (n_bi + n_tri) * entry
+                + n_tri_contexts * (np.dtype(np.int64).itemsize + self.offset_bytes))
+
+    def fitting_level(self, budget_bytes):
+        """Smallest level whose store fits, or None."""
+        lo, hi = 0, self.max_level
+        if self.nbytes(hi) > budget_bytes:
+            return None
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.nbytes(mid) <= budget_bytes:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def fitting_extra(self, level, budget_bytes):
+        """How many of the entries dropped at `level` (not level - 1) still fit."""
+        if level == 0:
+            return 0
+        bi_add, tri_add = self._boundary(level)
+        lo, hi = 0, len(bi_add) + len(tri_add)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.nbytes(level, mid) <= budget_bytes:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def contexts_to_drop(self, budget_bytes):
+        # At max_level every context has exactly one follower left
+        excess = self.nbytes(self.max_level) - budget_bytes
+        needed = -(-excess // (self.id_bytes + self.count_bytes))
+        if needed > int(self.bi_first.sum()):
+            raise ValueError(f"budget of {budget_bytes:,} bytes is below the "
+                             f"{self.fixed_bytes:,} bytes the vocabulary needs"
+                             + (" with its count table" if self.table_bytes else ""))
+        return needed
+
+    def build(self, level, extra=0, dropped=0):
+        store = self.store
+        V = len(store.vocab)
+        bi_keep, tri_keep = self.keep(level, extra)
+        if dropped:
+            # Rarest contexts first, ties by word id
+            rarest = np.lexsort((np.arange(V), self.bi_totals))
+            rarest = rarest[np.bincount(self.bi_ctx, minlength=V)[rarest] > 0][:dropped]
+            bi_keep &= ~np.isin(self.bi_ctx, rarest)
+
+        offset_type = _offset_type(len(self.bi_counts) + len(self.tri_counts))
+        bi_offsets = np.zeros(V + 1, dtype=offset_type)
+        np.cumsum(np.bincount(self.bi_ctx[bi_keep], minlength=V), out=bi_offsets[1:])
+
+        tri_ctx = self.tri_ctx[tri_keep]
+        tri_contexts, tri_starts = np.unique(tri_ctx, return_index=True)
+        tri_offsets = np.append(tri_starts, len(tri_ctx)).astype(offset_type)
+
+        bi_counts, tri_counts = self.bi_counts[bi_keep], self.tri_counts[tri_keep]
+        arrays = {
+            "unigrams": store.unigrams.astype(_count_type(int(store.unigrams.max(initial=0)))),
+            "bi_offsets": bi_offsets,
+            "bi_next": store.bi_next[bi_keep].astype(_id_type(V)),
+            "tri_keys": np.asarray(store.tri_keys)[tri_contexts].astype(np.int64),
+            "tri_offsets": tri_offsets,
+            "tri_next": store.tri_next[tri_keep].astype(_id_type(V)),
+            "learned": np.array(store.learned),
+        }
+        if not self.log_scaled:
+            arrays["bi_counts"] = bi_counts.astype(self.count_type)
+            arrays["tri_counts"] = tri_counts.astype(self.count_type)
+        else:
+            scale, arrays["count_codes"] = _log_scale(self.max_level, self.count_type)
+            arrays["bi_counts"] = _encode(bi_counts, scale, self.count_type)
+            arrays["tri_counts"] = _encode(tri_counts, scale, self.count_type)
+        return NgramStore(store.vocab, arrays)
+
+
+# ---------------------------------------------------------
+# QUANTIZATION
+# ---------------------------------------------------------
+
+def _log_scale(max_count, dtype):
+    # code = round(log2(count) * scale), spreading 1..max_count over every code
+    levels = np.iinfo(dtype).max + 1
+    scale = (levels - 1) / max(np.log2(max(max_count, 2)), 1.0)
+    table = np.maximum(np.round(np.exp2(np.arange(levels) / scale)), 1).astype(np.uint32)
+    return scale, table
+
+
+def _encode(counts, scale, dtype):
+    codes = np.round(np.log2(np.maximum(counts, 1)) * scale)
+    return np.clip(codes, 0, np.iinfo(dtype).max).astype(dtype)
+
+
+def _id_type(V):
+    return np.uint16 if V <= np.iinfo(np.uint16).max + 1 else np.uint32
+
+
+def _offset_type(entries):
+    return np.uint32 if entries <= np.iinfo(np.uint32).max else np.int64
+
+
+def _count_type(max_count):
+    return np.uint32 if max_count <= np.iinfo(np.uint32).max else np.uint64
+
+
+# ---------------------------------------------------------
+# AGREEMENT
+# ---------------------------------------------------------
+
+def top1_agreement(full, pruned):
+    """
+    How often `pruned` makes the same top-1 prediction as `full`, over
+    every bigram and trigram context of `full`. "weighted" counts each
+    context as often as it occurs in the corpus, "contexts" counts each
+    context once. Both stores must share one vocabulary.
+    """
+    if full.vocab != pruned.vocab:
+        raise ValueError("stores have different vocabularies")
+    V = len(full.vocab)
+    fallback = int(pruned.unigram_rank[0]) if V else -1
+
+    def bigram_top(store, words):
+        starts = store.bi_offsets[words].astype(np.int64)
+        ends = store.bi_offsets[words + 1].astype(np.int64)
+        top = np.full(len(words), fallback, dtype=np.int64)
+        found = ends > starts
+        top[found] = store.bi_next[starts[found]]
+        return top
+
+    def summary(expected, actual, weights):
+        same = expected == actual
+        total = weights.sum()
+        return {"contexts": float(same.mean()) if len(same) else 1.0,
+                "weighted": float(weights[same].sum() / total) if total else 1.0}
+
+    # Bigram contexts
+    bi_sizes = np.diff(full.bi_offsets).astype(np.int64)
+    words = np.flatnonzero(bi_sizes)
+    weights = np.add.reduceat(full.decode(full.bi_counts).astype(np.int64),
+                              full.bi_offsets[words].astype(np.int64)) if len(words) else np.zeros(0)
+    result = {"bigram": summary(bigram_top(full, words), bigram_top(pruned, words), weights)}
+
+    # Trigram contexts: pruned ones back off to the last word's bigrams
+    keys = np.asarray(full.tri_keys, dtype=np.int64)
+    starts = full.tri_offsets[:-1].astype(np.int64)
+    expected = full.tri_next[starts].astype(np.int64)
+    weights = np.add.reduceat(full.decode(full.tri_counts).astype(np.int64), starts) if len(keys) else np.zeros(0)
+
+    actual = bigram_top(pruned, keys % V) if len(keys) else np.zeros(0, dtype=np.int64)
+    pruned_keys = np.asarray(pruned.tri_keys, dtype=np.int64)
+    at = np.searchsorted(pruned_keys, keys)
+    present = at < len(pruned_keys)
+    present[present] = pruned_keys[at[present]] == keys[present]
+    actual[present] = pruned.tri_next[pruned.tri_offsets[at[present]].astype(np.int64)]
+    result["trigram"] = summary(expected, actual, weights)
+    return result
+
+
+if __name__ == "__main__":
+    # python prune.py --budget-mb 8 --quantize uint8
+    import argparse
+
+    from engine import load_ngram_store
+    from ingest import DEFAULT_SOURCES, sources_fingerprint
+
+    parser = argparse.ArgumentParser(description="Prune the SmartType n-gram model to a memory budget")
+    parser.add_argument("sources", nargs="*", default=list(DEFAULT_SOURCES))
+    parser.add_argument("--budget-mb", type=float, default=None)
+    parser.add_argument("--quantize", choices=sorted(QUANTIZE_TYPES), default=None)
+    args = parser.parse_args()
+
+    budget = None if args.budget_mb is None else int(args.budget_mb * 2 ** 20)
+    full = load_ngram_store(args.sources)
+    pruned = prune_store(full, budget, args.quantize)
+    path = pruned_model_path(budget, args.quantize)
+    pruned.save(path, pruned_fingerprint(sources_fingerprint(args.sources), budget, args.quantize))
+
+    agreement = top1_agreement(full, pruned)
+    print(f"✅ {full.nbytes / 2 ** 20:.2f} MB -> {pruned.nbytes / 2 ** 20:.2f} MB -> {path}")
+    for order, rates in agreement.items():
+        print(f"   {order:<8} top-1 agreement: {rates['weighted']:.1%} of predictions, "
+              f"{rates['contexts']:.1%} of contexts")
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import SmartTypeEngine
+
+# ---------------------------------------------------------
+# SHARED SUGGESTION SERVICE
+# ---------------------------------------------------------
+# One loaded SmartTypeEngine serves many thin clients over a localhost TCP
+# socket. The protocol is JSON lines; clients may pipeline requests and
+# match answers by "id":
+#
+#   -> {"id": 1, "op": "suggest", "previous": "the", "word": "qick",
+#       "in_word": true, "k": 3, "completions": 3, "deadline_ms": 100}
+#   <- {"id": 1, "correction": "quick", "predictions": [["brown", 0.2]],
+#       "completions": [["quick", 0.01]]}
+#   -> {"id": 2, "op": "accept", "words": ["the", "quick"]}
+#   <- {"id": 2, "ok": true}
+#   -> {"id": 3, "op": "reject", "word": "smarttype"}
+#   <- {"id": 3, "ok": true}
+#   -> {"id": 4, "op": "stats"}
+#   <- {"id": 4, "stats": {...}}
+#
+# Failures come back as {"id": ..., "error": "busy" | "deadline" | "bad request"}.
+# "k" must be at least 1 and "completions" at least 0; both are capped at
+# the engine's top_k.
+#
+# "suggest" requests that arrive while the engine thread is busy with one
+# batch form the next (up to MAX_BATCH, optionally waiting BATCH_WINDOW_MS
+# for more) and are answered by a single engine.keystroke_batch() call, so
+# a lone client pays no batching delay and the event loop never runs
+# model code.
+# Backpressure: at most MAX_PENDING requests wait for a batch (more are
+# rejected as "busy" right away), and a connection with MAX_IN_FLIGHT
+# unanswered requests is not read from until one finishes, so a fast
+# client is slowed down by TCP instead of growing server memory.
+# A request not answered by its deadline gets "deadline" at that moment;
+# if it has not reached the engine yet it is dropped from its batch.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+MAX_BATCH = 64
+BATCH_WINDOW_MS = 0
+MAX_PENDING = 1024
+MAX_IN_FLIGHT = 32
+DEFAULT_DEADLINE_MS = 200
+
+
+class SuggestionServer:
+
+    def __init__(self, engine, host=DEFAULT_HOST, port=DEFAULT_PORT, max_batch=MAX_BATCH,
+                 batch_window_ms=BATCH_WINDOW_MS, max_pending=MAX_PENDING, max_in_flight=MAX_IN_FLIGHT,
+                 default_deadline_ms=DEFAULT_DEADLINE_MS):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.batch_window = batch_window_ms / 1000
+        self.max_pending = max_pending
+        self.max_in_flight = max_in_flight
+        self.default_deadline = default_deadline_ms / 1000
+
+        self.stats = {"requests": 0, "batches": 0, "batched": 0, "busy": 0, "deadline": 0}
+        self._queue = None
+        self._server = None
+        self._batcher = None
+        # Engine calls run here, one at a time, in arrival order
+        self._engine_thread = ThreadPoolExecutor(1, thread_name_prefix="smarttype-engine")
+
+    async def start(self):
+        self._queue = asyncio.Queue(self.max_pending)
+        self._batcher = asyncio.create_task(self._run_batches())
+        self._server = await asyncio.start_server(self._serve_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        self._batcher.cancel()
+        self._engine_thread.shutdown(wait=True)
+
+    # ---------------------------------------------------------
+    # CONNECTIONS
+    # ---------------------------------------------------------
+
+    async def _serve_client(self, reader, writer):
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        try:
+            while True:
+                await in_flight.acquire()
+                line = await reader.readline()
+                if not line:
+                    in_flight.release()
+                    break
+                task = asyncio.create_task(self._answer(line, writer, in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _answer(self, line, writer, in_flight):
+        try:
+            reply = await self._handle(line)
+            writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            in_flight.release()
+
+    async def _handle(self, line):
+        arrived = time.monotonic()
+        self.stats["requests"] += 1
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            op = request.get("op", "suggest")
+        except (ValueError, AttributeError):
+            return {"id": None, "error": "bad request"}
+
+        loop = asyncio.get_running_loop()
+        if op == "accept":
+            words = request.get("words")
+            if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+                return {"id": request_id, "error": "bad request"}
+            ok = await loop.run_in_executor(self._engine_thread, self.engine.accept, words)
+            return {"id": request_id, "ok": bool(ok)}
+        if op == "reject":
+            word = request.get("word")
+            if not isinstance(word, str):
+                return {"id": request_id, "error": "bad request"}
+            ok = await loop.run_in_executor(self._engine_thread, self.engine.reject, word)
+            return {"id": request_id, "ok": bool(ok)}
+        if op == "stats":
+            return {"id": request_id, "stats": dict(self.stats, latency=self.engine.metrics.summary())}
+        if op != "suggest":
+            return {"id": request_id, "error": "bad request"}
+
+        try:
+            previous = str(request.get("previous") or "") or None
+            k, completions = int(request.get("k", 1)), int(request.get("completions", 0))
+            deadline = arrived + float(request.get("deadline_ms", self.default_deadline * 1000)) / 1000
+        except (TypeError, ValueError):
+            return {"id": request_id, "error": "bad request"}
+        if k < 1 or completions < 0:
+            return {"id": request_id, "error": "bad request"}
+        # Nothing ranks past the engine's top_k anyway
+        top_k = self.engine.top_k
+        key = (previous, str(request.get("word", "")), bool(request.get("in_word")),
+               min(k, top_k), min(completions, top_k))
+
+        future = loop.create_future()
+        try:
+            self._queue.put_nowait((key, future))
+        except asyncio.QueueFull:
+            self.stats["busy"] += 1
+            return {"id": request_id, "error": "busy"}
+
+        try:
+            # Cancels the future on timeout, so the batcher skips it
+            corrected, predictions, completions = await asyncio.wait_for(future, deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            self.stats["deadline"] += 1
+            return {"id": request_id, "error": "deadline"}
+        return {"id": request_id, "correction": corrected, "predictions": predictions,
+                "completions": completions}
+
+    # ---------------------------------------------------------
+    # MICRO-BATCHING
+    # ---------------------------------------------------------
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            window_end = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = window_end - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            live = [(key, future) for key, future in batch if not future.cancelled()]
+            if not live:
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["batched"] += len(live)
+            try:
+                results = await loop.run_in_executor(self._engine_thread, self.engine.keystroke_batch,
+                                                     [key for key, _ in live])
+            except Exception as e:
+                print(f"Batch failed: {e}")
+                results = [(None, None, None)] * len(live)
+            for (_, future), result in zip(live, results):
+                if not future.cancelled():
+                    future.set_result(result)
+
+
+# ---------------------------------------------------------
+# CLIENT
+# ---------------------------------------------------------
+
+class SuggestionClient:
+    """
+    Minimal asyncio client for SuggestionServer. Requests may be issued
+    concurrently over the one connection; answers are matched by id.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._next_id = 0
+        self._waiting = {}
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, **fields):
+        if self._receiver.done():
+            raise ConnectionError("server closed the connection")
+        self._next_id += 1
+        fields["id"] = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[self._next_id] = future
+        self.writer.write(json.dumps(fields).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def suggest(self, previous, word, in_word, k=3, completions=3, deadline_ms=DEFAULT_DEADLINE_MS):
+        return await self.request(op="suggest", previous=previous, word=word, in_word=in_word, k=k,
+                                  completions=completions, deadline_ms=deadline_ms)
+
+    async def accept(self, words):
+        return await self.request(op="accept", words=list(words))
+
+    async def reject(self, word):
+        return await self.request(op="reject", word=word)
+
+    async def stats(self):
+        return (await self.request(op="stats"))["stats"]
+
+    async def _receive(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                reply = json.loads(line)
+                future = self._waiting.pop(reply.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(reply)
+        finally:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("server closed the connection"))
+
+    async def close(self):
+        self.writer.close()
+        await self._receiver
+
+
+async def serve(engine, host=DEFAULT_HOST, port=DEFAULT_PORT, **options):
+    server = await SuggestionServer(engine, host, port, **options).start()
+    print(f"✅ SmartType server listening on {server.host}:{server.port}", flush=True)
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    # python server.py --port 8765
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve SmartType suggestions to local clients")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING)
+    parser.add_argument("--no-learn", action="store_true", help="ignore accept requests")
+    args = parser.parse_args()
+
+    engine = SmartTypeEngine(learn=not args.no_learn).load()
+    try:
+        asyncio.run(serve(engine, args.host, args.port, max_batch=args.max_batch,
+                          batch_window_ms=args.batch_window_ms, max_pending=args.max_pending))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
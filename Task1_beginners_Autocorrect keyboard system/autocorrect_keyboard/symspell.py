@@ -0,0 +1,266 @@
+import os
+import string
+import hashlib
+import unicodedata
+import zlib
+from array import array
+from bisect import bisect_left
+
+from model_store import MODEL_CACHE_DIR, read_sections, write_sections
+
+# ---------------------------------------------------------
+# SYMMETRIC DELETE INDEX
+# ---------------------------------------------------------
+# Every dictionary word is reduced to its first PREFIX_LENGTH characters
+# and all strings reachable from that prefix by up to MAX_DISTANCE
+# deletions are indexed. At lookup time the same deletions are applied to
+# the typed word; any dictionary word sharing a delete key is a candidate
+# and is verified with a true Damerau-Levenshtein distance.
+#
+# Delete strings are stored as crc32 hashes in a sorted table with CSR
+# postings, so the index can be written with model_store and memory-mapped
+# instead of holding millions of Python strings. Hash collisions only add
+# candidates; the distance check removes them.
+#
+# Each posting packs the word id with the number of deletions that
+# produced the key, so the distance-1 pass only visits keys and postings
+# that are at most one deletion deep on either side.
+
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+
+# Bump whenever the index layout or delete generation changes.
+INDEX_VERSION = 1
+
+_DEPTH_SHIFT = 30
+_WORD_MASK = (1 << _DEPTH_SHIFT) - 1
+
+DEFAULT_INDEX_PATH = os.path.join(MODEL_CACHE_DIR, "symspell.smt")
+
+
+def dictionary_fingerprint(word_frequency):
+    """Hashes the index parameters and the full word -> count dictionary."""
+    digest = hashlib.sha256(f"{INDEX_VERSION}:{PREFIX_LENGTH}:{MAX_DISTANCE}".encode())
+    for word, count in sorted(word_frequency.items()):
+        digest.update(f"{word}\t{count}\n".encode("utf-8"))
+    return digest.digest()
+
+
+def load_or_build(spell, path=DEFAULT_INDEX_PATH):
+    """
+    Returns a SymSpellChecker over `spell`'s frequency dictionary, loading
+    the index from `path` when it matches and rebuilding (and saving) it
+    otherwise.
+    """
+    word_frequency = spell.word_frequency
+    fingerprint = dictionary_fingerprint(word_frequency.dictionary)
+
+    sections = read_sections(path, fingerprint)
+    if sections is not None:
+        print("SymSpell index loaded from snapshot.")
+        return SymSpellChecker(sections)
+
+    print("Building SymSpell index...")
+    sections = build_sections(word_frequency.dictionary, word_frequency.longest_word_length)
+    try:
+        write_sections(path, fingerprint, sections)
+        print(f"SymSpell index saved to {path}")
+    except OSError as e:
+        print(f"Could not save SymSpell index: {e}")
+
+    return SymSpellChecker(sections)
+
+
+def build_sections(word_frequency, longest_word_length):
+    """Builds the raw index arrays for a word -> count mapping."""
+    words = sorted(word_frequency)
+    freqs = array("Q", (word_frequency[word] for word in words))
+
+    if len(words) > _WORD_MASK:
+        raise ValueError("dictionary too large for SymSpell postings")
+
+    # (hash << 32 | depth << 30 | word_id) packs each posting into one sortable int
+    packed = array("Q")
+    for word_id, word in enumerate(words):
+        for key, depth in deletes(word[:PREFIX_LENGTH], MAX_DISTANCE).items():
+            packed.append(_hash(key) << 32 | depth << _DEPTH_SHIFT | word_id)
+
+    keys = array("I")
+    offsets = array("I", [0])
+    postings = array("I")
+    for value in sorted(packed):
+        key = value >> 32
+        if not keys or keys[-1] != key:
+            if keys:
+                offsets.append(len(postings))
+            keys.append(key)
+        postings.append(value & 0xFFFFFFFF)
+    offsets.append(len(postings))
+
+    return {
+        "words": "\n".join(words).encode("utf-8"),
+        "freqs": freqs,
+        "params": array("I", [PREFIX_LENGTH, MAX_DISTANCE, longest_word_length]),
+        "keys": keys,
+        "offsets": offsets,
+        "postings": postings,
+    }
+
+
+def deletes(word, max_distance):
+    """
+    Maps every string reachable from `word` by up to max_distance deletions
+    to the fewest deletions needed to reach it.
+    """
+    results = {word: 0}
+    frontier = {word}
+    for depth in range(1, max_distance + 1):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        for key in frontier:
+            results.setdefault(key, depth)
+    return results
+
+
+def damerau_levenshtein(a, b, max_distance):
+    """
+    Unrestricted Damerau-Levenshtein distance (Lowrance-Wagner), i.e. the
+    fewest single insert/delete/replace/adjacent-swap steps. This matches
+    pyspellchecker, whose distance-2 candidates are edits of edits.
+    Returns max_distance + 1 as soon as the bound is exceeded.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if a == b:
+        return 0
+
+    inf = len(a) + len(b)
+    width = len(b) + 2
+    d = [inf] * ((len(a) + 2) * width)
+    for i in range(len(a) + 1):
+        d[(i + 1) * width + 1] = i
+    for j in range(len(b) + 1):
+        d[width + j + 1] = j
+
+    last_row = {}
+    for i in range(1, len(a) + 1):
+        last_col = 0
+        row_min = inf
+        for j in range(1, len(b) + 1):
+            k = last_row.get(b[j - 1], 0)
+            l = last_col
+            if a[i - 1] == b[j - 1]:
+                cost = 0
+                last_col = j
+            else:
+                cost = 1
+            value = min(d[i * width + j] + cost,
+                        d[(i + 1) * width + j] + 1,
+                        d[i * width + j + 1] + 1,
+                        d[k * width + l] + (i - k - 1) + 1 + (j - l - 1))
+            d[(i + 1) * width + j + 1] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        last_row[a[i - 1]] = i
+
+    return min(d[(len(a) + 1) * width + len(b) + 1], max_distance + 1)
+
+
+def _hash(text):
+    return zlib.crc32(text.encode("utf-8"))
+
+
+# ---------------------------------------------------------
+# CORRECTION BACKEND
+# ---------------------------------------------------------
+
+class SymSpellChecker:
+    """
+    Drop-in replacement for SpellChecker.correction() backed by the
+    symmetric delete index.
+
+    Candidate selection follows pyspellchecker exactly: a known word is
+    returned unchanged, otherwise the most frequent word at distance 1
+    wins, then the most frequent at distance 2, preferring candidates that
+    only differ by diacritics. Frequency ties, which pyspellchecker breaks
+    by set iteration order, are broken alphabetically here.
+    """
+
+    def __init__(self, sections):
+        raw_words = bytes(sections["words"])
+        self.words = raw_words.decode("utf-8").split("\n") if raw_words else []
+        self.word_ids = {word: i for i, word in enumerate(self.words)}
+        self.freqs = sections["freqs"]
+        self.prefix_length, self.distance, self.longest_word_length = sections["params"]
+        self.keys = sections["keys"]
+        self.offsets = sections["offsets"]
+        self.postings = sections["postings"]
+
+        if len(self.freqs) != len(self.words) or len(self.offsets) != len(self.keys) + 1:
+            raise ValueError("SymSpell index sections do not match")
+
+    def __contains__(self, word):
+        return word.lower() in self.word_ids
+
+    def __getitem__(self, word):
+        word_id = self.word_ids.get(word.lower())
+        return 0 if word_id is None else self.freqs[word_id]
+
+    def correction(self, word):
+        """The most probable correct spelling for `word`, or None."""
+        candidates = self.candidates(word)
+        if not candidates:
+            return None
+
+        word_no_accents = _remove_diacritics(word)
+        preferred = [c for c in candidates if _remove_diacritics(c) == word_no_accents]
+        return max(sorted(preferred or candidates), key=self.__getitem__)
+
+    def candidates(self, word):
+        """Known words at the smallest edit distance (1, then 2), or None."""
+        lower = word.lower()
+        if lower in self.word_ids or not self._should_check(word):
+            return {word}
+
+        # One pass per distance, so the cheap distance-1 pass usually
+        # settles it before the wider distance-2 keys are touched
+        prefix = lower[:self.prefix_length]
+        for max_distance in range(1, self.distance + 1):
+            found = set()
+            seen = set()
+            for key in deletes(prefix, max_distance):
+                for posting in self._postings(_hash(key)):
+                    if posting >> _DEPTH_SHIFT > max_distance or posting in seen:
+                        continue
+                    seen.add(posting)
+                    candidate = self.words[posting & _WORD_MASK]
+                    if damerau_levenshtein(lower, candidate, max_distance) <= max_distance:
+                        found.add(candidate)
+            if found:
+                return found
+        return None
+
+    def _postings(self, key):
+        i = bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return ()
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def _should_check(self, word):
+        # Mirrors SpellChecker._check_if_should_check
+        if len(word) == 1 and word in string.punctuation:
+            return False
+        if len(word) > self.longest_word_length + 3:
+            return False
+        if word.lower() in ("nan", "inf", "infinity"):
+            return True
+        try:
+            float(word)
+            return False
+        except ValueError:
+            return True
+
+
+def _remove_diacritics(text):
+    nfkd_form = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in nfkd_form if not unicodedata.combining(c))
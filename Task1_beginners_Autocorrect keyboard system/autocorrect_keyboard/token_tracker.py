@@ -0,0 +1,97 @@
+import tkinter as tk
+
+# Longest span that is still treated as a single word, and how far back
+# from the cursor a resync looks for the current and previous word.
+MAX_TOKEN = 64
+RESYNC_WINDOW = 2 * MAX_TOKEN
+
+
+def split_last_token(text):
+    """
+    Returns (token_start, last_word, previous_word) for the text before the
+    cursor. last_word is the word being typed or, right after whitespace,
+    the word before it; previous_word is the word preceding last_word.
+    token_start is the offset in `text` where the word being typed begins.
+    """
+    token_start = len(text)
+    while token_start > 0 and not text[token_start - 1].isspace():
+        token_start -= 1
+
+    word_start, last_word = _last_word(text, len(text))
+    _, previous_word = _last_word(text, word_start)
+    return token_start, last_word, previous_word
+
+
+def _last_word(text, end):
+    # Last whitespace-delimited word ending at or before `end`
+    while end > 0 and text[end - 1].isspace():
+        end -= 1
+    start = end
+    while start > 0 and not text[start - 1].isspace():
+        start -= 1
+    return start, text[start:end]
+
+
+class TokenTracker:
+    """
+    Tracks the word next to the insert cursor of a tk.Text without reading
+    the whole buffer.
+
+    A left-gravity mark is kept at the start of the word being typed. Tk
+    moves marks along with insertions and deletions anywhere in the text,
+    so while the user keeps typing (or backspacing) inside that word the
+    token is just mark..insert. Only when the span is no longer a single
+    word (space typed, cursor moved, text deleted across the mark) does the
+    tracker resync from a fixed-size window before the cursor. Either way
+    the cost per key is bounded by the word length, not the buffer size.
+    """
+
+    MARK = "smarttype_token"
+
+    def __init__(self, text_widget):
+        self.text = text_widget
+        self.text.mark_set(self.MARK, "insert")
+        self.text.mark_gravity(self.MARK, tk.LEFT)
+
+    def current_word(self):
+        """The word at the cursor, or the previous word right after a space."""
+        return self.current_context()[1]
+
+    def current_context(self):
+        """
+        (previous_word, current_word, in_word): in_word is True while the
+        cursor is inside current_word (i.e. it is still being typed).
+        previous_word may be "".
+        """
+        text = self.text
+        if (text.compare(self.MARK, "<=", "insert")
+                and text.compare(self.MARK, ">=", f"insert -{MAX_TOKEN} chars")
+                and self._at_word_boundary()):
+            token = text.get(self.MARK, "insert")
+            if token and not any(c.isspace() for c in token):
+                before = text.get(f"{self.MARK} -{RESYNC_WINDOW} chars", self.MARK)
+                return _last_word(before, len(before))[1], token, True
+
+        return self.resync()
+
+    def finished_words(self, n=3):
+        """
+        The last n words when a single whitespace character has just ended
+        a word (so each word is reported once), otherwise [].
+        """
+        before = self.text.get(f"insert -{RESYNC_WINDOW} chars", "insert")
+        if len(before) < 2 or not before[-1].isspace() or before[-2].isspace():
+            return []
+        return before.split()[-n:]
+
+    def resync(self):
+        window = self.text.get(f"insert -{RESYNC_WINDOW} chars", "insert")
+        token_start, word, previous = split_last_token(window)
+        self.text.mark_set(self.MARK, f"insert -{len(window) - token_start} chars")
+        return previous, word, token_start < len(window)
+
+    def _at_word_boundary(self):
+        # The mark must still begin a word: buffer start or whitespace before it
+        before = self.text.get(f"{self.MARK} -1 chars", self.MARK)
+        return not before or before.isspace()
+
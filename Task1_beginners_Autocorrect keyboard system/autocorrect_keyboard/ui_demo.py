@@ -1,6 +1,11 @@
 import tkinter as tk
 from tkinter import font
 import math
+import queue
+import threading
+from engine import SmartTypeEngine
+from keystroke_pipeline import KeystrokePipeline
+from token_tracker import TokenTracker
 
 class RoundedFrame(tk.Canvas):
     def __init__(self, parent, width, height, radius=20, bg="#FFFFFF", **kwargs):
@@ -48,10 +53,12 @@ class Config:
     FONT_FAMILY = "Segoe UI"
 
 class SmartTypeUI:
-    def __init__(self, root):
+    def __init__(self, root, engine=None):
         self.root = root
+        self.engine = engine or SmartTypeEngine()
         self.setup_window()
         self.setup_ui()
+        self.connect_engine()
     
     def setup_window(self):
         self.root.title("SmartType - Intelligent Autocorrect")
@@ -95,9 +102,9 @@ class SmartTypeUI:
         status_frame.pack(side="right", padx=40)
         
         # Green Dot (Using unicode)
-        status_lbl = tk.Label(status_frame, text="● System Ready", 
-                              font=self.status_font, bg=Config.PRIMARY_BLUE, fg=Config.SUCCESS_GREEN)
-        status_lbl.pack()
+        self.status_label = tk.Label(status_frame, text="● Loading...",
+                                     font=self.status_font, bg=Config.PRIMARY_BLUE, fg=Config.TEXT_LIGHT)
+        self.status_label.pack()
 
     def _main_content(self):
         container = tk.Frame(self.root, bg=Config.BG_COLOR)
@@ -178,6 +185,52 @@ class SmartTypeUI:
                                          bg=Config.CARD_WHITE, fg=Config.TEXT_DARK, pady=15)
         self.correction_label.pack(anchor="w")
 
+    def connect_engine(self):
+        # Thin client: all correction/prediction logic lives in SmartTypeEngine
+        self.token_tracker = TokenTracker(self.input_box)
+        self.pipeline = KeystrokePipeline(self.root, self._suggest, self._show_suggestions)
+        self.input_box.bind("<KeyRelease>", lambda event: self.pipeline.submit(self.token_tracker.current_context()))
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        self.load_queue = queue.Queue()
+        threading.Thread(target=self._load_engine, daemon=True).start()
+        self.root.after(50, self._poll_load_queue)
+
+    def _load_engine(self):
+        try:
+            self.engine.load(progress=lambda message: self.load_queue.put((message, Config.TEXT_LIGHT)))
+            self.load_queue.put(("● System Ready", Config.SUCCESS_GREEN))
+        except Exception as e:
+            print(f"Error loading engine: {e}")
+            self.load_queue.put(("● Load Failed", Config.ACCENT_RED))
+
+    def _poll_load_queue(self):
+        try:
+            while True:
+                text, color = self.load_queue.get_nowait()
+                self.status_label.config(text=text, fg=color)
+                if color != Config.TEXT_LIGHT:
+                    return
+        except queue.Empty:
+            self.root.after(50, self._poll_load_queue)
+
+    def on_close(self):
+        self.pipeline.close()
+        self.engine.close()
+        self.root.destroy()
+
+    def _suggest(self, context, cancelled):
+        previous, word, _ = context
+        return self.engine.suggest(word, 1, cancelled, previous)
+
+    def _show_suggestions(self, suggestions):
+        corrected, predictions = suggestions
+        self.correction_label.config(text=corrected or "waiting...")
+        if predictions is None:
+            self.prediction_label.config(text="loading...")
+        else:
+            self.prediction_label.config(text=predictions[0][0] if predictions else "waiting...")
+
     def _footer(self):
         tk.Label(self.root, text="Designed for SmartType", font=self.footer_font,
                  bg=Config.BG_COLOR, fg=Config.TEXT_LIGHT).pack(side="bottom", pady=15)
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+from filter_index import FilterIndex
+
+# ==========================================
+# Pre-aggregated Dashboard Tables
+# ==========================================
+# The dashboard's charts only need Sales and Profit per (Category,
+# Sub-Category, Region, Segment, Order Date), so the frame is grouped once
+# into that small base table. Two bitmap indexes (see filter_index.py)
+# resolve any filter state:
+#
+#   base_index  over the base table's rows: trend, segments and totals are
+#               summed from the few matching base rows
+#   index       over the frame's rows: the matching rows for the scatter
+#
+# so a filter change never masks, copies or regroups the full frame.
+#
+# append() folds in newly arrived rows (see live_data.py): the rows are
+# grouped on their own and merged into the base table, and indexed after
+# the existing rows. The frame is kept as a list of parts and only
+# consolidated once the new parts reach a quarter of the first, so a
+# refresh costs time proportional to the new rows, not the history.
+
+BASE_KEYS = ['Category', 'Sub-Category', 'Region', 'Segment', 'Order Date']
+CONSOLIDATE_RATIO = 0.25
+
+
+class FilterAggregates:
+
+    def __init__(self, df):
+        self.parts = [df]
+        self.base = self._group(df)
+        self.base_index = FilterIndex(self.base)
+        self.index = FilterIndex(df)
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def append(self, tail):
+        """Adds newly arrived rows to the frame, the base table and both indexes."""
+        if tail is None or tail.empty:
+            return
+        self.parts.append(tail)
+        base = (pd.concat([self.base, self._group(tail)], ignore_index=True)
+                  .groupby(BASE_KEYS, dropna=False)[['Sales', 'Profit']].sum().reset_index())
+        # The base table is small: re-indexed whole, then swapped in with it
+        self.base, self.base_index = base, FilterIndex(base)
+        self.index.append(tail)
+
+        if sum(len(part) for part in self.parts[1:]) >= CONSOLIDATE_RATIO * len(self.parts[0]):
+            self.parts = [concat_frames(self.parts)]
+
+    def snapshot(self):
+        """
+        A copy for reading while this object keeps ingesting: it shares the
+        frames, tables and bitmaps, and later append()s leave it unchanged.
+        """
+        view = object.__new__(FilterAggregates)
+        view.parts = list(self.parts)
+        view.base, view.base_index = self.base, self.base_index
+        view.index = self.index.snapshot()
+        return view
+
+    def options(self, dim):
+        """The values a filter dimension can take, sorted."""
+        return self.index.values(dim)
+
+    def get(self, filters):
+        """Trend, segment and total tables for a filter state, or None if it matches nothing."""
+        positions = self.base_index.positions(filters)
+        part = self.base if positions is None else self.base.iloc[positions]
+        if part.empty:
+            return None
+        return {
+            'trend': part.groupby('Order Date')['Sales'].sum().reset_index(),
+            'segments': part.groupby('Segment')['Sales'].sum().reset_index(),
+            'sales': part['Sales'].sum(),
+            'profit': part['Profit'].sum(),
+        }
+
+    def rows(self, filters):
+        """The filtered rows of the frame, without a full-frame mask or copy."""
+        rows = self.index.positions(filters)
+        if len(self.parts) == 1:
+            return self.parts[0] if rows is None else self.parts[0].iloc[rows]
+        if rows is None:
+            return concat_frames(self.parts)
+        # Positions are global; split them by part
+        bounds = np.cumsum([0] + [len(part) for part in self.parts])
+        cuts = np.searchsorted(rows, bounds)
+        return concat_frames([part.iloc[rows[cuts[i]:cuts[i + 1]] - bounds[i]]
+                              for i, part in enumerate(self.parts)])
+
+    @staticmethod
+    def _group(df):
+        # dropna=False: rows with a blank dimension still count when it is not filtered
+        base = df.groupby(BASE_KEYS, observed=True, dropna=False)[['Sales', 'Profit']].sum().reset_index()
+        # Plain labels, so bases with different category sets merge cleanly; float64 totals
+        return base.astype({'Category': object, 'Sub-Category': object, 'Region': object, 'Segment': object,
+                            'Sales': 'float64', 'Profit': 'float64'})
+
+
+def concat_frames(frames):
+    """pd.concat that keeps categorical columns categorical when their category sets differ."""
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    aligned = [frame.copy(deep=False) for frame in frames]
+    for column in frames[0].columns:
+        dtypes = [frame[column].dtype for frame in frames]
+        if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes) and len(set(dtypes)) > 1:
+            union = pd.api.types.union_categoricals([frame[column] for frame in frames], ignore_order=True)
+            categories = union.categories
+            for frame in aligned:
+                frame[column] = frame[column].cat.set_categories(categories, ordered=frame[column].cat.ordered)
+    return pd.concat(aligned, ignore_index=True)
+
+
+# ==========================================
+# Scatter Downsampling
+# ==========================================
+def sample_scatter_rows(dff, max_points, seed=0):
+    """
+    Positions (into dff) of at most ~max_points rows for the Sales vs Profit
+    scatter. Each Sub-Category gets a share of the budget proportional to
+    its size, and within it keeps its Sales/Profit extremes and Profit
+    outliers (IQR rule over dff) before filling the rest at random. The
+    seed is fixed so a filter state always draws the same points.
+    """
+    if len(dff) <= max_points:
+        return np.arange(len(dff))
+
+    rng = np.random.default_rng(seed)
+    sales = dff['Sales'].to_numpy(dtype=np.float64)
+    profit = dff['Profit'].to_numpy(dtype=np.float64)
+    q1, q3 = np.nanquantile(profit, [0.25, 0.75])
+    iqr = q3 - q1
+    outlier = (profit < q1 - 1.5 * iqr) | (profit > q3 + 1.5 * iqr)
+
+    keep = np.zeros(len(dff), dtype=bool)
+    groups = dff.groupby('Sub-Category', observed=True, dropna=False).indices
+    for positions in groups.values():
+        quota = max(4, int(max_points * len(positions) / len(dff)))
+        plotted = positions[np.isfinite(sales[positions]) & np.isfinite(profit[positions])]
+        if not len(plotted):
+            continue
+        keep[plotted[[sales[plotted].argmin(), sales[plotted].argmax(),
+                      profit[plotted].argmin(), profit[plotted].argmax()]]] = True
+        outliers = plotted[outlier[plotted]]
+        if len(outliers) > quota // 2:
+            # Too many to keep all: the furthest from the median first
+            distance = np.abs(profit[outliers] - (q1 + q3) / 2)
+            outliers = outliers[np.argsort(distance)[::-1][:quota // 2]]
+        keep[outliers] = True
+        rest = plotted[~keep[plotted]]
+        fill = quota - (len(plotted) - len(rest))
+        if fill > 0 and len(rest):
+            keep[rng.choice(rest, min(fill, len(rest)), replace=False)] = True
+    return np.flatnonzero(keep)
@@ -1,30 +1,31 @@
 
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import plotly.io as pio
+import calendar
 import os
 
+from data_cache import read_store_data
+
 # Set Plotly template
 pio.templates.default = "plotly_white"
 
 # ==========================================
 # 1. Data Loading & Cleaning
 # ==========================================
-def load_and_clean_data(filepath):
+def load_and_clean_data(filepath, use_cache=True, compact=False):
     """
     Loads dataset, converts dates, handles missing values, and treats outliers.
+    The typed, date-derived frame is cached as Parquet (see data_cache.py).
+    compact=True loads the low-memory frame (data_cache.compact_frame).
     """
     if not os.path.exists(filepath):
         print(f"❌ Error: File '{filepath}' not found. Please place the dataset in the 'store_analysis/data/' directory.")
         return None
 
     try:
-        # Try reading as CSV first, then Excel
-        if filepath.endswith('.csv'):
-            df = pd.read_csv(filepath, encoding='latin1') 
-        else:
-            df = pd.read_excel(filepath)
+        # CSV or Excel, parsed with explicit dtypes (or straight from the cache)
+        df = read_store_data(filepath, use_cache, compact)
     except Exception as e:
         print(f"❌ Error loading file: {e}")
         return None
@@ -35,14 +36,16 @@ def load_and_clean_data(filepath):
     print("Columns:", df.columns.tolist())
     print("-" * 30)
 
-    # Date Conversion
-    if 'Order Date' in df.columns:
-        df['Order Date'] = pd.to_datetime(df['Order Date'])
-        df['Year'] = df['Order Date'].dt.year
-        df['Month'] = df['Order Date'].dt.month_name()
-        df['Quarter'] = df['Order Date'].dt.to_period('Q').astype(str)
-        df['Month_Num'] = df['Order Date'].dt.month # Helper for sorting
-    
+    # Date Conversion: Order Date is already datetime64, with Year, Month,
+    # Quarter and Month_Num (helper for sorting) derived by read_store_data
+
+    return clean_data(df, flag_column=not compact)
+
+def clean_data(df, flag_column=True):
+    """
+    Drops incomplete rows and flags Profit outliers (IQR rule) in place.
+    Without flag_column only the bounds are kept, in df.attrs['profit_bounds'].
+    """
     # Missing Values
     missing = df.isnull().sum()
     if missing.sum() > 0:
@@ -58,28 +61,55 @@ def load_and_clean_data(filepath):
     upper_bound = Q3 + 1.5 * IQR
     
     # Flag Outliers
-    df['Is_Outlier'] = ~df['Profit'].between(lower_bound, upper_bound)
-    print(f"ℹ️ Outliers detected: {df['Is_Outlier'].sum()} rows.")
+    outliers = ~df['Profit'].between(lower_bound, upper_bound)
+    df.attrs['profit_bounds'] = (float(lower_bound), float(upper_bound))
+    if flag_column:
+        df['Is_Outlier'] = outliers
+    print(f"ℹ️ Outliers detected: {outliers.sum()} rows.")
     
     return df
 
 # ==========================================
-# 2. Sales Analysis
+# 2. Aggregation Cube
 # ==========================================
-def analyze_sales(df):
+# Every report section needs Sales/Profit/Quantity sums over some subset of
+# these dimensions, so the full frame is grouped exactly once and each
+# section rolls up the (much smaller) cube instead of rescanning all rows.
+CUBE_DIMENSIONS = ['Year', 'Month_Num', 'Category', 'Sub-Category', 'Segment', 'Region', 'Product Name']
+CUBE_MEASURES = ['Sales', 'Profit', 'Quantity']
+
+def build_cube(df, dimensions=CUBE_DIMENSIONS):
+    """
+    Sums Sales, Profit and Quantity per (Year, Month, Category, Sub-Category,
+    Segment, Region, Product) in a single pass over the data.
+    """
+    cube = df.groupby(dimensions, observed=True, sort=False)[CUBE_MEASURES].sum().reset_index()
+    # float32 (compact) cell sums are exact enough; rollups over them need float64
+    return cube.astype({measure: 'float64' for measure in CUBE_MEASURES if cube[measure].dtype == 'float32'})
+
+def rollup(cube, by, measures=('Sales', 'Profit')):
+    """Re-aggregates the cube to the `by` dimension(s)."""
+    return cube.groupby(by, observed=True)[list(measures)].sum().reset_index()
+
+# ==========================================
+# 3. Sales Analysis
+# ==========================================
+def analyze_sales(cube, top_products=None):
     print("\n📊 --- SALES ANALYSIS ---")
     
     # Monthly Trends
-    monthly = df.groupby(['Year', 'Month_Num', 'Month'])['Sales'].sum().reset_index().sort_values(['Year', 'Month_Num'])
+    monthly = rollup(cube, ['Year', 'Month_Num'], ['Sales']).sort_values(['Year', 'Month_Num'])
+    monthly.insert(2, 'Month', monthly['Month_Num'].map(lambda m: calendar.month_name[m]))
     peak_month = monthly.loc[monthly['Sales'].idxmax()]
     
     print(f"📅 Peak Sales Month: {peak_month['Month']} {peak_month['Year']} (${peak_month['Sales']:,.2f})")
     
     # Category Analysis
-    cat_sales = df.groupby('Category')['Sales'].sum().reset_index().sort_values('Sales', ascending=False)
+    cat_sales = rollup(cube, 'Category', ['Sales']).sort_values('Sales', ascending=False)
     
-    # Top 10 Products
-    top_products = df.groupby('Product Name')['Sales'].sum().nlargest(10).reset_index()
+    # Top 10 Products (streaming mode passes them in: its cube has no products)
+    if top_products is None:
+        top_products = rollup(cube, 'Product Name', ['Sales']).nlargest(10, 'Sales').reset_index(drop=True)
     
     print("🏆 Top 3 Best-Selling Products:")
     for i, row in top_products.head(3).iterrows():
@@ -88,16 +118,16 @@ def analyze_sales(df):
     return monthly, cat_sales, top_products
 
 # ==========================================
-# 3. Profit Analysis
+# 4. Profit Analysis
 # ==========================================
-def analyze_profit(df):
+def analyze_profit(cube):
     print("\n💰 --- PROFIT ANALYSIS ---")
     
     # Profit Trends
-    year_profit = df.groupby('Year')['Profit'].sum().reset_index()
+    year_profit = rollup(cube, 'Year', ['Profit'])
     
     # Most/Least Profitable Sub-Categories
-    sub_profit = df.groupby('Sub-Category')['Profit'].sum().reset_index().sort_values('Profit', ascending=False)
+    sub_profit = rollup(cube, 'Sub-Category', ['Profit']).sort_values('Profit', ascending=False)
     
     print(f"✅ Most Profitable Sub-Category: {sub_profit.iloc[0]['Sub-Category']} (${sub_profit.iloc[0]['Profit']:,.2f})")
     print(f"❌ Least Profitable Sub-Category: {sub_profit.iloc[-1]['Sub-Category']} (${sub_profit.iloc[-1]['Profit']:,.2f})")
@@ -105,12 +135,12 @@ def analyze_profit(df):
     return year_profit, sub_profit
 
 # ==========================================
-# 4. Customer Segment Analysis
+# 5. Customer Segment Analysis
 # ==========================================
-def analyze_segments(df):
+def analyze_segments(cube):
     print("\n👥 --- CUSTOMER SEGMENT ANALYSIS ---")
     
-    grouped = df.groupby('Segment')[['Sales', 'Profit']].sum().reset_index()
+    grouped = rollup(cube, 'Segment')
     grouped['Profit_Margin'] = (grouped['Profit'] / grouped['Sales']) * 100
     
     for i, row in grouped.iterrows():
@@ -119,14 +149,14 @@ def analyze_segments(df):
     return grouped
 
 # ==========================================
-# 5. Operational Insights
+# 6. Operational Insights
 # ==========================================
-def operational_insights(df):
+def operational_insights(cube):
     print("\n💡 --- OPERATIONAL INSIGHTS ---")
     
     # High Sales, Low Profit Areas
     # Aggregating by Sub-Category
-    ops = df.groupby('Sub-Category')[['Sales', 'Profit']].sum().reset_index()
+    ops = rollup(cube, 'Sub-Category')
     ops['Profit_Ratio'] = ops['Profit'] / ops['Sales']
     
     loss_makers = ops[ops['Profit'] < 0].sort_values('Profit')
@@ -143,48 +173,70 @@ def operational_insights(df):
     print("3. Analyze if deep discounts are eroding profits in specific regions.")
 
 # ==========================================
-# 6. Visualization
+# 7. Visualization
 # ==========================================
 def visualize_results(monthly_sales, cat_sales, sub_profit, segment_data):
+    for fig in build_figures(monthly_sales, cat_sales, sub_profit, segment_data):
+        fig.show()
+
+def build_figures(monthly_sales, cat_sales, sub_profit, segment_data):
     # 1. Sales Trend
     fig1 = px.line(monthly_sales, x='Month', y='Sales', color='Year', markers=True, 
                    title='📈 Monthly Sales Trend Comparison')
-    fig1.show()
     
     # 2. Category Sales
     fig2 = px.bar(cat_sales, x='Category', y='Sales', 
                   title='📦 Total Sales by Category', text_auto='.2s', color='Sales')
-    fig2.show()
     
     # 3. Sub-Category Profit
     sub_profit['Color'] = sub_profit['Profit'].apply(lambda x: 'Profit' if x>0 else 'Loss')
     fig3 = px.bar(sub_profit, x='Profit', y='Sub-Category', orientation='h', color='Color',
                   title='📊 Net Profit by Sub-Category',
                   color_discrete_map={'Profit': '#2ecc71', 'Loss': '#e74c3c'})
-    fig3.show()
     
     # 4. Segment Contribution
     fig4 = px.pie(segment_data, values='Sales', names='Segment', 
                   title='🍰 Sales Contribution by Customer Segment', hole=0.3)
-    fig4.show()
+    
+    return fig1, fig2, fig3, fig4
 
 # ==========================================
 # Main Execution
 # ==========================================
 if __name__ == "__main__":
-    DATA_PATH = "store_analysis/data/store_data.csv"
+    # python store_analysis/analysis.py [--stream] [--chunksize N] [--outliers out.csv]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Store sales and profit report")
+    parser.add_argument("data", nargs="?", default="store_analysis/data/store_data.csv")
+    parser.add_argument("--stream", action="store_true",
+                        help="read the CSV in chunks (for files larger than RAM)")
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    parser.add_argument("--outliers", help="with --stream, write the outlier rows to this CSV")
+    parser.add_argument("--compact", action="store_true",
+                        help="load a low-memory frame (float32 money, integer-coded calendar)")
+    args = parser.parse_args()
+    DATA_PATH = args.data
     
     print("🔄 Initializing Analysis...")
     
-    # Load
-    df = load_and_clean_data(DATA_PATH)
-    
-    if df is not None:
-        # Analyze
-        monthly, cats, top10 = analyze_sales(df)
-        yr_prof, sub_prof = analyze_profit(df)
-        segs = analyze_segments(df)
-        operational_insights(df)
+    if args.stream:
+        # Load and aggregate chunk by chunk (see streaming.py)
+        from streaming import stream_and_clean
+        streamed = stream_and_clean(DATA_PATH, args.chunksize, args.outliers)
+        cube, top_products = streamed if streamed is not None else (None, None)
+    else:
+        # Load, then aggregate once
+        df = load_and_clean_data(DATA_PATH, compact=args.compact)
+        cube = build_cube(df) if df is not None else None
+        top_products = None
+    
+    if cube is not None:
+        # Analyze the cube
+        monthly, cats, top10 = analyze_sales(cube, top_products)
+        yr_prof, sub_prof = analyze_profit(cube)
+        segs = analyze_segments(cube)
+        operational_insights(cube)
         
         # Visualize
         print("\n🎨 Opening Visualizations...")
@@ -0,0 +1,250 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# ==========================================
+# Scaling Benchmark
+# ==========================================
+# python store_analysis/benchmarks.py --sizes 1k 100k 1M 10M --json results.json
+# python store_analysis/benchmarks.py --sizes 1k 100k 1M --baseline results.json --max-regression 0.25
+# python store_analysis/benchmarks.py --sizes 1M --compact              low-memory frame
+#
+# For each size, a synthetic dataset is generated once (create_dummy_data_v2,
+# with a Zipfian product catalogue, seasonality and correlated discounts)
+# and every pipeline stage is timed separately in a fresh process, so the
+# peak RSS reported after each stage belongs to that size alone. Stages
+# are run --repeat times and the fastest run is kept.
+#
+# With --baseline, any stage that got slower than the saved run by more
+# than --max-regression (and by more than --min-delta-ms, to ignore noise
+# on tiny inputs) is reported and the script exits with status 1.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZE_SUFFIXES = {'k': 1_000, 'M': 1_000_000}
+DEFAULT_SIZES = ['1k', '100k', '1M', '10M']
+DASHBOARD_FILTERS = [('All', 'All'), ('Technology', 'All'), ('All', 'West'), ('Furniture', 'East')]
+# Multi-dimensional filter states resolved by the bitmap index
+FILTER_STATES = [
+    {'Category': ('Technology',)},
+    {'Category': ('Furniture',), 'Region': ('East', 'West'), 'Segment': ('Corporate',)},
+    {'Sub-Category': ('Phones',), 'Year': (2024,), 'Month': (11, 12)},
+    {'Region': ('South',), 'Date Range': (2023 * 12 + 2, 2023 * 12 + 8)},
+]
+DATASET_OPTIONS = {'products': 2000, 'zipf': 1.1, 'seasonality': True, 'correlated': True}
+
+
+def parse_size(text):
+    if text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def dataset_path(data_dir, rows, seed):
+    """The synthetic dataset for `rows`, generated on first use."""
+    sys.path.insert(0, ROOT)
+    from create_dummy_data_v2 import generate
+
+    path = os.path.join(data_dir, f'store_{rows}_{seed}.csv')
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        generate(path + '.tmp', rows, seed=seed, **DATASET_OPTIONS)
+        os.replace(path + '.tmp', path)
+        print(f"   generated {rows:,} rows in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+# ==========================================
+# 1. Stages (run in a child process per size)
+# ==========================================
+def stage_timer(stages, repeat):
+    """timed(name, fn) keeps fn's fastest of `repeat` runs in stages[name]."""
+    def timed(name, fn):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = fn()
+            best = min(best, time.perf_counter() - start)
+        stages[name] = {'seconds': best, 'peak_rss_mb': peak_rss_mb()}
+        return result
+    return timed
+
+
+def frame_stages(path, repeat, compact=False):
+    """Loading, report and filter index stages; the frame is freed on return."""
+    from analysis import (analyze_profit, analyze_sales, analyze_segments, build_cube, build_figures,
+                          clean_data, operational_insights)
+    from aggregates import FilterAggregates
+    from data_cache import add_calendar_fields, compact_frame, read_source, read_store_data
+    from filter_index import FilterIndex
+
+    stages = {}
+    timed = stage_timer(stages, repeat)
+
+    def derive_dates():
+        df['Order Date'] = pd.to_datetime(df['Order Date'])
+        return add_calendar_fields(df)
+
+    # Loading (load_and_clean_data, step by step)
+    df = timed('csv_parse', lambda: read_source(path))
+    timed('date_derivation', derive_dates)
+    if compact:
+        df = timed('compact', lambda: compact_frame(df))
+    timed('outliers', lambda: clean_data(df, flag_column=not compact))
+    stages['frame'] = {'seconds': 0.0, 'peak_rss_mb': peak_rss_mb(),
+                       'bytes_per_row': float(df.memory_usage(deep=True).sum() / max(1, len(df)))}
+    with contextlib.redirect_stdout(io.StringIO()):
+        read_store_data(path, compact=compact)  # writes the Parquet cache
+    timed('cache_load', lambda: read_store_data(path, compact=compact))
+
+    # Report sections
+    cube = timed('cube', lambda: build_cube(df))
+    monthly, cats, _ = timed('sales', lambda: analyze_sales(cube))
+    _, sub_prof = timed('profit', lambda: analyze_profit(cube))
+    segs = timed('segments', lambda: analyze_segments(cube))
+    timed('insights', lambda: operational_insights(cube))
+    timed('figures', lambda: build_figures(monthly, cats, sub_prof.copy(), segs))
+
+    # Dashboard
+    timed('dashboard_aggregates', lambda: FilterAggregates(df))
+    index = timed('filter_index', lambda: FilterIndex(df))
+    timed('filter_resolve', lambda: [index.match(filters) for filters in FILTER_STATES])
+    stages['filter_resolve']['seconds'] /= len(FILTER_STATES)
+    return stages
+
+
+def run_stages(path, repeat, compact=False):
+    stages = frame_stages(path, repeat, compact)
+    timed = stage_timer(stages, repeat)
+
+    # Dashboard callbacks (the module loads its own frame)
+    os.environ['STORE_DATA_PATH'] = path
+    with contextlib.redirect_stdout(io.StringIO()):
+        import dashboard
+
+    def callbacks():
+        for cat, region in DASHBOARD_FILTERS:
+            # The callback reports failures in its outputs rather than raising
+            if dashboard.update_dashboard(cat, region)[3] == "Error":
+                raise RuntimeError(f"update_dashboard({cat!r}, {region!r}) failed")
+
+    def cold_callbacks():
+        dashboard.render_dashboard.cache_clear()
+        callbacks()
+
+    timed('dashboard_callback', cold_callbacks)
+    timed('dashboard_cached', callbacks)
+    for name in ('dashboard_callback', 'dashboard_cached'):
+        # Per callback, not per filter list
+        stages[name]['seconds'] /= len(DASHBOARD_FILTERS)
+    return stages
+
+
+# ==========================================
+# 2. Driver
+# ==========================================
+def run_size(path, repeat, compact=False):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--stage-run', path,
+                             '--repeat', str(repeat)] + (['--compact'] if compact else []),
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"benchmark child failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def print_size(label, rows, stages):
+    print(f"\n⏱️ --- {label} ({rows:,} rows) ---")
+    print(f"{'stage':<22}{'ms':>12}{'peak RSS (MB)':>16}")
+    for name, stage in stages.items():
+        if 'bytes_per_row' in stage:
+            print(f"{name:<22}{stage['bytes_per_row']:>9.1f} B/row{stage['peak_rss_mb']:>13.0f}")
+            continue
+        print(f"{name:<22}{stage['seconds'] * 1000:>12.2f}{stage['peak_rss_mb']:>16.0f}")
+
+
+def compare(results, baseline, max_regression, min_delta):
+    """Prints before/after per stage; returns the regressed (size, stage) pairs."""
+    regressions = []
+    print()
+    for label, size in results.items():
+        before_stages = baseline.get(label, {}).get('stages', {})
+        for name, after in size['stages'].items():
+            before = before_stages.get(name)
+            if before is None or not before['seconds'] or 'bytes_per_row' in after:
+                continue
+            change = after['seconds'] / before['seconds'] - 1
+            regressed = change > max_regression and after['seconds'] - before['seconds'] > min_delta
+            flag = "❌" if regressed else "✅"
+            print(f"{flag} {label:<6}{name:<22}{before['seconds'] * 1000:>10.2f} -> "
+                  f"{after['seconds'] * 1000:>10.2f} ms ({change:+.0%})")
+            if regressed:
+                regressions.append((label, name))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of the store analysis pipeline as data grows")
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help="row counts, e.g. 1k 100k 1M 10M")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per stage; the fastest is kept")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', help="where generated datasets are kept (default: a temporary directory)")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="results from an earlier --json run to compare against")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                        help="slowdowns smaller than this are never regressions")
+    parser.add_argument('--compact', action='store_true',
+                        help="time the low-memory frame (data_cache.compact_frame); the dashboard uses "
+                             "its own COMPACT_FRAME setting")
+    parser.add_argument('--stage-run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage_run:
+        print(json.dumps(run_stages(args.stage_run, args.repeat, args.compact)))
+        return
+
+    with contextlib.ExitStack() as stack:
+        data_dir = args.data_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(data_dir, exist_ok=True)
+        results = {}
+        for label in args.sizes:
+            rows = parse_size(label)
+            print(f"🔄 {label}: preparing {rows:,} rows...")
+            stages = run_size(dataset_path(data_dir, rows, args.seed), args.repeat, args.compact)
+            results[label] = {'rows': rows, 'stages': stages,
+                              'peak_rss_mb': max(stage['peak_rss_mb'] for stage in stages.values())}
+            print_size(label, rows, stages)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'repeat': args.repeat, 'seed': args.seed, 'compact': args.compact,
+                       'dataset': DATASET_OPTIONS, 'sizes': results}, f, indent=2)
+        print(f"\nSaved to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['sizes']
+        regressions = compare(results, baseline, args.max_regression, args.min_delta_ms / 1000)
+        if regressions:
+            print(f"Slower by more than {args.max_regression:.0%}: "
+                  + ', '.join(f"{label}/{name}" for label, name in regressions))
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
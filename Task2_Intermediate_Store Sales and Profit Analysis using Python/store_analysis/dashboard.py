@@ -1,36 +1,116 @@
 
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import pandas as pd
 import os
+import threading
+from functools import lru_cache
+
+from aggregates import FilterAggregates, sample_scatter_rows
+from data_cache import month_label
+from filter_index import period_label
+from live_data import LiveSource
 
 # Initialize App
 app = dash.Dash(__name__, external_stylesheets=['https://codepen.io/chriddyp/pen/bWLwgP.css'])
 app.title = "Retail Analytics Dashboard"
 
 # Load Data
-DATA_PATH = "store_analysis/data/store_data.csv"
+DATA_PATH = os.environ.get('STORE_DATA_PATH', "store_analysis/data/store_data.csv")
+
+# Low-memory frame: float32 money, categorical dimensions (see data_cache.compact_frame)
+COMPACT_FRAME = True
+
+source = LiveSource(DATA_PATH, compact=COMPACT_FRAME)
 
 def get_data():
     if os.path.exists(DATA_PATH):
         try:
-            if DATA_PATH.endswith('.csv'):
-                df = pd.read_csv(DATA_PATH, encoding='latin1')
-            else:
-                df = pd.read_excel(DATA_PATH)
-            df['Order Date'] = pd.to_datetime(df['Order Date'])
-            return df
+            # Typed frame with datetime Order Date, cached as Parquet (see data_cache.py)
+            return source.load()
         except:
             return None
     return None
 
 df = get_data()
 
+# Figure payloads kept per filter state; repeat selections skip rendering
+FIGURE_CACHE_SIZE = 64
+
+# Above this many rows the scatter is drawn with WebGL from a sample of at
+# most SCATTER_MAX_POINTS rows (extremes and outliers kept, see aggregates.py)
+SCATTER_WEBGL_THRESHOLD = 20_000
+SCATTER_MAX_POINTS = 20_000
+
+# Poll the data file and ingest appended rows while the app runs (see live_data.py)
+LIVE_REFRESH = True
+REFRESH_INTERVAL_MS = 5000
+
+# Dropdown filters: (component id, label, dimension)
+FILTERS = [
+    ('cat-dropdown', "Select Category:", 'Category'),
+    ('region-dropdown', "Select Region:", 'Region'),
+    ('subcat-dropdown', "Select Sub-Category:", 'Sub-Category'),
+    ('segment-dropdown', "Select Segment:", 'Segment'),
+    ('year-dropdown', "Select Year:", 'Year'),
+    ('month-dropdown', "Select Month:", 'Month'),
+]
+
+
+def filter_options(aggregates):
+    """Dropdown options per filter id, 'All' first."""
+    periods = aggregates.options('Period')
+    values = {
+        'Year': sorted({period // 12 for period in periods}),
+        'Month': [{'label': month_label(month), 'value': month}
+                  for month in sorted({period % 12 + 1 for period in periods})],
+    }
+    return {component: ['All'] + (values[dim] if dim in values else aggregates.options(dim))
+            for component, _, dim in FILTERS}
+
+
+def slider_settings(aggregates):
+    """min, max and marks of the date-range slider (one step per month)."""
+    periods = aggregates.options('Period')
+    if not periods:
+        return 0, 0, {}
+    first, last = periods[0], periods[-1]
+    # Label every month, quarter, half or year: whichever gives at most ~12 marks
+    every = next((step for step in (1, 3, 6) if (last - first) // step < 12), 12)
+    marks = {period: period_label(period) for period in range(first, last + 1) if period % every == 0}
+    return first, last, marks
+
+
+def build_filters(chosen, date_range, aggregates):
+    """
+    The filter state as a hashable tuple of (filter, values) pairs, leaving
+    out "All" selections and a date range that spans every month.
+    """
+    filters = []
+    for (_, _, dim), value in zip(FILTERS, chosen):
+        if value in (None, 'All', []):
+            continue
+        filters.append((dim, tuple(value) if isinstance(value, (list, tuple)) else (value,)))
+    first, last, _ = slider_settings(aggregates)
+    if date_range and (date_range[0] > first or date_range[1] < last):
+        filters.append(('Date Range', (date_range[0], date_range[1])))
+    return tuple(filters)
+
+
 # App Layout
 if df is not None:
-    categories = ['All'] + sorted(df['Category'].unique().tolist())
-    regions = ['All'] + sorted(df['Region'].unique().tolist())
+    # Base table and bitmap indexes for every filter dimension (see aggregates.py, filter_index.py)
+    aggregates = FilterAggregates(df)
+    options = filter_options(aggregates)
+    slider_min, slider_max, slider_marks = slider_settings(aggregates)
+    # Bumped whenever new rows are ingested; part of the figure cache key
+    data_version = 0
+    # What callbacks render from: replaced, never modified, on every refresh
+    snapshot = aggregates.snapshot()
+    # Guards aggregates, snapshot and data_version; held for ingesting, not rendering
+    data_lock = threading.Lock()
     
     app.layout = html.Div([
         # Header
@@ -51,15 +131,17 @@ if df is not None:
         
         # Filters
         html.Div([
-            html.Div([
-                html.Label("Select Category:", style={'fontWeight': 'bold'}),
-                dcc.Dropdown(id='cat-dropdown', options=categories, value='All', clearable=False)
-            ], style={'width': '48%', 'display': 'inline-block', 'padding': '10px'}),
+            *[html.Div([
+                html.Label(label, style={'fontWeight': 'bold'}),
+                dcc.Dropdown(id=component, options=options[component], value='All', clearable=False)
+            ], style={'width': '31%', 'display': 'inline-block', 'padding': '10px'})
+              for component, label, _ in FILTERS],
             
             html.Div([
-                html.Label("Select Region:", style={'fontWeight': 'bold'}),
-                dcc.Dropdown(id='region-dropdown', options=regions, value='All', clearable=False)
-            ], style={'width': '48%', 'display': 'inline-block', 'padding': '10px'}),
+                html.Label("Order Date Range:", style={'fontWeight': 'bold'}),
+                dcc.RangeSlider(id='date-slider', min=slider_min, max=slider_max, step=1, marks=slider_marks,
+                                value=[slider_min, slider_max], allowCross=False)
+            ], style={'padding': '10px'}),
         ], style={'maxWidth': '1200px', 'margin': '20px auto', 'padding': '20px', 'backgroundColor': 'white', 'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'}),
         
         # Key Metrics Row
@@ -78,9 +160,98 @@ if df is not None:
         # Graphs Row 2
         html.Div([
             dcc.Graph(id='scatter-plot', style={'width': '100%'})
-        ], style={'maxWidth': '1200px', 'margin': '20px auto'})
+        ], style={'maxWidth': '1200px', 'margin': '20px auto'}),
+        
+        # Live Refresh
+        dcc.Interval(id='refresh-interval', interval=REFRESH_INTERVAL_MS, disabled=not LIVE_REFRESH),
+        dcc.Store(id='data-version', data=data_version)
     ], style={'backgroundColor': '#f4f6f6', 'minHeight': '100vh', 'fontFamily': 'Arial, sans-serif'})
     
+    @app.callback(
+        [Output('data-version', 'data'),
+         *[Output(component, 'options') for component, _, _ in FILTERS],
+         Output('date-slider', 'min'),
+         Output('date-slider', 'max'),
+         Output('date-slider', 'marks'),
+         Output('date-slider', 'value')],
+        [Input('refresh-interval', 'n_intervals')],
+        [State('date-slider', 'value'),
+         State('date-slider', 'min'),
+         State('date-slider', 'max')]
+    )
+    def refresh_data(n_intervals, date_range=None, old_min=None, old_max=None):
+        """Ingests rows appended since the last poll; clients re-render when the version moves."""
+        global aggregates, snapshot, data_version
+        with data_lock:
+            try:
+                change, frame = source.poll()
+            except Exception as e:
+                print(f"Error refreshing data: {e}")
+                raise PreventUpdate
+            if change is None:
+                raise PreventUpdate
+            if change == 'append':
+                aggregates.append(frame)
+                print(f"🔄 Ingested {len(frame):,} new rows ({len(aggregates):,} total).")
+            else:
+                aggregates = FilterAggregates(frame)
+                print(f"🔄 Data file replaced; reloaded {len(frame):,} rows.")
+            data_version += 1
+            snapshot = aggregates.snapshot()
+            # Figures of older versions are never asked for again
+            render_dashboard.cache_clear()
+            first, last, marks = slider_settings(aggregates)
+            # A slider left on the full range follows new months; a narrowed one stays put
+            full = not date_range or list(date_range) == [old_min, old_max]
+            new_options = filter_options(aggregates)
+            return (data_version, *[new_options[component] for component, _, _ in FILTERS],
+                    first, last, marks, [first, last] if full else dash.no_update)
+    
+    @lru_cache(maxsize=FIGURE_CACHE_SIZE)
+    def render_dashboard(filters, version, aggregates):
+        """
+        Figures (as plain dicts, ready to serialize) and metrics for one
+        filter state (see build_filters) of one data version, built from
+        that version's snapshot of the pre-aggregated tables.
+        """
+        tables = aggregates.get(dict(filters))
+        if tables is None or tables['trend'].empty:
+            return None
+
+        # Metrics
+        sales = tables['sales']
+        profit = tables['profit']
+        margin = (profit/sales)*100 if sales > 0 else 0
+
+        # Charts
+        # 1. Trend
+        fig1 = px.line(tables['trend'], x='Order Date', y='Sales', title='Sales Trend Over Time')
+        fig1.update_layout(title_font_size=18, title_x=0.5)
+
+        # 2. Segment
+        fig2 = px.pie(tables['segments'], values='Sales', names='Segment', title='Sales by Segment', hole=0.4)
+        fig2.update_layout(title_font_size=18, title_x=0.5)
+
+        # 3. Scatter (row-level: only the matching rows, no full-frame copy)
+        dff = aggregates.rows(dict(filters))
+        title = 'Sales vs Profit Analysis (Bubble Size: Quantity)'
+        large = len(dff) > SCATTER_WEBGL_THRESHOLD
+        if large:
+            # Bounded payload: a stratified sample, rendered with WebGL
+            total = len(dff)
+            dff = dff.iloc[sample_scatter_rows(dff, SCATTER_MAX_POINTS)]
+            title += f'<br><sup>Showing {len(dff):,} of {total:,} orders, sampled per Sub-Category ' \
+                     f'(extremes and outliers kept)</sup>'
+        # Ensure Quantity is numeric and fill NaNs for size safety
+        dff = dff.assign(Quantity=pd.to_numeric(dff['Quantity'], errors='coerce').fillna(1))
+
+        fig3 = px.scatter(dff, x='Sales', y='Profit', color='Sub-Category', size='Quantity',
+                          title=title, hover_data=['Product Name'],
+                          render_mode='webgl' if large else 'auto')
+        fig3.update_layout(title_font_size=18, title_x=0.5)
+
+        return fig1.to_dict(), fig2.to_dict(), fig3.to_dict(), sales, profit, margin
+
     @app.callback(
         [Output('trend-chart', 'figure'),
          Output('segment-pie', 'figure'),
@@ -88,52 +259,26 @@ if df is not None:
          Output('total-sales', 'children'),
          Output('total-profit', 'children'),
          Output('profit-margin', 'children')],
-        [Input('cat-dropdown', 'value'),
-         Input('region-dropdown', 'value')]
+        [*[Input(component, 'value') for component, _, _ in FILTERS],
+         Input('date-slider', 'value'),
+         Input('data-version', 'data')]
     )
-    def update_dashboard(cat, region):
+    def update_dashboard(cat, region, sub_category=None, segment=None, year=None, month=None,
+                         date_range=None, version=None):
         try:
-            # Handle None inputs safely
-            if cat is None: cat = 'All'
-            if region is None: region = 'All'
+            with data_lock:
+                # The server's version, not the client's: a stale client still gets current data
+                current, version = snapshot, data_version
+            # Rendered outside the lock, so ingesting never waits on figures
+            # None and 'All' inputs do not filter
+            filters = build_filters([cat, region, sub_category, segment, year, month], date_range, current)
+            result = render_dashboard(filters, version, current)
 
-            dff = df.copy()
-            
-            # Filter Data
-            if cat != 'All':
-                dff = dff[dff['Category'] == cat]
-            if region != 'All':
-                dff = dff[dff['Region'] == region]
-            
             # Check for empty data
-            if dff.empty:
+            if result is None:
                 empty_fig = px.scatter(title="No Data Matches Filters")
                 return empty_fig, empty_fig, empty_fig, "$0", "$0", "0.0%"
-
-            # Metrics
-            sales = dff['Sales'].sum()
-            profit = dff['Profit'].sum()
-            margin = (profit/sales)*100 if sales > 0 else 0
-            
-            # Charts
-            # 1. Trend
-            trend = dff.groupby('Order Date')['Sales'].sum().reset_index()
-            fig1 = px.line(trend, x='Order Date', y='Sales', title='Sales Trend Over Time')
-            fig1.update_layout(title_font_size=18, title_x=0.5)
-            
-            # 2. Segment
-            seg = dff.groupby('Segment')['Sales'].sum().reset_index()
-            fig2 = px.pie(seg, values='Sales', names='Segment', title='Sales by Segment', hole=0.4)
-            fig2.update_layout(title_font_size=18, title_x=0.5)
-            
-            # 3. Scatter
-            # Ensure Quantity is numeric and fill NaNs for size safety
-            dff['Quantity'] = pd.to_numeric(dff['Quantity'], errors='coerce').fillna(1)
-            
-            fig3 = px.scatter(dff, x='Sales', y='Profit', color='Sub-Category', size='Quantity',
-                              title='Sales vs Profit Analysis (Bubble Size: Quantity)', 
-                              hover_data=['Product Name'])
-            fig3.update_layout(title_font_size=18, title_x=0.5)
+            fig1, fig2, fig3, sales, profit, margin = result
             
             # Format Metrics with Labels
             return (
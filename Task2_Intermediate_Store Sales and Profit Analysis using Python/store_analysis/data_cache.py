@@ -0,0 +1,206 @@
+import calendar
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+# ==========================================
+# Typed Columnar Cache
+# ==========================================
+# Parsing the CSV (and re-inferring dtypes, parsing dates, deriving the
+# calendar fields) dominates load time on large exports. The first load
+# writes the typed, derived frame to Parquet next to the source:
+#
+#   data/.cache/store_data.csv.parquet   typed frame
+#   data/.cache/store_data.csv.json      source size, mtime and hash
+#
+# Later loads reuse it while the source is unchanged: same size and mtime,
+# or (e.g. after a copy or `touch`) the same content hash. Without pyarrow
+# the cache is skipped and the source is parsed every time.
+#
+# compact=True loads the compact frame instead (see compact_frame()),
+# cached separately as store_data.csv.compact.parquet.
+
+CACHE_VERSION = 1
+
+CATEGORY_COLUMNS = ['Category', 'Sub-Category', 'Segment', 'Region']
+COLUMN_TYPES = {
+    'Sales': 'float64',
+    'Profit': 'float64',
+    'Quantity': 'int64',
+    'Discount': 'float64',
+    'Product Name': 'string',
+    **{column: 'category' for column in CATEGORY_COLUMNS},
+}
+MONTH_NAMES = list(calendar.month_name)[1:]
+COMPACT_TYPES = {
+    'Sales': 'float32',
+    'Profit': 'float32',
+    'Product Name': 'category',
+    # A handful of distinct rates: int8 codes into a float table
+    'Discount': 'category',
+}
+
+
+def read_store_data(filepath, use_cache=True, compact=False):
+    """
+    Loads the dataset with explicit dtypes, a datetime64 Order Date and the
+    derived Year/Month/Quarter/Month_Num columns, from the cache if valid.
+    """
+    if not use_cache or not _has_parquet():
+        df = parse_source(filepath)
+        return compact_frame(df) if compact else df
+
+    cache_path, meta_path = cache_paths(filepath, compact)
+    stat = os.stat(filepath)
+    meta = _read_meta(meta_path)
+    if meta is not None and os.path.exists(cache_path):
+        unchanged = meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns
+        if not unchanged and meta['size'] == stat.st_size and meta['sha256'] == file_hash(filepath):
+            # Same content, new mtime: keep the cache and remember the new stat
+            _write_meta(meta_path, dict(meta, mtime_ns=stat.st_mtime_ns))
+            unchanged = True
+        if unchanged:
+            try:
+                df = pd.read_parquet(cache_path)
+                return _restore_compact_types(df) if compact else df
+            except Exception as e:
+                print(f"⚠️ Ignoring unreadable cache '{cache_path}': {e}")
+
+    source_hash = file_hash(filepath)
+    df = parse_source(filepath)
+    if compact:
+        df = compact_frame(df)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+        _write_meta(meta_path, {'version': CACHE_VERSION, 'size': stat.st_size,
+                                'mtime_ns': stat.st_mtime_ns, 'sha256': source_hash})
+    except OSError as e:
+        print(f"⚠️ Could not write cache '{cache_path}': {e}")
+    return df
+
+
+def parse_source(filepath):
+    """Parses the CSV/Parquet/Excel source with explicit dtypes and adds the calendar fields."""
+    df = read_source(filepath)
+    if 'Order Date' in df.columns:
+        df['Order Date'] = pd.to_datetime(df['Order Date'])
+        add_calendar_fields(df)
+    return df
+
+
+def read_source(filepath):
+    """The source's columns with explicit dtypes (and a parsed Order Date for CSV)."""
+    if filepath.endswith('.csv'):
+        header = pd.read_csv(filepath, encoding='latin1', nrows=0).columns
+        dtypes = {column: dtype for column, dtype in COLUMN_TYPES.items() if column in header}
+        dates = ['Order Date'] if 'Order Date' in header else None
+        try:
+            return pd.read_csv(filepath, encoding='latin1', dtype=dtypes, parse_dates=dates)
+        except ValueError:
+            # e.g. blank Quantity cells: let pandas infer the numeric columns
+            dtypes = {column: dtype for column, dtype in dtypes.items() if dtype in ('category', 'string')}
+            return pd.read_csv(filepath, encoding='latin1', dtype=dtypes, parse_dates=dates)
+
+    df = pd.read_parquet(filepath) if filepath.endswith('.parquet') else pd.read_excel(filepath)
+    return df.astype({column: dtype for column, dtype in COLUMN_TYPES.items() if column in df.columns})
+
+
+def add_calendar_fields(df):
+    """Year, Month (name), Quarter ("2023Q1") and Month_Num from Order Date, without per-row strings."""
+    dates = df['Order Date']
+    valid = dates.notna().to_numpy()
+    year = dates.dt.year
+    month = dates.dt.month
+    month_codes = month.fillna(0).astype('int64').to_numpy() - 1  # -1 (missing) for NaT
+    df['Year'] = year
+    df['Month'] = pd.Categorical.from_codes(month_codes, categories=MONTH_NAMES, ordered=True)
+
+    # Quarters as codes into the (few) distinct labels
+    first_year = int(year.min()) if valid.any() else 0
+    quarter_codes = (year.fillna(first_year).astype('int64').to_numpy() - first_year) * 4 + month_codes // 3
+    quarter_codes[~valid] = -1
+    labels = [f"{first_year + q // 4}Q{q % 4 + 1}" for q in range(int(quarter_codes.max(initial=-1)) + 1)]
+    df['Quarter'] = pd.Categorical.from_codes(quarter_codes, categories=labels)
+    df['Month_Num'] = month
+    return df
+
+
+def compact_frame(df):
+    """
+    The frame in its smallest practical dtypes: float32 money, categorical
+    (int8/int16 code) dimensions and Discount, and the narrowest integers
+    for Quantity, Year and Month_Num. The Month/Quarter label columns are
+    replaced by integer codes (Month_Num, Quarter 1-4); month_label()
+    turns a month code into its name at display time.
+    """
+    df = df.astype({column: dtype for column, dtype in COMPACT_TYPES.items() if column in df.columns})
+    if 'Order Date' in df.columns:
+        df = df.drop(columns=['Month', 'Quarter'], errors='ignore')
+        df['Quarter'] = (df['Month_Num'] - 1) // 3 + 1
+    for column in ('Quantity', 'Year', 'Month_Num', 'Quarter'):
+        if column in df.columns and pd.api.types.is_integer_dtype(df[column].dtype):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+    return df
+
+
+def _restore_compact_types(df):
+    # Parquet gives back a categorical Discount as plain floats and string
+    # categories as str ones; re-type them (from the codes, not the values)
+    # so a cached frame concatenates with freshly parsed rows (live_data.py)
+    for column, dtype in COMPACT_TYPES.items():
+        if dtype != 'category' or column not in df.columns:
+            continue
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories.astype(COLUMN_TYPES[column])
+            df[column] = pd.Categorical.from_codes(values.cat.codes, categories)
+        else:
+            df[column] = values.astype(COLUMN_TYPES[column]).astype('category')
+    return df
+
+
+def month_label(month):
+    return MONTH_NAMES[int(month) - 1]
+
+
+def cache_paths(filepath, compact=False):
+    cache_dir = os.path.join(os.path.dirname(filepath), '.cache')
+    name = os.path.basename(filepath) + ('.compact' if compact else '')
+    return os.path.join(cache_dir, name + '.parquet'), os.path.join(cache_dir, name + '.json')
+
+
+def file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _has_parquet():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return meta if meta.get('version') == CACHE_VERSION else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
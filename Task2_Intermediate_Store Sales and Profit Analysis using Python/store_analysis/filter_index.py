@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+from data_cache import month_label
+
+# ==========================================
+# Bitmap Filter Index
+# ==========================================
+# Built once at load: for every value of every filter dimension, a packed
+# bitmap with one bit per row (bit i of the bitmap is row i, stored as
+# uint64 words). A filter state is resolved with a few word-wise OR/ANDs:
+#
+#   values chosen within a dimension   OR of their bitmaps
+#   across dimensions                  AND
+#
+# so the cost depends on the number of rows / 64 and the number of chosen
+# values, never on re-reading the columns. At 10M rows a bitmap is 1.25 MB
+# and resolving a filter takes a few milliseconds.
+#
+# Dates are indexed by calendar month ("Period", year * 12 + month - 1).
+# Year, Month (of year) and the date-range slider all select a set of
+# periods, so they collapse into a single OR over the Period bitmaps.
+#
+# append() indexes newly arrived rows (see live_data.py) without touching
+# the bits of the rows already indexed. Bitmaps are allocated with spare
+# capacity, doubled whenever the rows outgrow it, so an append ORs its
+# bits into place and only the occasional doubling copies the bitmaps.
+
+DIMENSIONS = ['Category', 'Sub-Category', 'Segment', 'Region', 'Period']
+PERIOD_FILTERS = ['Year', 'Month', 'Date Range']
+
+
+def period_of(dates):
+    """Year * 12 + month - 1 per date; NaN for NaT."""
+    return dates.dt.year * 12 + dates.dt.month - 1
+
+
+def period_label(period):
+    return f"{month_label(period % 12 + 1)[:3]} {period // 12}"
+
+
+class FilterIndex:
+
+    def __init__(self, df=None):
+        self.n = 0
+        # Allocated words per bitmap; the first -(-n // 64) are in use
+        self.capacity = 0
+        self.bitmaps = {dim: {} for dim in DIMENSIONS}
+        if df is not None:
+            self.append(df)
+
+    def __len__(self):
+        return self.n
+
+    def append(self, df):
+        """Indexes the rows of df as rows n, n + 1, ... of the index."""
+        start, end = self.n, self.n + len(df)
+        words = -(-end // 64)
+        if words > self.capacity:
+            self._reserve(max(words, 2 * self.capacity))
+        # Bits are packed from the first word the new rows touch
+        first_word = start // 64
+        offset = start - first_word * 64
+
+        for dim in DIMENSIONS:
+            if dim == 'Period':
+                column = period_of(df['Order Date']) if 'Order Date' in df.columns else None
+            else:
+                column = df[dim] if dim in df.columns else None
+            if column is None:
+                continue
+            codes, uniques = pd.factorize(column, sort=True)
+            bitmaps = self.bitmaps[dim]
+            mask = np.zeros(offset + len(df), dtype=bool)
+            for code, value in enumerate(uniques.tolist()):
+                if dim == 'Period':
+                    value = int(value)
+                np.equal(codes, code, out=mask[offset:])
+                packed = np.packbits(mask, bitorder='little')
+                packed = np.pad(packed, (0, -len(packed) % 8)).view(np.uint64)
+                bitmap = bitmaps.get(value)
+                if bitmap is None:
+                    bitmap = bitmaps[value] = np.zeros(self.capacity, dtype=np.uint64)
+                bitmap[first_word:first_word + len(packed)] |= packed
+        self.n = end
+
+    def _reserve(self, capacity):
+        # The only place bitmaps are copied; snapshots keep the old arrays
+        for bitmaps in self.bitmaps.values():
+            for value, bitmap in bitmaps.items():
+                grown = np.zeros(capacity, dtype=np.uint64)
+                grown[:len(bitmap)] = bitmap
+                bitmaps[value] = grown
+        self.capacity = capacity
+
+    def snapshot(self):
+        """
+        A copy that later append()s leave unchanged. The bitmaps are shared,
+        not copied: appends only set bits past the snapshot's n, which its
+        lookups mask off.
+        """
+        view = object.__new__(FilterIndex)
+        view.n = self.n
+        view.capacity = self.capacity
+        view.bitmaps = {dim: dict(bitmaps) for dim, bitmaps in self.bitmaps.items()}
+        return view
+
+    def values(self, dim):
+        """The indexed values of a dimension, sorted."""
+        return sorted(self.bitmaps[dim])
+
+    def periods(self, filters):
+        """The Period values allowed by the Year, Month and Date Range filters, or None if unfiltered."""
+        allowed = None
+        for key in PERIOD_FILTERS:
+            if filters.get(key) is None:
+                continue
+            if key == 'Date Range':
+                lo, hi = filters[key]
+                chosen = {p for p in self.bitmaps['Period'] if lo <= p <= hi}
+            else:
+                chosen = set(filters[key])
+                chosen = {p for p in self.bitmaps['Period']
+                          if (p // 12 if key == 'Year' else p % 12 + 1) in chosen}
+            allowed = chosen if allowed is None else allowed & chosen
+        return None if allowed is None else sorted(allowed)
+
+    def match(self, filters):
+        """
+        Packed bitmap of the rows matching every filter, or None when no
+        filter is set. `filters` maps a dimension (or Year, Month, Date
+        Range) to a list of accepted values ((first, last) Period for Date
+        Range); missing or None entries do not filter.
+        """
+        chosen = {dim: filters[dim] for dim in DIMENSIONS[:-1] if filters.get(dim) is not None}
+        periods = self.periods(filters)
+        if periods is not None:
+            chosen['Period'] = periods
+
+        words = -(-self.n // 64)
+        result = None
+        for dim, values in chosen.items():
+            bitmaps = [self.bitmaps[dim][value][:words] for value in values if value in self.bitmaps[dim]]
+            if not bitmaps:
+                return np.zeros(words, dtype=np.uint64)
+            if result is None:
+                result = _union(bitmaps)
+            else:
+                result &= bitmaps[0] if len(bitmaps) == 1 else _union(bitmaps)
+        if result is not None and self.n % 64:
+            # Rows appended after a snapshot may share its last word
+            result[-1] &= np.uint64((1 << self.n % 64) - 1)
+        return result
+
+    def positions(self, filters):
+        """Sorted row positions matching the filters, or None for every row."""
+        bitmap = self.match(filters)
+        if bitmap is None:
+            return None
+        return np.flatnonzero(np.unpackbits(bitmap.view(np.uint8), count=self.n, bitorder='little'))
+
+
+def _union(bitmaps):
+    result = bitmaps[0].copy()
+    for bitmap in bitmaps[1:]:
+        result |= bitmap
+    return result
+
@@ -0,0 +1,79 @@
+import io
+import os
+
+import pandas as pd
+
+from data_cache import COLUMN_TYPES, add_calendar_fields, compact_frame, read_store_data
+
+# ==========================================
+# Live Refresh (append-only sources)
+# ==========================================
+# Order exports grow by appending rows. LiveSource remembers how many
+# bytes of the CSV it has ingested; poll() reads only what was written
+# after that offset, up to the last complete line, and parses it with the
+# same dtypes and calendar fields as the full load. If the file shrank or
+# was replaced (or is not a CSV and its mtime changed), poll() reloads it
+# in full instead.
+
+
+class LiveSource:
+
+    def __init__(self, filepath, compact=False):
+        self.filepath = filepath
+        self.compact = compact
+        self.offset = 0
+        self.mtime_ns = None
+        self.header = None
+
+    def load(self):
+        """Full (cached) load; remembers the offset to tail from."""
+        while True:
+            before = os.stat(self.filepath)
+            df = read_store_data(self.filepath, compact=self.compact)
+            after = os.stat(self.filepath)
+            # Rows appended during the load would otherwise be read twice or missed
+            if (after.st_size, after.st_mtime_ns) == (before.st_size, before.st_mtime_ns):
+                break
+        self.offset = after.st_size
+        self.mtime_ns = after.st_mtime_ns
+        if self.filepath.endswith('.csv'):
+            self.header = pd.read_csv(self.filepath, encoding='latin1', nrows=0).columns.tolist()
+        return df
+
+    def poll(self):
+        """
+        Returns ('append', tail frame), ('reload', full frame) or (None, None)
+        when the file is unchanged.
+        """
+        stat = os.stat(self.filepath)
+        if stat.st_size == self.offset and stat.st_mtime_ns == self.mtime_ns:
+            return None, None
+        if self.header is None or stat.st_size < self.offset:
+            return 'reload', self.load()
+        if stat.st_size == self.offset:
+            # Touched or rewritten in place at the same size
+            self.mtime_ns = stat.st_mtime_ns
+            return None, None
+
+        with open(self.filepath, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+        # A writer may be mid-line: leave the partial line for the next poll
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return None, None
+        self.offset += end
+        self.mtime_ns = stat.st_mtime_ns
+        tail = self.parse(data[:end])
+        return ('append', tail) if len(tail) else (None, None)
+
+    def parse(self, data):
+        dtypes = {column: dtype for column, dtype in COLUMN_TYPES.items()
+                  if column in self.header and dtype in ('category', 'string')}
+        dates = ['Order Date'] if 'Order Date' in self.header else None
+        tail = pd.read_csv(io.BytesIO(data), names=self.header, header=None, encoding='latin1',
+                           dtype=dtypes, parse_dates=dates)
+        if dates:
+            tail['Order Date'] = pd.to_datetime(tail['Order Date'])
+            add_calendar_fields(tail)
+        return compact_frame(tail) if self.compact else tail
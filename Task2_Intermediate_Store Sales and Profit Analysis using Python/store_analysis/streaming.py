@@ -0,0 +1,328 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from analysis import CUBE_DIMENSIONS, CUBE_MEASURES, build_cube, rollup
+from data_cache import COLUMN_TYPES, add_calendar_fields
+
+# ==========================================
+# Streaming Mode (datasets larger than RAM)
+# ==========================================
+# The report only needs the aggregation cube (see analysis.build_cube), the
+# Profit quartiles and the top products, and all three can be built one
+# chunk at a time:
+#
+#   pass 1: per chunk, drop incomplete rows, fold the chunk's cube into the
+#           running cube, its Profit values into a quantile sketch and its
+#           Sales per product into a heavy-hitters summary
+#   pass 2: re-read the chunks, flag rows outside the IQR bounds (optionally
+#           appending them to an outliers CSV) and total the Sales of the
+#           products the summary kept, exactly
+#
+# The streamed cube leaves out Product Name, whose distinct values grow
+# with the data; the rest of its dimensions are fixed small sets. Memory is
+# bounded by the chunk size plus the cube (one row per month, category,
+# sub-category, segment and region) plus a few thousand product counters,
+# however large the file is.
+
+DEFAULT_CHUNKSIZE = 500_000
+TOP_PRODUCTS_CAPACITY = 1000
+
+STREAM_DIMENSIONS = [column for column in CUBE_DIMENSIONS if column != 'Product Name']
+
+
+class QuantileSketch:
+    """
+    Mergeable KLL quantile sketch (Karnin, Lang & Liberty, 2016).
+
+    Items live in levels of compactors; an item at level h stands for 2^h
+    input values. A full compactor sorts itself and promotes every other
+    item (random offset) to the next level. Memory is O(k log(n / k)) and
+    the rank error of quantile() is about 1.7 / k of the count (with
+    k=200, under 1%), so quartiles of any stream take a few KB.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self.count += len(values)
+        self._compress()
+
+    def merge(self, other):
+        """Folds another sketch (e.g. from another chunk or process) into this one."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate((self.levels[h], items))
+        self.count += other.count
+        self._compress()
+
+    def quantile(self, q):
+        items = np.concatenate(self.levels)
+        if not len(items):
+            return float('nan')
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        i = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(items[order[min(i, len(items) - 1)]])
+
+    def _capacity(self, h):
+        # Lower levels get geometrically smaller compactors
+        return max(2, int(np.ceil(self.k * (2 / 3) ** (len(self.levels) - 1 - h))))
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                level = np.sort(level)
+                # An odd item out stays behind
+                keep = level[-1:] if len(level) % 2 else level[:0]
+                pairs = level[:len(level) - len(keep)]
+                promoted = pairs[self._rng.integers(2)::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate((self.levels[h + 1], promoted))
+                # Capacities shrink as levels are added: recheck from the bottom
+                h = 0
+                continue
+            h += 1
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+
+class HeavyHitters:
+    """
+    Mergeable Misra-Gries summary of weighted items (Misra & Gries, 1982;
+    merging as in Agarwal et al., 2012), e.g. Sales per product.
+
+    At most `capacity` counters are kept. update() adds a chunk's totals to
+    them; if that leaves more than `capacity`, the (capacity + 1)-th largest
+    counter is subtracted from all and the non-positive ones are dropped.
+    Any item with more than total / (capacity + 1) of the weight survives,
+    under-counted by at most that much, so a second pass over the data
+    (recount()) gives the survivors' exact totals. Weights must not be
+    negative.
+    """
+
+    def __init__(self, capacity=TOP_PRODUCTS_CAPACITY):
+        self.capacity = capacity
+        self.total = 0.0
+        self.counts = pd.Series(dtype='float64')
+        self.exact = None
+
+    def update(self, keys, weights):
+        partial = _totals(keys, weights)
+        self.total += float(partial.sum())
+        counts = pd.concat([self.counts, partial]).groupby(level=0).sum()
+        if len(counts) > self.capacity:
+            threshold = counts.nlargest(self.capacity + 1).iloc[-1]
+            counts = counts[counts > threshold] - threshold
+        self.counts = counts
+
+    def recount(self, keys, weights):
+        """Second pass: adds up the exact totals of the items kept by update()."""
+        kept = keys.isin(self.counts.index).to_numpy()
+        partial = _totals(keys[kept], weights[kept])
+        self.exact = partial if self.exact is None else self.exact.add(partial, fill_value=0)
+
+    def top(self, n):
+        """The n heaviest items (exact once recounted, lower bounds before), heaviest first."""
+        counts = self.counts if self.exact is None else self.exact
+        return counts.nlargest(n)
+
+
+def _totals(keys, weights):
+    totals = weights.groupby(keys, observed=True).sum()
+    # Chunks have different categories: index by plain values so they align
+    totals.index = totals.index.astype(object)
+    return totals.astype('float64')
+
+
+# ==========================================
+# Pass 1: Aggregates
+# ==========================================
+def read_chunks(filepath, chunksize=DEFAULT_CHUNKSIZE):
+    """Yields the CSV in typed chunks with the calendar fields added."""
+    header = pd.read_csv(filepath, encoding='latin1', nrows=0).columns
+    # Numeric columns are inferred per chunk, so a blank cell cannot abort the stream
+    dtypes = {column: dtype for column, dtype in COLUMN_TYPES.items()
+              if column in header and dtype in ('category', 'string')}
+    dates = ['Order Date'] if 'Order Date' in header else None
+    for chunk in pd.read_csv(filepath, encoding='latin1', dtype=dtypes, parse_dates=dates, chunksize=chunksize):
+        if dates:
+            chunk['Order Date'] = pd.to_datetime(chunk['Order Date'])
+            add_calendar_fields(chunk)
+        yield chunk
+
+
+def stream_aggregates(filepath, chunksize=DEFAULT_CHUNKSIZE, sketch_k=200, top_capacity=TOP_PRODUCTS_CAPACITY):
+    """
+    One pass over the file in chunks. Returns (cube, sketch, products,
+    stats): the cube analysis.build_cube() gives for the cleaned frame over
+    STREAM_DIMENSIONS, a QuantileSketch of Profit, a HeavyHitters summary
+    of Sales per product and row/missing-value counts.
+    """
+    cube = CubeAccumulator()
+    sketch = QuantileSketch(sketch_k)
+    products = HeavyHitters(top_capacity)
+    stats = {'rows': 0, 'columns': None, 'missing': None, 'chunks': 0}
+
+    for chunk in read_chunks(filepath, chunksize):
+        stats['rows'] += len(chunk)
+        stats['chunks'] += 1
+        stats['columns'] = chunk.columns.tolist()
+        missing = chunk.isnull().sum()
+        stats['missing'] = missing if stats['missing'] is None else stats['missing'].add(missing, fill_value=0)
+
+        chunk = chunk.dropna()
+        sketch.update(chunk['Profit'].to_numpy())
+        products.update(chunk['Product Name'], chunk['Sales'])
+        cube.add(build_cube(chunk, STREAM_DIMENSIONS))
+
+    return cube.result(), sketch, products, stats
+
+
+class CubeAccumulator:
+    """
+    Running sum of partial cubes. Dimensions are kept as categoricals over
+    a growing, shared category list, and partials are only re-rolled once
+    they outweigh the rolled-up cube, so the cost per chunk stays
+    proportional to the chunk rather than to the cube.
+    """
+
+    def __init__(self, dimensions=STREAM_DIMENSIONS):
+        self.dimensions = list(dimensions)
+        self.cube = None
+        self.pending = []
+        self.pending_rows = 0
+        self.categories = {column: pd.Index([]) for column in self.dimensions}
+
+    def add(self, partial):
+        self.pending.append(self._align(partial))
+        self.pending_rows += len(partial)
+        if self.pending_rows >= (len(self.cube) if self.cube is not None else 0):
+            self._compact()
+
+    def result(self):
+        self._compact()
+        if self.cube is None:
+            return pd.DataFrame(columns=self.dimensions + CUBE_MEASURES)
+        cube = self.cube
+        for column in self.dimensions:
+            categories = cube[column].cat.categories
+            if pd.api.types.is_numeric_dtype(categories.dtype):
+                # Year / Month_Num are plain integers in build_cube()
+                cube[column] = cube[column].astype(categories.dtype)
+            else:
+                cube[column] = cube[column].cat.set_categories(categories.sort_values())
+        return cube
+
+    def _align(self, partial):
+        partial = partial.copy()
+        for column in self.dimensions:
+            values = partial[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype(values.cat.categories.dtype)
+            known = self.categories[column]
+            new = pd.Index(values.unique()).difference(known)
+            if len(new):
+                # Appending keeps existing codes valid, so earlier frames only need the wider dtype
+                self.categories[column] = known.append(new)
+            partial[column] = pd.Categorical(values, categories=self.categories[column])
+        return partial
+
+    def _compact(self):
+        if not self.pending:
+            return
+        frames = [self.cube] if self.cube is not None else []
+        frames += self.pending
+        for frame in frames:
+            for column in self.dimensions:
+                if len(frame[column].cat.categories) != len(self.categories[column]):
+                    frame[column] = frame[column].cat.set_categories(self.categories[column])
+        self.cube = rollup(pd.concat(frames, ignore_index=True), self.dimensions, CUBE_MEASURES)
+        self.pending = []
+        self.pending_rows = 0
+
+
+def iqr_bounds(sketch):
+    """Profit bounds (Q1 - 1.5 IQR, Q3 + 1.5 IQR) from the sketch's quartiles."""
+    q1, q3 = sketch.quantile(0.25), sketch.quantile(0.75)
+    iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+# ==========================================
+# Pass 2: Outliers
+# ==========================================
+def flag_outliers(filepath, bounds, outliers_path=None, chunksize=DEFAULT_CHUNKSIZE, products=None):
+    """
+    Re-reads the file and counts complete rows whose Profit is outside
+    `bounds`, appending them (with all columns) to outliers_path if given.
+    A HeavyHitters summary of Sales per product passed as `products` is
+    recounted along the way.
+    """
+    lower, upper = bounds
+    count = 0
+    if outliers_path is not None and os.path.exists(outliers_path):
+        os.remove(outliers_path)
+
+    for chunk in read_chunks(filepath, chunksize):
+        chunk = chunk.dropna()
+        if products is not None:
+            products.recount(chunk['Product Name'], chunk['Sales'])
+        outliers = chunk[~chunk['Profit'].between(lower, upper)]
+        count += len(outliers)
+        if outliers_path is not None and len(outliers):
+            outliers.to_csv(outliers_path, mode='a', header=not os.path.exists(outliers_path), index=False)
+    return count
+
+
+def stream_and_clean(filepath, chunksize=DEFAULT_CHUNKSIZE, outliers_path=None):
+    """
+    Streaming counterpart of analysis.load_and_clean_data(): prints the same
+    overview and returns (cube, top_products) instead of the full frame,
+    for analysis.analyze_sales(cube, top_products) and the other sections.
+    """
+    if not os.path.exists(filepath):
+        print(f"❌ Error: File '{filepath}' not found. Please place the dataset in the 'store_analysis/data/' directory.")
+        return None
+    if not filepath.endswith('.csv'):
+        print("❌ Error: streaming mode reads CSV files only.")
+        return None
+
+    cube, sketch, products, stats = stream_aggregates(filepath, chunksize)
+
+    # Dataset Overview
+    print("\n📋 --- DATASET OVERVIEW (streamed) ---")
+    print(f"Shape: ({stats['rows']}, {len(stats['columns'] or [])}) in {stats['chunks']} chunks of {chunksize:,} rows")
+    print("Columns:", stats['columns'])
+    print("-" * 30)
+
+    missing = stats['missing']
+    if missing is not None and missing.sum() > 0:
+        print("\n⚠️ Missing Values Detected:\n", missing[missing > 0])
+        print("✅ Missing values handled (rows dropped).")
+
+    # Outlier Detection (Profit) - IQR from the sketch, flagged in a second pass
+    bounds = iqr_bounds(sketch)
+    outliers = flag_outliers(filepath, bounds, outliers_path, chunksize, products)
+    print(f"ℹ️ Outliers detected: {outliers} rows (Profit outside {bounds[0]:,.2f} .. {bounds[1]:,.2f}).")
+    if outliers_path is not None and outliers:
+        print(f"   Written to {outliers_path}")
+
+    top_products = products.top(10).rename_axis('Product Name').reset_index(name='Sales')
+    return cube, top_products